@@ -1,6 +1,11 @@
 import os
+from catalog import Catalog
+from thumbnailcache import ThumbnailCache
+from metadatastore import MetadataStore
 from imagecollection import ImageCollection
 from tagcollection import TagCollection
+from startupprofile import StartupProfile
+from metrics import Metrics
 
 class AppModule:
     """
@@ -9,32 +14,84 @@ class AppModule:
     
      AppModule : Creates root folder, image collection and tag collection
     """
-    def __init__(self):
+    def __init__(self, hashMode = "file", thumbnailCacheBytes = 512 * 2**20, importMode = "copy", loadImages = True):
         """
         __init__ AppModule class constructor
+
+        Args:
+            hashMode (String, optional): how images are identified, "file" (hash of the file's bytes)
+            or "pixels" (hash of the decoded pixels, slower but doesn't change if an image is re-encoded). Defaults to "file".
+            thumbnailCacheBytes (int, optional): maximum size of the thumbnail cache, in bytes. Defaults to 512MB.
+            importMode (String, optional): how images are put into the root folder, "copy", "move", "hardlink"
+            or "reflink" (see FileTransfer). Defaults to "copy".
+            loadImages (bool, optional): False to create the image collection empty, it is then loaded
+            by loadImgCollection (ex: in the background, once the first page is shown). Defaults to True.
         """
         # self.collectionsRootFolder (String): root folder path
         self.collectionsRootFolder = "./PicLib/"
 
+        # self.hashMode (String): "file" or "pixels", see CPImage.getHash
+        self.hashMode = hashMode
+
+        # self.importMode (String): see FileTransfer.MODES
+        self.importMode = importMode
+
         # os.makedirs() allows to create the root folder if it doesn't exist
         os.makedirs(os.path.dirname(self.collectionsRootFolder), exist_ok = True)
 
-        self.imgCollection = ImageCollection("mainImgCollection", self)
+        # self.catalog (Catalog): optional SQLite catalog, used instead of the Json files if its file exists
+        self.catalogPath = self.collectionsRootFolder + "catalog.db"
+        self.catalog = Catalog(self.catalogPath) if os.path.exists(self.catalogPath) else None
 
-        # If the collection's json file exists, it is loaded
-        try:
-            self.imgCollection.loadCollection()
-        # If it doesn't exist, the collection remains empty
-        except FileNotFoundError:
-            pass
+        # self.thumbnailCache (ThumbnailCache): small versions of the images, shown by the UI
+        self.thumbnailCache = ThumbnailCache(self.collectionsRootFolder + ".thumbs/", thumbnailCacheBytes)
+
+        # self.metadataStore (MetadataStore): writes the changes of the images' metadata in the background.
+        # Changes left in its journal by a crash are written before the collection is loaded
+        self.metadataStore = MetadataStore(self.collectionsRootFolder + "metadataJournal.jsonl", self)
+        with StartupProfile.step("replay metadata journal"):
+            self.metadataStore.replay()
+
+        self.imgCollection = ImageCollection("mainImgCollection", self)
+        self.imgCollectionLoaded = False
+        if loadImages:
+            self.loadImgCollection()
         
         # The same process for the tag collection
         self.tagCollection = TagCollection("mainTagCollection", self)
         try:
-            self.tagCollection.loadCollection()
+            with StartupProfile.step("load tag collection"), Metrics.span("load tags"):
+                self.tagCollection.loadCollection()
         except FileNotFoundError:
             pass
 
+    def loadImgCollection(self, preloaded = (), onProgress = None):
+        """
+        loadImgCollection : loads the image collection, if its json file (or the catalog) exists.
+        If it doesn't exist, the collection remains empty
+
+        Args:
+            preloaded (iterable, optional): images already read (see ImageCollection.loadFirst),
+            they are kept instead of being read again. Defaults to ().
+            onProgress (function, optional): called with the number of images read and the number of images
+            while they are read. Defaults to None.
+        """
+        try:
+            with StartupProfile.step("load image collection"), Metrics.span("load images"):
+                self.imgCollection.loadCollection(preloaded, onProgress)
+        except FileNotFoundError:
+            pass
+        self.imgCollectionLoaded = True
+
+    def isImgCollectionLoaded(self):
+        """
+        isImgCollectionLoaded : self.imgCollectionLoaded getter
+
+        Returns:
+            bool: True if the image collection was loaded (see loadImgCollection)
+        """
+        return self.imgCollectionLoaded
+
     def getCollectionsRootFolder(self):
         """
         getCollectionsRootFolder : self.collectionsRootFolder getter
@@ -60,4 +117,79 @@ class AppModule:
         Returns:
             TagCollection: TagCollection instance
         """
-        return self.tagCollection
\ No newline at end of file
+        return self.tagCollection
+
+    def getHashMode(self):
+        """
+        getHashMode : self.hashMode getter
+
+        Returns:
+            string: "file" or "pixels"
+        """
+        return self.hashMode
+
+    def getImportMode(self):
+        """
+        getImportMode : self.importMode getter
+
+        Returns:
+            string: "copy", "move", "hardlink" or "reflink"
+        """
+        return self.importMode
+
+    def setImportMode(self, importMode):
+        """
+        setImportMode : self.importMode setter, used by the next imports
+
+        Args:
+            importMode (String): "copy", "move", "hardlink" or "reflink"
+        """
+        self.importMode = importMode
+
+    def getMetadataStore(self):
+        """
+        getMetadataStore : self.metadataStore getter
+
+        Returns:
+            MetadataStore: write-behind layer of the images' metadata
+        """
+        return self.metadataStore
+
+    def getThumbnailCache(self):
+        """
+        getThumbnailCache : self.thumbnailCache getter
+
+        Returns:
+            ThumbnailCache: ThumbnailCache instance
+        """
+        return self.thumbnailCache
+
+    def getCatalog(self):
+        """
+        getCatalog : self.catalog getter
+
+        Returns:
+            Catalog: Catalog instance, or None if the catalog is not enabled
+        """
+        return self.catalog
+
+    def getCatalogPath(self):
+        """
+        getCatalogPath : self.catalogPath getter
+
+        Returns:
+            string: catalog file path
+        """
+        return self.catalogPath
+
+    def migrateToCatalog(self):
+        """
+        migrateToCatalog : creates the catalog, imports the existing Json files into it and enables it
+
+        Returns:
+            int: number of images imported
+        """
+        catalog = Catalog(self.catalogPath)
+        n = catalog.migrateSidecars(self.imgCollection.path)
+        self.catalog = catalog
+        return n
@@ -0,0 +1,269 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+librarybench : measures how the core of PicLib scales with the size of the library, without a window.
+For each size, a synthetic library is generated in a temporary folder (small noisy JPEGs, each with its own exif date
+over ten years, an exif orientation and a description making its content unique) and these operations are timed:
+    - scanFolder: import of the generated images
+    - addTag: tags added to every image (a few tags per image, some tags much more frequent than others)
+    - saveCollection: save of the whole collection (Json file, or the catalog with --catalog)
+    - loadFirst and loadCollection: first page, then whole collection, read by a new AppModule
+      (with the memory taken by each image of the loaded collection, its indexes included)
+    - findWithTags: searches with one tag, two tags that must all be there, and a tag that must not be there
+    - rotate: rotation of some of the images
+    - zipExport: export of some of the images to a zip archive (what CentralPanel.createZip runs)
+The results are printed as JSON: wall time, peak RSS and operations per second of each operation.
+The peak RSS is the peak of the operation on Linux, elsewhere it is the peak of the process since it started.
+
+    python benchmarks/librarybench.py --images 1000 10000 100000 1000000 --catalog
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from appmodule import AppModule
+from catalog import Catalog
+from zipexporter import ZipExporter
+
+def makeImages(folder, n, size, seed):
+    """
+    makeImages : writes n different JPEG images. A single noisy image is encoded, and each file gets its own
+    exif segment (date, orientation and a description with its number), so generating a million images is fast
+
+    Args:
+        folder (String): folder of the images (sub-folders of at most 1000 images are created)
+        n (int): number of images
+        size (tuple): width and height of the images
+        seed (int): seed of the dates
+
+    Returns:
+        int: size of all the images, in bytes
+    """
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'JPEG', quality = 85)
+    encoded = buffer.getvalue()
+    randomDates = random.Random(seed)
+    start = time.mktime((2015, 1, 1, 12, 0, 0, 0, 0, -1))
+    total = 0
+    for i in range(n):
+        exif = Image.Exif()
+        exif[306] = time.strftime("%Y:%m:%d %H:%M:%S", time.localtime(start + randomDates.randrange(10 * 365 * 86400)))
+        exif[274] = 1
+        exif[270] = "synthetic {}".format(i)
+        segment = exif.tobytes()
+        data = encoded[:2] + b'\xff\xe1' + (len(segment) + 2).to_bytes(2, 'big') + segment + encoded[2:]
+        subFolder = os.path.join(folder, str(i // 1000))
+        if i % 1000 == 0:
+            os.makedirs(subFolder, exist_ok = True)
+        with open(os.path.join(subFolder, "img{}.jpg".format(i)), 'wb') as writefile:
+            writefile.write(data)
+        total += len(data)
+    return total
+
+def tagsOf(n, tags, seed):
+    """
+    tagsOf : tags of each image, from 0 to 3 tags per image, the tag of rank r being chosen about 1/r as often as the first
+
+    Args:
+        n (int): number of images
+        tags (int): number of different tags
+        seed (int): seed of the choices
+
+    Returns:
+        list: set of tag names of each image
+    """
+    names = ["tag{}".format(rank) for rank in range(tags)]
+    weights = [1 / (rank + 1) for rank in range(tags)]
+    choices = random.Random(seed)
+    return [set(choices.choices(names, weights, k = choices.randint(0, 3))) for i in range(n)]
+
+def resetPeakRss():
+    """
+    resetPeakRss : makes the peak RSS of the process its current RSS (only possible on Linux)
+
+    Returns:
+        bool: True if the peak was reset
+    """
+    try:
+        with open("/proc/self/clear_refs", 'w') as clearfile:
+            clearfile.write("5")
+        return True
+    except OSError:
+        return False
+
+def peakRssMb():
+    """
+    peakRssMb : peak RSS of the process, since the last resetPeakRss on Linux, since it started elsewhere
+
+    Returns:
+        float: peak RSS in MB, None if it can't be known (ex: on Windows)
+    """
+    try:
+        with open("/proc/self/status") as statusfile:
+            for line in statusfile:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def measure(results, name, ops, function):
+    """
+    measure : times an operation and records its wall time, peak RSS and operations per second
+
+    Args:
+        results (Dict): results of the library, the operation's result is added to it
+        name (String): name of the operation
+        ops (int): number of operations done by the function (ex: images imported)
+        function (function): runs the operation
+
+    Returns:
+        object: what the function returned
+    """
+    gc.collect()
+    resetPeakRss()
+    start = time.perf_counter()
+    value = function()
+    wall = time.perf_counter() - start
+    results[name] = {"wallSeconds": round(wall, 4), "peakRssMb": peakRssMb(), "ops": ops,
+                     "opsPerSecond": round(ops / wall, 1) if wall > 0 else None}
+    return value
+
+def bytesPerImage():
+    """
+    bytesPerImage : memory taken by the collection once loaded (images, metadata, exif and indexes), per image.
+    The collection is loaded again by a new AppModule, with its allocations traced (slower, so it is not timed)
+
+    Returns:
+        int: bytes per image
+    """
+    module = AppModule(loadImages = False)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        module.getImgCollection().loadCollection()
+        gc.collect()
+        loaded = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return round(loaded / max(1, module.getImgCollection().size()))
+
+def benchLibrary(n, args):
+    """
+    benchLibrary : generates a library of n images in the current folder and times its operations
+
+    Args:
+        n (int): number of images
+        args (Namespace): arguments of the command line
+
+    Returns:
+        Dict: results of each operation
+    """
+    results = {}
+    totalBytes = measure(results, "generate", n, lambda: makeImages("src", n, tuple(args.size), args.seed))
+    if args.catalog:
+        os.makedirs("./PicLib/", exist_ok = True)
+        Catalog("./PicLib/catalog.db")
+    module = AppModule()
+    imgCollection = module.getImgCollection()
+    summary = measure(results, "scanFolder", n, lambda: imgCollection.scanFolder("src", threads = args.threads, importMode = args.mode))
+    results["scanFolder"]["errors"] = len(summary.errors)
+
+    imgs = sorted(imgCollection.getItems(), key = lambda img: img.getImageFile())
+    imgTags = tagsOf(len(imgs), args.tags, args.seed)
+    for tag in sorted(set().union(*imgTags)):
+        module.getTagCollection().addTag(tag)
+
+    def addTags():
+        with module.getMetadataStore().batch():
+            for img, tags in zip(imgs, imgTags):
+                for tag in tags:
+                    img.addTag(tag)
+        module.getMetadataStore().flush()
+
+    measure(results, "addTag", sum(len(tags) for tags in imgTags), addTags)
+    measure(results, "saveCollection", len(imgs), imgCollection.saveCollection)
+
+    # A new AppModule reads the library as PicLib does when it starts
+    module = AppModule(loadImages = False)
+    imgCollection = module.getImgCollection()
+    first = measure(results, "loadFirst", args.per_page, lambda: imgCollection.loadFirst(args.per_page))
+    measure(results, "loadCollection", len(imgs), lambda: imgCollection.loadCollection(first))
+    results["loadCollection"]["bytesPerImage"] = bytesPerImage()
+
+    names = ["tag{}".format(rank) for rank in range(min(args.tags, 10))]
+    queries = [([tag], (), ()) for tag in names]
+    queries += [((), (a, b), ()) for a, b in zip(names, names[1:])]
+    queries += [([a], (), (b,)) for a, b in zip(names, names[1:])]
+    found = measure(results, "findWithTags", len(queries),
+                    lambda: [len(imgCollection.findWithTags(*query).getItems()) for query in queries])
+    results["findWithTags"]["imagesFound"] = sum(found)
+
+    imgs = sorted(imgCollection.getItems(), key = lambda img: img.getImageFile())
+    step = max(1, len(imgs) // max(1, args.rotate))
+    rotated = imgs[::step][:args.rotate]
+
+    def rotate():
+        for img in rotated:
+            img.rotate()
+        module.getMetadataStore().flush()
+
+    measure(results, "rotate", len(rotated), rotate)
+
+    zipped = [img.getImageFile() for img in imgs[::max(1, len(imgs) // max(1, args.zip))][:args.zip]]
+    progress = measure(results, "zipExport", len(zipped), lambda: ZipExporter("export").export(zipped))
+    results["zipExport"]["bytesPerSecond"] = round(progress.bytesPerSecond())
+    results["generate"]["bytes"] = totalBytes
+    return results
+
+def main():
+    """
+    main : benchmarks a library of each size, each in its own temporary folder, and prints the results as JSON
+    """
+    parser = argparse.ArgumentParser(description = "Scaling of the core of PicLib with the size of the library")
+    parser.add_argument("--images", type = int, nargs = "+", default = [1000], help = "sizes of the libraries (default: 1000)")
+    parser.add_argument("--size", type = int, nargs = 2, default = (160, 120), help = "width and height of the images")
+    parser.add_argument("--tags", type = int, default = 50, help = "number of different tags")
+    parser.add_argument("--rotate", type = int, default = 1000, help = "number of images rotated")
+    parser.add_argument("--zip", type = int, default = 1000, help = "number of images exported")
+    parser.add_argument("--per-page", type = int, default = 25, help = "images of the first page")
+    parser.add_argument("--threads", type = int, default = 4, help = "threads of each stage of the import")
+    parser.add_argument("--mode", choices = ("copy", "move", "hardlink", "reflink"), default = "copy", help = "import mode")
+    parser.add_argument("--catalog", action = "store_true", help = "uses the SQLite catalog instead of the Json files")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--work", help = "folder where the libraries are generated (default: a temporary folder)")
+    args = parser.parse_args()
+
+    libraries = []
+    cwd = os.getcwd()
+    for n in args.images:
+        with tempfile.TemporaryDirectory(dir = args.work) as folder:
+            os.chdir(folder)
+            try:
+                libraries.append({"images": n, "results": benchLibrary(n, args)})
+            finally:
+                os.chdir(cwd)
+    print(json.dumps({"python": platform.python_version(), "platform": platform.platform(), "catalog": args.catalog,
+                      "mode": args.mode, "peakRssPerOperation": resetPeakRss(), "libraries": libraries}, indent = 4))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+prefetchbench : measures the page flip latency of the PictureGrid with and without the PagePrefetcher, without a window.
+A page flip is simulated by getting the thumbnail of every image of the page and decoding it (as Kivy does for the texture),
+with some time between flips, as a user looking at the page.
+
+    python benchmarks/prefetchbench.py --images 90 --per-page 9 --think 0.5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from appmodule import AppModule
+from pageprefetcher import PagePrefetcher
+from thumbnailcache import ThumbnailCache
+
+def makeImages(folder, n, size):
+    """
+    makeImages : writes n different noisy JPEG images (noise makes them as slow to decode as photos,
+    and each image needs its own noise, images with the same content are imported only once)
+
+    Args:
+        folder (String): folder of the images
+        n (int): number of images
+        size (tuple): width and height of the images
+    """
+    os.makedirs(folder, exist_ok = True)
+    for i in range(n):
+        Image.effect_noise(size, 64).convert('RGB').save(os.path.join(folder, "img{}.jpg".format(i)), quality = 90)
+
+def flipPages(module, imgs, perPage, think, depth):
+    """
+    flipPages : shows every page once, from the first to the last
+
+    Args:
+        module (AppModule): AppModule instance
+        imgs (list): images of the collection
+        perPage (int): number of images per page
+        think (float): seconds between two page flips
+        depth (int): prefetch depth, 0 for no prefetch
+
+    Returns:
+        list: latency of each page flip, in seconds
+    """
+    shutil.rmtree(module.getCollectionsRootFolder() + ".thumbs/", ignore_errors = True)
+    cache = ThumbnailCache(module.getCollectionsRootFolder() + ".thumbs/")
+    prefetcher = PagePrefetcher(cache, 140, depth = depth)
+    latencies = []
+    for page in range((len(imgs) + perPage - 1) // perPage):
+        start = time.perf_counter()
+        for img in imgs[page * perPage : (page + 1) * perPage]:
+            with Image.open(cache.ensure(img, 140)) as im:
+                im.load()
+        latencies.append(time.perf_counter() - start)
+        if depth > 0:
+            prefetcher.prefetch(imgs, page, perPage)
+        time.sleep(think)
+    prefetcher.cancel()
+    return latencies
+
+def main():
+    """
+    main : builds a synthetic library in a temporary folder and prints the results as JSON
+    """
+    parser = argparse.ArgumentParser(description = "Page flip latency with and without prefetch")
+    parser.add_argument("--images", type = int, default = 90)
+    parser.add_argument("--per-page", type = int, default = 9)
+    parser.add_argument("--think", type = float, default = 0.5, help = "seconds between two page flips")
+    parser.add_argument("--depth", type = int, default = 1)
+    parser.add_argument("--size", type = int, nargs = 2, default = (3000, 2000))
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            makeImages("src", args.images, tuple(args.size))
+            module = AppModule()
+            module.getImgCollection().scanFolder("src")
+            imgs = sorted(module.getImgCollection().getItems(), key = lambda img: img.getImageFile())
+            results = {}
+            for name, depth in (("noPrefetch", 0), ("prefetch", args.depth)):
+                latencies = flipPages(module, imgs, args.per_page, args.think, depth)
+                results[name] = {"meanMs": 1000 * statistics.mean(latencies),
+                                 "medianMs": 1000 * statistics.median(latencies),
+                                 "maxMs": 1000 * max(latencies)}
+        finally:
+            os.chdir(cwd)
+    print(json.dumps({"images": args.images, "perPage": args.per_page, "think": args.think, "results": results}, indent = 4))
+
+if __name__ == '__main__':
+    main()
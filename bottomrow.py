@@ -1,5 +1,7 @@
 from kivy.uix.boxlayout import BoxLayout
 from coloredlabel import ColoredLabel
+from kivy.clock import Clock
+from metrics import Metrics
 
 class BottomRow(BoxLayout):
     """
@@ -12,6 +14,7 @@ class BottomRow(BoxLayout):
         - labelDateTags: date and tags of selected image
         - labelTagsSelected: number of selected tags
         - labelTagsAvailable: number of available tags
+        - labelMetrics: p50/p95/p99 of the slowest spans, only when the metrics are enabled (see Metrics)
     """
     def __init__(self, **kwargs):
         """
@@ -31,9 +34,33 @@ class BottomRow(BoxLayout):
         self.labelTagsSelected = ColoredLabel(text = 'Selected tags: ' + str(0))
         self.labelTagsAvailable = ColoredLabel(text = '')
         
+        # Debug overlay, refreshed every second
+        self.labelMetrics = None
+        if Metrics.active is not None:
+            self.labelMetrics = ColoredLabel(text = '', background_color = (0.2,0,0,1), font_size = 11, size_hint_x = 2)
+            Clock.schedule_interval(self.updateLabelMetrics, 1)
+        
         self.add_widget(self.labelPage)
         self.add_widget(self.labelItems)
         self.add_widget(self.labelDateTags)
+        self.addLabelMetrics()
+
+    def addLabelMetrics(self):
+        """
+        addLabelMetrics : adds labelMetrics after the other labels, if the metrics are enabled
+        """
+        if self.labelMetrics is not None:
+            self.add_widget(self.labelMetrics)
+
+    def updateLabelMetrics(self, dt):
+        """
+        updateLabelMetrics : updates the text in labelMetrics with the slowest spans
+
+        Args:
+            dt (float): time since the last update
+        """
+        if Metrics.active is not None:
+            self.labelMetrics.text = Metrics.active.overlayText()
 
     def displaySelectedItems(self, n):
         """
@@ -71,6 +98,23 @@ class BottomRow(BoxLayout):
         """
         self.labelPage.text = "Page {}/{}".format(current + 1, last)
     
+    def updateLabelLoading(self):
+        """
+        updateLabelLoading : updates the text in labelPage while the collection is loaded
+        """
+        self.labelPage.text = "Loading..."
+
+    def updateLabelRange(self, first, last, total):
+        """
+        updateLabelRange : updates the text in labelPage with the images shown, when the images are scrolled instead of paged
+
+        Args:
+            first (int): index of the first image shown (the first is 0, so 1 is added)
+            last (int): index after the last image shown
+            total (int): number of images
+        """
+        self.labelPage.text = "{}-{}/{}".format(min(first + 1, last), last, total)
+
     def imgLabels(self):
         """
         imgLabels : updates the widgets to show information relative to images
@@ -79,6 +123,7 @@ class BottomRow(BoxLayout):
         self.add_widget(self.labelPage)
         self.add_widget(self.labelItems)
         self.add_widget(self.labelDateTags)
+        self.addLabelMetrics()
     
     def tagLabels(self, n):
         """
@@ -91,6 +136,7 @@ class BottomRow(BoxLayout):
         self.add_widget(self.labelTagsSelected)
         self.labelTagsAvailable.text = "Available Tags: " + str(n)
         self.add_widget(self.labelTagsAvailable)
+        self.addLabelMetrics()
     
     def updateSelectedTags(self, n):
         """
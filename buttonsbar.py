@@ -21,7 +21,7 @@ class ButtonsBar(BoxLayout):
         - buttonSearch: shows TagsPanel to make a search by tags
         - buttonSearchConfirm: shows PictureGrid, showing the search results
         - buttonSearchClear: clears the search, showing all images
-        - buttonRotate: rotates the selected image 90 degrees clockwise
+        - buttonRotate: rotates the selected images 90 degrees clockwise
         - buttonZip: shows popup to insert the path and name of the zip file
         
     The binding of the buttons to methods is done in the classes that have those methods
@@ -0,0 +1,246 @@
+import sqlite3
+import threading
+import json
+import os
+from cpimage import CPImage
+from cpcollection import CPCollection
+
+class Catalog:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    Catalog : single-file SQLite catalog of the image collection.
+    Stores the path, date, tags and cached exif of every image in indexed tables,
+    so the whole library can be read in bulk instead of opening one json file per image.
+    """
+
+    def __init__(self, path):
+        """
+        __init__ : Catalog class constructor, opens (or creates) the catalog file
+
+        Args:
+            path (String): path to the catalog file
+        """
+        self.path = path
+        # The catalog may be used by background threads, every access goes through self.lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread = False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.createTables()
+
+    def createTables(self):
+        """
+        createTables : creates the tables and indexes of the catalog if they don't exist
+        """
+        with self.lock, self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS images (
+                    id INTEGER PRIMARY KEY,
+                    imageFile TEXT UNIQUE NOT NULL,
+                    date TEXT NOT NULL,
+                    exif TEXT NOT NULL DEFAULT '{}',
+                    extra TEXT NOT NULL DEFAULT '{}'
+                );
+                CREATE TABLE IF NOT EXISTS imageTags (
+                    imageId INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (imageId, tag)
+                );
+                CREATE INDEX IF NOT EXISTS imagesDate ON images(date);
+                CREATE INDEX IF NOT EXISTS imageTagsTag ON imageTags(tag);
+            """)
+
+    def loadImages(self):
+        """
+        loadImages : reads every image of the catalog with two queries
+
+        Returns:
+            list: list of tuples (imageFile, metadata, exif), one per image
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT id, imageFile, date, exif, extra FROM images").fetchall()
+            tagRows = self.connection.execute("SELECT imageId, tag FROM imageTags").fetchall()
+        return Catalog._images(rows, tagRows)
+
+    @staticmethod
+    def _images(rows, tagRows):
+        """
+        _images : turns rows of the images and imageTags tables into images
+
+        Args:
+            rows (list): rows (id, imageFile, date, exif, extra) of the images table
+            tagRows (list): rows (imageId, tag) of the imageTags table
+
+        Returns:
+            list: list of tuples (imageFile, metadata, exif), one per row of the images table
+        """
+        tags = {}
+        for imageId, tag in tagRows:
+            tags.setdefault(imageId, []).append(tag)
+        images = []
+        for imageId, imageFile, date, exif, extra in rows:
+            metadata = json.loads(extra)
+            metadata["date"] = date
+            metadata["tags"] = tags.get(imageId, [])
+            images.append((imageFile, metadata, json.loads(exif)))
+        return images
+
+    def loadFirstImages(self, count):
+        """
+        loadFirstImages : reads the first images of the catalog in date order (dates are stored as YYYY/MM/DD,
+        so their text order is their date order), using the index of the dates
+
+        Args:
+            count (int): number of images
+
+        Returns:
+            list: list of tuples (imageFile, metadata, exif), one per image
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT id, imageFile, date, exif, extra FROM images ORDER BY date, imageFile LIMIT ?",
+                                           (count,)).fetchall()
+            ids = [row[0] for row in rows]
+            tagRows = self.connection.execute("SELECT imageId, tag FROM imageTags WHERE imageId IN ({})".format(
+                ",".join("?" * len(ids))), ids).fetchall()
+        return Catalog._images(rows, tagRows)
+
+    def _saveImage(self, imageFile, metadata, exif):
+        """
+        _saveImage : inserts or updates the row of an image and replaces its tags.
+        Must be called with the lock held and inside a transaction
+
+        Args:
+            imageFile (String): path to the image
+            metadata (Dict): metadata of the image
+            exif (Dict): exif of the image
+        """
+        extra = {k: v for k, v in metadata.items() if k not in ("date", "tags", "exif")}
+        self.connection.execute(
+            "INSERT INTO images (imageFile, date, exif, extra) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(imageFile) DO UPDATE SET date = excluded.date, exif = excluded.exif, extra = excluded.extra",
+            (imageFile, metadata["date"], json.dumps(CPImage.exifSubset(exif), default=str), json.dumps(extra, default=str)))
+        imageId = self.connection.execute("SELECT id FROM images WHERE imageFile = ?", (imageFile,)).fetchone()[0]
+        self.connection.execute("DELETE FROM imageTags WHERE imageId = ?", (imageId,))
+        self.connection.executemany("INSERT OR IGNORE INTO imageTags (imageId, tag) VALUES (?, ?)",
+                                    [(imageId, tag) for tag in metadata["tags"]])
+
+    def saveImage(self, cpimage):
+        """
+        saveImage : saves the metadata of one image
+
+        Args:
+            cpimage (CPImage): image to be saved
+        """
+        with self.lock, self.connection:
+            self._saveImage(cpimage.getImageFile(), cpimage.metadata, cpimage.exif)
+
+    def saveImages(self, cpimages):
+        """
+        saveImages : saves the metadata of several images in a single transaction
+
+        Args:
+            cpimages (iterable): images to be saved
+        """
+        with self.lock, self.connection:
+            for img in cpimages:
+                self._saveImage(img.getImageFile(), img.metadata, img.exif)
+
+    def saveRecords(self, records):
+        """
+        saveRecords : saves metadata copied from images (see MetadataStore) in a single transaction
+
+        Args:
+            records (iterable): (path to the image, metadata with the exif subset in its "exif" key)
+        """
+        with self.lock, self.connection:
+            for imageFile, metadata in records:
+                self._saveImage(imageFile, metadata, metadata.get("exif", {}))
+
+    def renameImage(self, oldFile, newFile):
+        """
+        renameImage : updates the path of an image that was moved
+
+        Args:
+            oldFile (String): previous path of the image
+            newFile (String): new path of the image
+        """
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE images SET imageFile = ? WHERE imageFile = ?", (newFile, oldFile))
+
+    def removeImage(self, imageFile):
+        """
+        removeImage : removes an image (and its tags) from the catalog
+
+        Args:
+            imageFile (String): path to the image
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM images WHERE imageFile = ?", (imageFile,))
+
+    def size(self):
+        """
+        size : returns the number of images in the catalog
+
+        Returns:
+            int: number of images
+        """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def stats(self):
+        """
+        stats : numbers of images of the catalog, without reading the images (used by the command line, see PicLibCLI.stats)
+
+        Returns:
+            tuple: number of images, Dict tag -> number of images with it, first and last readable dates (None if there are none)
+        """
+        with self.lock:
+            count = self.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+            tags = dict(self.connection.execute("SELECT tag, COUNT(*) FROM imageTags GROUP BY tag").fetchall())
+            # Dates typed by the user may not be dates, they are left out (as by DateIndex)
+            first, last = self.connection.execute("SELECT MIN(date), MAX(date) FROM images "
+                                                  "WHERE date GLOB '[0-9][0-9][0-9][0-9]/[0-9][0-9]/[0-9][0-9]'").fetchone()
+        return (count, tags, first, last)
+
+    def close(self):
+        """
+        close : closes the connection to the catalog file
+        """
+        with self.lock:
+            self.connection.close()
+
+    def migrateSidecars(self, collectionFile):
+        """
+        migrateSidecars : one-shot import of the json layout (collection file and its operation log, plus one json file per image)
+        into the catalog. Images without a json file get their date from the exif.
+
+        Args:
+            collectionFile (String): path to the json file of the image collection
+
+        Returns:
+            int: number of images imported
+        """
+        imageFiles = [x["imageFile"] for x in CPCollection.readJson(collectionFile)[1]]
+        with self.lock, self.connection:
+            for imageFile in imageFiles:
+                jsonfile = ".".join(imageFile.split(".")[:-1]) + ".json"
+                metadata = {}
+                if os.path.exists(jsonfile):
+                    with open(jsonfile, 'r') as readfile:
+                        metadata = json.load(readfile)
+                # The image file is only opened if the Json file has no exif subset
+                exif = metadata.get("exif")
+                if exif is None:
+                    exif = CPImage.exifSubset(CPImage.loadExif(imageFile))
+                if "date" not in metadata:
+                    metadata = {"date": CPImage.dateFromExif(exif, imageFile), "tags": []}
+                self._saveImage(imageFile, metadata, exif)
+        return len(imageFiles)
+
+if __name__ == '__main__':
+    # python catalog.py : migrates the json layout of ./PicLib/ into ./PicLib/catalog.db
+    catalog = Catalog("./PicLib/catalog.db")
+    print("Imported {} images into {}".format(catalog.migrateSidecars("./PicLib/mainImgCollection.json"), catalog.path))
+    catalog.close()
@@ -3,11 +3,12 @@ from imagebox import ImageBox
 from kivy.uix.boxlayout import BoxLayout
 from picturegrid import PictureGrid
 from tagspanel import TagsPanel
+from lazypopup import LazyPopup
+from startupprofile import StartupProfile
 from kivy.uix.label import Label
-from zipfile import ZipFile
 import os
 from kivy.uix.button import Button
-from kivy.uix.textinput import TextInput
+from kivy.clock import Clock
 
 class CentralPanel(BoxLayout):
     """
@@ -31,19 +32,25 @@ class CentralPanel(BoxLayout):
         self.bottomRow = self.picLib.getBottomRow()
         self.buttonsBar = middleRow.getButtonsBar()
 
-        self.pictureGrid = PictureGrid(self)
-        self.tagsPanel = TagsPanel(self)
+        # List of selected images and tags
+        # (created before the PictureGrid, its image boxes ask if their image is selected)
+        self.selectedImgs = []
+        self.selectedTags = []
+
+        with StartupProfile.step("PictureGrid"):
+            self.pictureGrid = PictureGrid(self)
+        with StartupProfile.step("TagsPanel"):
+            self.tagsPanel = TagsPanel(self)
 
         self.buttonsBar.buttonAddTagConfirm.bind(on_press = self.addTags)
         self.buttonsBar.buttonRemoveTagConfirm.bind(on_press = self.removeTags)
         self.buttonsBar.buttonSearchConfirm.bind(on_press = self.searchTags)
         
-        # Creation of popup that allows to insert the path and name of the zip file
-        self.createZipPopup()
-
-        # List of selected images and tags
-        self.selectedImgs = []
-        self.selectedTags = []
+        # Popups that allow to insert the path and name of the zip file and show its progress,
+        # created the first time they are opened
+        self.zip = None
+        self.zipProgress = None
+        self.buttonsBar.buttonZip.bind(on_press = LazyPopup.opener(self, "zip", self.createZipPopup))
 
         self.add_widget(self.pictureGrid)
     
@@ -56,6 +63,18 @@ class CentralPanel(BoxLayout):
         """
         return self.selectedImgs
     
+    def isImgSelected(self, img):
+        """
+        isImgSelected : checks if an image is selected
+
+        Args:
+            img (CPImage): image
+
+        Returns:
+            bool: True if the image is in self.selectedImgs
+        """
+        return img in self.selectedImgs
+
     def getMiddleRow(self):
         """
         getMiddleRow : self.middleRow getter
@@ -116,29 +135,29 @@ class CentralPanel(BoxLayout):
                 - buttonAddTag
                 - buttonRemoveTag
                 - buttonZip
+                - buttonRotate
             - buttons enabled if there is only one selected image:
                 - buttonDate
-                - buttonRotate
 
         Args:
-            imgBox (ImageBox): class that implements a selectable image
+            imgBox (ImageBox): class that implements a selectable image (clicked by the user)
         """
         if imgBox.isSelected():
-            self.selectedImgs.append(imgBox.getCPImage())
-        else:
             self.selectedImgs.remove(imgBox.getCPImage())
+        else:
+            self.selectedImgs.append(imgBox.getCPImage())
+        imgBox.drawFrame()
         self.bottomRow.updateInfo(self.selectedImgs)
         
         if len(self.selectedImgs) > 0:
             self.buttonsBar.buttonAddTag.enable()
             self.buttonsBar.buttonRemoveTag.enable()
             self.buttonsBar.buttonZip.enable()
+            self.buttonsBar.buttonRotate.enable()
             if len(self.selectedImgs) == 1:
                 self.buttonsBar.buttonDate.enable()
-                self.buttonsBar.buttonRotate.enable()
             else:
                 self.buttonsBar.buttonDate.disable()
-                self.buttonsBar.buttonRotate.disable()
         else:
             self.buttonsBar.buttonAddTag.disable()
             self.buttonsBar.buttonRemoveTag.disable()
@@ -175,11 +194,17 @@ class CentralPanel(BoxLayout):
     
     def clearSelectedImgs(self):
         """
-        clearSelectedImgs : unselects all images in self.selectedImgs, empties this list and
-        updates the info in BottomRow
+        clearSelectedImgs : unselects all images in self.selectedImgs, empties this list,
+        updates the frame of their image boxes (only the cached ones, the others are drawn when created)
+        and updates the info in BottomRow
         """
-        [ImageBox.makeImageBox(img, self).select() for img in self.selectedImgs]
+        selected = self.selectedImgs
         self.selectedImgs = []
+        for img in selected:
+            box = ImageBox.findImageBox(img)
+            if box is not None:
+                box.drawFrame()
+        self.pictureGrid.drawFrames()
         self.bottomRow.updateInfo(self.selectedImgs)
     
     def clearSelectedTags(self):
@@ -195,20 +220,24 @@ class CentralPanel(BoxLayout):
     
     def addTags(self, button):
         """
-        addTags : adds the selected tags to the selected images and displays the PictureGrid
+        addTags : adds the selected tags to the selected images and displays the PictureGrid.
+        The changes are written in a single batch, once per image, in the background
         """
-        for img in self.selectedImgs:
-            for tag in self.selectedTags:
-                img.addTag(tag.getText())
+        with self.picLib.getAppModule().getMetadataStore().batch():
+            for img in self.selectedImgs:
+                for tag in self.selectedTags:
+                    img.addTag(tag.getText())
         self.displayPictureGrid(button)
     
     def removeTags(self, button):
         """
-        removeTags : removes the selected tags from the selected images and displays the PictureGrid
+        removeTags : removes the selected tags from the selected images and displays the PictureGrid.
+        The changes are written in a single batch, once per image, in the background
         """
-        for img in self.selectedImgs:
-            for tag in self.selectedTags:
-                img.removeTag(tag.getText())
+        with self.picLib.getAppModule().getMetadataStore().batch():
+            for img in self.selectedImgs:
+                for tag in self.selectedTags:
+                    img.removeTag(tag.getText())
         self.displayPictureGrid(button)
     
     def searchTags(self, button):
@@ -244,6 +273,7 @@ class CentralPanel(BoxLayout):
         """
         createZipPopup : creates a popup that allows to insert the path and name of the zip file
         """
+        from kivy.uix.textinput import TextInput
         box = BoxLayout(orientation='vertical')
         box.add_widget(Label(text="Zip save directory:"))
         self.zipfolder = TextInput(multiline=False)
@@ -252,6 +282,10 @@ class CentralPanel(BoxLayout):
         box.add_widget(Label(text = "Zip file name:"))
         self.zipname = TextInput(multiline=False)
         box.add_widget(self.zipname)
+
+        box.add_widget(Label(text = "Maximum size of each zip file (MB, empty for no limit):"))
+        self.zipvolume = TextInput(multiline=False, input_filter='int')
+        box.add_widget(self.zipvolume)
         
         btnZip = Button(text="Zip",size_hint=(0.5, 0.5))
         btnCancel = Button(text="Cancel",size_hint=(0.5, 0.5))
@@ -260,23 +294,61 @@ class CentralPanel(BoxLayout):
         box2.add_widget(btnCancel)
         box.add_widget(box2)
 
-        self.zip = Popup(title='Zip selected images',content=box,size_hint=(None, None), size=(500, 250), auto_dismiss=False)
+        self.zip = Popup(title='Zip selected images',content=box,size_hint=(None, None), size=(500, 330), auto_dismiss=False)
 
         btnZip.bind(on_press = self.createZip)
         btnCancel.bind(on_press = self.cancelZip)
-
-        self.buttonsBar.buttonZip.bind(on_press = self.zip.open)
     
+    def createZipProgressPopup(self):
+        """
+        createZipProgressPopup : creates the popup that shows the progress of a zip export, with a button to cancel it
+        """
+        from kivy.uix.progressbar import ProgressBar
+        box = BoxLayout(orientation='vertical')
+        self.zipProgressBar = ProgressBar(max = 1, value = 0)
+        box.add_widget(self.zipProgressBar)
+        self.zipProgressLabel = Label(text = "")
+        box.add_widget(self.zipProgressLabel)
+        btnCancel = Button(text="Cancel", size_hint=(1, 0.6))
+        btnCancel.bind(on_press = lambda btn: self.zipExporter.cancel())
+        box.add_widget(btnCancel)
+
+        self.zipProgress = Popup(title='Zipping',content=box,size_hint=(None, None), size=(500, 200), auto_dismiss=False)
+
     def createZip(self, button):
         """
         createZip : takes the path and name input by the user to create the zip file containing
-        all selected images
+        all selected images. The zip file is written in the background (see ZipExporter), split in
+        several zip files if a maximum size was input, and the zipProgress popup is updated with its progress events
         """
+        from zipexporter import ZipExporter
         zipInput = os.path.join(self.zipfolder.text, self.zipname.text)
-        with ZipFile(zipInput + '.zip', 'w') as zip:
-            for img in self.selectedImgs:
-                zip.write(img.getImageFile(), os.path.basename(img.getImageFile()))
+        maxVolumeBytes = int(self.zipvolume.text) * 2**20 if self.zipvolume.text != '' else None
+        self.zipExporter = ZipExporter(zipInput, maxVolumeBytes,
+                                       onProgress = lambda progress: Clock.schedule_once(lambda dt: self.updateZipProgress(progress)))
+        zipProgress = LazyPopup.get(self, "zipProgress", self.createZipProgressPopup)
+        self.zipProgressBar.max = 1
+        self.zipProgressBar.value = 0
+        self.zipProgressLabel.text = "Zipping {} images...".format(len(self.selectedImgs))
+        zipProgress.open()
+        self.zipExporter.run([img.getImageFile() for img in self.selectedImgs])
         self.cancelZip(button)
+
+    def updateZipProgress(self, progress):
+        """
+        updateZipProgress : updates the zipProgress popup with a progress event.
+        When the export is finished, the popup is closed and, if some images could not be zipped, a warning popup is opened
+
+        Args:
+            progress (ExportProgress): progress of the export
+        """
+        self.zipProgressBar.max = max(1, progress.totalBytes)
+        self.zipProgressBar.value = progress.bytesDone
+        self.zipProgressLabel.text = str(progress)
+        if progress.finished:
+            self.zipProgress.dismiss()
+            if len(progress.errors) > 0:
+                self.createWarningPopup(str(progress))
     
     def cancelZip(self, button):
         """
@@ -284,4 +356,5 @@ class CentralPanel(BoxLayout):
         """
         self.zipfolder.text = ''
         self.zipname.text = ''
+        self.zipvolume.text = ''
         self.zip.dismiss()
\ No newline at end of file
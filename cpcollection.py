@@ -1,5 +1,8 @@
 from serializable import Serializable
+from metrics import Metrics
+import threading
 import json
+import os
 
 class CPCollection(Serializable):
     """
@@ -9,9 +12,18 @@ class CPCollection(Serializable):
     CPCollection collection of items
     Super class of all classes that represent collections (ImageCollection and TagCollection)
     Contais almost all functionalities that allow saving and loading of the elements of a collection
+    Single changes (addItem, removeItem, updateItem) are appended to an operation log next to the collection's file,
+    which is compacted into the file (the snapshot) in the background once it has as many operations as the collection
+    has items. The collection is loaded from the snapshot, then the operations of the log are replayed.
 
     """
 
+    # Minimum number of operations in the log before it is compacted
+    COMPACT_OPERATIONS = 1000
+
+    # Number of items created between two progress events of loadItems
+    PROGRESS_ITEMS = 2000
+
     def __init__(self, filename, module):
         """
         __init__ construtor
@@ -21,35 +33,279 @@ class CPCollection(Serializable):
             module (AppModule): AppModule instance, allows usage of its methods
         """
         self.items = set()
+        # self.version (int): changes each time items are added or removed, so views of the items can be kept until then
+        self.version = 0
         self.filename = filename
         self.module = module
         self.path = module.getCollectionsRootFolder() + self.filename + ".json"
+        # self.logPath (String): operation log, self.logPath + ".old" is the log being compacted
+        self.logPath = CPCollection.logPathOf(self.path)
+        self.log = None
+        self.loggedOperations = 0
+        # self.lock protects self.items and the log, self.compactLock makes compactions run one at a time
+        self.lock = threading.Lock()
+        self.compactLock = threading.Lock()
     
     def registerItem(self, item):
         """
-        registerItem adds an item to the collection
+        registerItem adds an item to the collection (the change is not saved, see addItem)
 
         Args:
             item (CPImage/Tag): element to be added
         """
-        self.items.add(item)
-    
+        with self.lock:
+            self.items.add(item)
+        self.version += 1
+
+    def registerItems(self, items):
+        """
+        registerItems adds several items to the collection (the change is not saved, see addItems)
+
+        Args:
+            items (list): elements to be added
+        """
+        with self.lock:
+            self.items.update(items)
+        self.version += 1
+
+    def unregisterItem(self, item):
+        """
+        unregisterItem removes an item from the collection, if it is in it (the change is not saved, see removeItem)
+
+        Args:
+            item (CPImage/Tag): element to be removed
+        """
+        with self.lock:
+            self.items.discard(item)
+        self.version += 1
+
+    def addItem(self, item):
+        """
+        addItem adds an item to the collection and saves the change in the operation log
+
+        Args:
+            item (CPImage/Tag): element to be added
+        """
+        self.registerItem(item)
+        self.logOperation("add", item)
+
+    def addItems(self, items):
+        """
+        addItems adds several items to the collection and saves each change in the operation log
+
+        Args:
+            items (list): elements to be added
+        """
+        self.registerItems(items)
+        for item in items:
+            self.logOperation("add", item)
+
+    def removeItem(self, item):
+        """
+        removeItem removes an item from the collection and saves the change in the operation log
+
+        Args:
+            item (CPImage/Tag): element to be removed
+        """
+        self.unregisterItem(item)
+        self.logOperation("remove", item)
+
+    def updateItem(self, item, previous):
+        """
+        updateItem saves in the operation log a change of an item of the collection (ex: an image that was moved)
+
+        Args:
+            item (CPImage/Tag): element that changed
+            previous (Dict): Json of the element before the change
+        """
+        self.logOperation("update", item, previous)
+
+    def logOperation(self, operation, item, previous = None):
+        """
+        logOperation appends an operation to the log, a single line whatever the size of the collection.
+        When the log has as many operations as the collection has items, it is compacted in the background
+
+        Args:
+            operation (String): "add", "remove" or "update"
+            item (CPImage/Tag): element added, removed or updated
+            previous (Dict, optional): Json of the element before an update. Defaults to None.
+        """
+        record = {"op": operation, "item": item.toJson()}
+        if previous is not None:
+            record["previous"] = previous
+        with self.lock:
+            if self.log is None:
+                self.log = open(self.logPath, 'a')
+            self.log.write(json.dumps(record, sort_keys=True, default=str) + "\n")
+            self.log.flush()
+            self.loggedOperations += 1
+        self.compactIfNeeded()
+
+    def compactIfNeeded(self):
+        """
+        compactIfNeeded starts a compaction in a background thread if the log is long enough (see logOperation),
+        or if a previous compaction didn't end
+        """
+        if (self.loggedOperations >= max(CPCollection.COMPACT_OPERATIONS, len(self.items)) or os.path.exists(self.logPath + ".old")) \
+                and not self.compactLock.locked():
+            threading.Thread(target = self.saveCollection, daemon = True).start()
+
     def saveCollection(self):
         """
-        saveCollection saves the collection
+        saveCollection saves the whole collection to its file (the snapshot) and empties the operation log.
+        The log is first renamed, so the operations logged while the snapshot is written are kept,
+        and the snapshot is written to a temporary file first, so a crash can't leave a half written file
         """
-        
-        with open(self.path, 'w') as outfile:
-            json.dump(self.toJson(), outfile, sort_keys=True, indent=4,  default=str)
+        with self.compactLock:
+            with self.lock:
+                items = self.savedItems()
+                if self.log is not None:
+                    self.log.close()
+                    self.log = None
+                if os.path.exists(self.logPath):
+                    if os.path.exists(self.logPath + ".old"):
+                        # The previous compaction didn't end, its log is kept
+                        with open(self.logPath, 'r') as readfile, open(self.logPath + ".old", 'a') as outfile:
+                            outfile.write(readfile.read())
+                        os.remove(self.logPath)
+                    else:
+                        os.replace(self.logPath, self.logPath + ".old")
+                self.loggedOperations = 0
+            with Metrics.span("save collection"):
+                with open(self.path + ".tmp", 'w') as outfile:
+                    json.dump({"filename": self.filename, "items": [x.toJson() for x in items]}, outfile, sort_keys=True, indent=4, default=str)
+                os.replace(self.path + ".tmp", self.path)
+            if os.path.exists(self.logPath + ".old"):
+                os.remove(self.logPath + ".old")
     
+    def savedItems(self):
+        """
+        savedItems returns the items written when the collection is saved. Must be called with the lock held
+
+        Returns:
+            list: items of the collection
+        """
+        return list(self.items)
+
     def loadCollection(self):
         """
-        loadCollection loads a file and reads its content
+        loadCollection loads a file and reads its content, replaying the operation log
+        """
+        self.items = set(self.loadItems())
+        self.version += 1
+        self.compactIfNeeded()
+
+    def loadItems(self, preloaded = (), onProgress = None):
+        """
+        loadItems reads the collection's file and replays the operation log
+
+        Args:
+            preloaded (iterable, optional): items already created, kept instead of the ones with the same Json. Defaults to ().
+            onProgress (function, optional): called with the number of items created and the number of items
+            while they are created (see createItems). Defaults to None.
+
+        Returns:
+            list: list of the items in the file
+        """
+        filename, items, self.loggedOperations = CPCollection.readJson(self.path)
+        if filename is not None:
+            self.filename = filename
+        known = {CPCollection.itemKey(item.toJson()): item for item in preloaded}
+        if len(known) == 0:
+            return CPCollection.createItems(items, lambda x: self.elementFromJson(x, self.module), onProgress)
+        return CPCollection.createItems(items, lambda x: known.get(CPCollection.itemKey(x)) or self.elementFromJson(x, self.module),
+                                        onProgress)
+
+    @staticmethod
+    def createItems(entries, create, onProgress = None):
+        """
+        createItems creates the items of a collection, in chunks of PROGRESS_ITEMS items when their progress is followed
+
+        Args:
+            entries (list): what each item is created from (ex: its Json)
+            create (function): creates an item from its entry
+            onProgress (function, optional): called with the number of items created and the number of entries,
+            after each chunk. Defaults to None.
+
+        Returns:
+            list: the items, in the order of their entries
+        """
+        if onProgress is None:
+            return [create(entry) for entry in entries]
+        created = []
+        for start in range(0, len(entries), CPCollection.PROGRESS_ITEMS):
+            created += [create(entry) for entry in entries[start:start + CPCollection.PROGRESS_ITEMS]]
+            onProgress(len(created), len(entries))
+        return created
+
+    @staticmethod
+    def logPathOf(path):
+        """
+        logPathOf returns the path of the operation log of a collection's file
+
+        Args:
+            path (String): path to the collection's Json file
+
+        Returns:
+            String: path to the log
+        """
+        return (path[:-len(".json")] if path.endswith(".json") else path) + ".log"
+
+    @staticmethod
+    def itemKey(item):
+        """
+        itemKey returns a key identifying the Json of an item, used to find the items of the log operations
+
+        Args:
+            item (Dict): Json of an item
+
+        Returns:
+            String: key of the item
+        """
+        return json.dumps(item, sort_keys=True, default=str)
+
+    @staticmethod
+    def readJson(path):
         """
-        with open(self.path, 'r') as readfile:
-            data = json.load(readfile)
-            self.filename = data["filename"]
-            self.items = set([self.elementFromJson(x, self.module) for x in data["items"]])
+        readJson reads a collection's file and replays the operations of its log (including the log of a compaction
+        that didn't end), without creating the items. Replaying an operation twice has no effect
+
+        Args:
+            path (String): path to the collection's Json file
+
+        Raises:
+            FileNotFoundError: if there is neither a file nor a log
+
+        Returns:
+            tuple: filename (None if there is no file), list of the Json of the items, number of operations replayed
+        """
+        logPath = CPCollection.logPathOf(path)
+        logs = [log for log in (logPath + ".old", logPath) if os.path.exists(log)]
+        filename, items = None, {}
+        if os.path.exists(path):
+            with open(path, 'r') as readfile:
+                data = json.load(readfile)
+            filename = data["filename"]
+            items = {CPCollection.itemKey(x): x for x in data["items"]}
+        elif len(logs) == 0:
+            raise FileNotFoundError(path)
+        operations = 0
+        for log in logs:
+            with open(log, 'r') as readfile:
+                for line in readfile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The last line may have been cut by a crash
+                        break
+                    if record["op"] == "update":
+                        items.pop(CPCollection.itemKey(record["previous"]), None)
+                    if record["op"] == "remove":
+                        items.pop(CPCollection.itemKey(record["item"]), None)
+                    else:
+                        items[CPCollection.itemKey(record["item"])] = record["item"]
+                    operations += 1
+        return (filename, list(items.values()), operations)
     
     def size(self):
         """
@@ -67,7 +323,9 @@ class CPCollection(Serializable):
         Returns:
             Dict: dictionary where the "items" key corresponds to a list of dictionaries. One per item.
         """
-        return {"filename":self.filename, "items":list(map(lambda x: x.toJson(), self.items))}
+        with self.lock:
+            items = self.savedItems()
+        return {"filename":self.filename, "items":list(map(lambda x: x.toJson(), items))}
     
     @staticmethod
     def elementFromJson(json):
@@ -80,6 +338,15 @@ class CPCollection(Serializable):
         """
         raise NotImplementedError("Returns instance")
     
+    def getVersion(self):
+        """
+        getVersion self.version getter
+
+        Returns:
+            int: number that changes each time items are added or removed
+        """
+        return self.version
+
     def getItems(self):
         """
         getItems self.items getter
@@ -1,10 +1,13 @@
 from serializable import Serializable
-from PIL import Image, ExifTags
+from exifreader import ExifReader
+from filetransfer import FileTransfer
+from metrics import Metrics
 import time
 import os
-from shutil import copy, move
+from shutil import move
 import json
 import hashlib
+import mmap
 
 class CPImage(Serializable):
     """
@@ -12,26 +15,183 @@ class CPImage(Serializable):
     Author: 55738 Joao Milagaia
 
      Represents an image.
+     Images are kept compact in memory, as there may be hundreds of thousands of them: they have no __dict__ (__slots__),
+     their path is kept as the folder, shared by the images of the folder, and the name of the file, their dates, tags,
+     hash mode and exif width, height and orientation are shared by the images that have the same ones (see share),
+     and their hash is kept as bytes. The metadata and exif dictionaries are made when they are asked for.
     """
 
-    def __init__(self, imageFile, module):
+    __slots__ = ("module", "folder", "name", "date", "tags", "hash", "hashMode", "extra", "exifDate", "shape")
+
+    # Exif tags that are kept in memory and saved with the metadata, the only ones needed by CPImage
+    EXIF_SUBSET = ("DateTime", "ExifImageWidth", "ExifImageHeight", "Orientation")
+
+    # Values shared by the images (see share)
+    SHARED = {}
+
+    # Extensions of the files named after an image in its folder: its Json file, and the other images with the same name
+    # (the name of an imported image is never one of theirs, see FileTransfer.uniqueDestination)
+    SIBLINGS = (".json", ".jpg", ".jpeg")
+
+    # Exif orientation of an image after a 90 degrees clockwise rotation, for each orientation before it
+    ROTATE_CLOCKWISE = {1: 6, 2: 7, 3: 8, 4: 5, 5: 2, 6: 3, 7: 4, 8: 1}
+
+    def __init__(self, imageFile, module, metadata = None, exif = None):
         """
         __init__ construtor
 
         Args:
             imageFile (String): path to the image's folder
             module (AppModule): AppModule instance, allows the usage of its methods
+            metadata (Dict, optional): already loaded metadata (ex: from the catalog). Defaults to None,
+            in which case it is read from the image's Json file
+            exif (Dict, optional): already loaded exif (ex: from the catalog). Defaults to None,
+            in which case it is read from the metadata or, only when needed, from the image file
         """
         self.module = module
-        self.imageFile = imageFile
-        self.exif = CPImage.loadExif(imageFile)
-        self.jsonfile = ".".join(imageFile.split(".")[:-1]) + ".json"
-        self.metadata = self.getMetaData()
-    
+        # self.folder (String): folder of the image, with the separator at its end, self.name (String): name of its file
+        self.folder = None
+        self.name = None
+        self.setImageFile(imageFile)
+        # self.exifDate (String): DateTime of the exif subset, self.shape (tuple): its width, height and orientation
+        # (None for the tags it doesn't have). self.shape is None until the exif subset is needed (see the exif property)
+        self.exifDate = None
+        self.shape = None
+        if exif is not None:
+            self.setExif(exif)
+        self.setMetadata(metadata if metadata is not None else self.getMetaData())
+
+    @staticmethod
+    def share(value):
+        """
+        share returns the value already kept by an image that is equal to the given one, so it is in memory only once
+        (ex: the date of all the images of a day is a single string)
+
+        Args:
+            value (object): hashable value (String, int, tuple...)
+
+        Returns:
+            object: the shared value
+        """
+        return CPImage.SHARED.setdefault(value, value)
+
+    @property
+    def imageFile(self):
+        """
+        imageFile returns the path to the image
+
+        Returns:
+            String: path to the image
+        """
+        return self.folder + self.name
+
+    @imageFile.setter
+    def imageFile(self, path):
+        self.setImageFile(path)
+
+    @property
+    def jsonfile(self):
+        """
+        jsonfile returns the path to the image's Json file
+
+        Returns:
+            String: path to the Json file
+        """
+        return ".".join(self.imageFile.split(".")[:-1]) + ".json"
+
+    @property
+    def metadata(self):
+        """
+        metadata returns the metadata of the image (date, tags, hash...) as it is saved. It is a new dictionary,
+        changing it doesn't change the image (see setMetadata)
+
+        Returns:
+            Dict: metadata
+        """
+        metadata = dict(self.extra) if self.extra is not None else {}
+        metadata["date"] = self.date
+        metadata["tags"] = list(self.tags)
+        if self.hash is not None:
+            metadata["hash"] = self.hash.hex()
+        if self.hashMode is not None:
+            metadata["hashMode"] = self.hashMode
+        return metadata
+
+    def setMetadata(self, metadata):
+        """
+        setMetadata sets the metadata of the image, as it was saved (the exif subset saved with it is used
+        if the exif is not known yet, it avoids opening the image file)
+
+        Args:
+            metadata (Dict): metadata
+        """
+        # Called for every image loaded, CPImage.SHARED is used directly instead of share
+        shared = CPImage.SHARED
+        extra = dict(metadata)
+        savedExif = extra.pop("exif", None)
+        if self.shape is None and savedExif is not None:
+            self.setExif(savedExif)
+        date = extra.pop("date", None)
+        self.date = shared.setdefault(date, date)
+        self.tags = tuple([shared.setdefault(tag, tag) for tag in extra.pop("tags", ())])
+        hash = extra.pop("hash", None)
+        self.hash = bytes.fromhex(hash) if hash is not None else None
+        hashMode = extra.pop("hashMode", None)
+        self.hashMode = shared.setdefault(hashMode, hashMode)
+        # self.extra (Dict): other keys of the metadata, None if there are none
+        self.extra = extra if len(extra) > 0 else None
+
+    @property
+    def exif(self):
+        """
+        exif returns the exif subset of the image, it is only read from the image file the first time it is needed.
+        It is a new dictionary, changing it doesn't change the image (see setExif)
+
+        Returns:
+            Dict: exif subset (see CPImage.EXIF_SUBSET)
+        """
+        if self.shape is None:
+            self.setExif(CPImage.exifSubset(CPImage.loadExif(self.imageFile)))
+        exif = {}
+        width, height, orientation = self.shape
+        if self.exifDate is not None:
+            exif["DateTime"] = self.exifDate
+        if width is not None:
+            exif["ExifImageWidth"] = width
+        if height is not None:
+            exif["ExifImageHeight"] = height
+        if orientation is not None:
+            exif["Orientation"] = orientation
+        return exif
+
+    def setExif(self, exif):
+        """
+        setExif sets the exif subset of the image
+
+        Args:
+            exif (Dict): exif subset (the tags not in CPImage.EXIF_SUBSET are ignored)
+        """
+        self.exifDate = exif.get("DateTime")
+        self.shape = CPImage.share((exif.get("ExifImageWidth"), exif.get("ExifImageHeight"), exif.get("Orientation")))
+
+    @staticmethod
+    def exifSubset(exif):
+        """
+        exifSubset keeps only the exif tags in CPImage.EXIF_SUBSET
+
+        Args:
+            exif (Dict): exif dictionary
+
+        Returns:
+            Dict: exif subset
+        """
+        return {k: exif[k] for k in CPImage.EXIF_SUBSET if k in exif}
+
     @staticmethod
     def loadExif(imageFile):
         """
-        loadExif loads the exif information of an image from the image file
+        loadExif loads the exif information of an image from the image file.
+        The image's width and height are used when the exif doesn't have them
 
         Args:
             imageFile (String): path to the image's folder
@@ -39,11 +199,17 @@ class CPImage(Serializable):
         Returns:
             exif: Dictionary
         """
+        # PIL is only imported when an image file has to be opened
+        from PIL import Image, ExifTags
         im = Image.open(imageFile)
         exif = {}
-        for k,v in im.getexif().items():
+        raw = im.getexif()
+        # 0x8769 is the Exif IFD, where the image width and height are stored
+        for k,v in list(raw.items()) + list(raw.get_ifd(0x8769).items()):
             if k in ExifTags.TAGS:
                 exif[ExifTags.TAGS[k]] = v
+        exif.setdefault('ExifImageWidth', im.size[0])
+        exif.setdefault('ExifImageHeight', im.size[1])
         im.close()
         return exif
     
@@ -55,8 +221,9 @@ class CPImage(Serializable):
         Returns:
             exif: Dictionary
         """
-        if os.path.exists(self.jsonfile):
-            with open(self.jsonfile, 'r') as readfile:
+        jsonfile = self.jsonfile
+        if os.path.exists(jsonfile):
+            with open(jsonfile, 'r') as readfile:
                 metadata = json.load(readfile)
                 #metadata = {"date": data["date"], "tags": data["tags"]}
         else:
@@ -68,7 +235,7 @@ class CPImage(Serializable):
         getDate returns the date information from an image
 
         """
-        return self.metadata["date"]
+        return self.date
 
     def getDateFromFile(self):
         """
@@ -78,10 +245,24 @@ class CPImage(Serializable):
         Returns:
             String: date
         """
-        if 'DateTime' in self.exif.keys() and self.exif['DateTime'] != None:
-            return self.exif['DateTime'].replace(":","/")[:10]
+        return CPImage.dateFromExif(self.exif, self.getImageFile())
+
+    @staticmethod
+    def dateFromExif(exif, imageFile):
+        """
+        dateFromExif returns the date in the given exif, or the modification date of the file if the exif has no date
+
+        Args:
+            exif (Dict): exif of the image
+            imageFile (String): path to the image's folder
+
+        Returns:
+            String: date
+        """
+        if 'DateTime' in exif.keys() and exif['DateTime'] != None:
+            return exif['DateTime'].replace(":","/")[:10]
         else:
-            return time.strftime('%Y/%m/%d', time.gmtime(os.path.getmtime(self.getImageFile())))
+            return time.strftime('%Y/%m/%d', time.gmtime(os.path.getmtime(imageFile)))
     
     def setDate(self, date):
         """
@@ -90,13 +271,24 @@ class CPImage(Serializable):
         Args:
             date (String): date
         """
-        self.metadata["date"] = date
+        # The Json file is moved with the image, it must be written before
+        self.module.getMetadataStore().flush()
+        self.date = CPImage.share(date)
         collectionsRootFolder = self.module.getCollectionsRootFolder()
         folder = os.path.join(collectionsRootFolder, date)
         os.makedirs(folder, exist_ok = True)
-        move(self.getImageFile(), folder)
-        move(self.jsonfile, folder)
+        oldFile = self.getImageFile()
+        previous = self.toJson()
+        move(oldFile, folder)
+        # With the catalog enabled the image may not have a Json file
+        if os.path.exists(self.jsonfile):
+            move(self.jsonfile, folder)
         self.setImageFile(folder + "/" + os.path.basename(self.imageFile))
+        catalog = self.module.getCatalog()
+        if catalog is not None:
+            catalog.renameImage(oldFile, self.getImageFile())
+        self.module.getThumbnailCache().invalidate(self)
+        self.module.getImgCollection().updateDate(self, previous)
         self.saveMetadata()
 
     def getDimensions(self):
@@ -106,8 +298,35 @@ class CPImage(Serializable):
         Returns:
             tuple: width and height
         """
-        return (self.exif['ExifImageWidth'], self.exif['ExifImageHeight'])
+        exif = self.exif
+        # Exif subsets saved before the width and height were kept don't have them
+        if 'ExifImageWidth' not in exif:
+            exif.update(CPImage.exifSubset(CPImage.loadExif(self.imageFile)))
+            self.setExif(exif)
+        return (exif['ExifImageWidth'], exif['ExifImageHeight'])
     
+    def getOrientation(self):
+        """
+        getOrientation returns the exif orientation of the image (1 to 8, 1 if it has none)
+
+        Returns:
+            int: orientation
+        """
+        return self.exif.get('Orientation', 1)
+
+    def getDisplayDimensions(self):
+        """
+        getDisplayDimensions returns the width and height of the image as it is shown,
+        they are swapped when the exif orientation turns the image 90 degrees
+
+        Returns:
+            tuple: width and height
+        """
+        width, height = self.getDimensions()
+        if self.getOrientation() in (5, 6, 7, 8):
+            return (height, width)
+        return (width, height)
+
     def getImageFile(self):
         """
         getImageFile returns the path to the image's folder
@@ -124,8 +343,9 @@ class CPImage(Serializable):
         Args:
             path (String): image path
         """
-        self.imageFile = path
-        self.jsonfile = ".".join(self.imageFile.split(".")[:-1]) + ".json"
+        separator = max(path.rfind("/"), path.rfind(os.sep))
+        self.folder = CPImage.share(path[:separator + 1])
+        self.name = path[separator + 1:]
     
     def toJson(self):
         """
@@ -150,30 +370,100 @@ class CPImage(Serializable):
         """
         return CPImage(json["imageFile"], module)
     
-    def copyToFolder(self, folder):
+    def copyToFolder(self, folder, mode = None):
         """
         copyToFolder copies a file from an origin folder to a destination folder and saves its metadata
 
         Args:
             folder (String): selected folder
+            mode (String, optional): import mode (see FileTransfer). Defaults to None, for the mode of the AppModule
         """
-        copy(self.getImageFile(), folder)
-        # NEW
-        # self.setImageFile(folder + "/" + os.path.basename(self.imageFile))
-        self.setImageFile(os.path.join(folder, os.path.basename(self.imageFile)))
+        path, used = FileTransfer.transfer(self.getImageFile(), folder, mode or self.module.getImportMode(), CPImage.SIBLINGS)
+        self.setImageFile(path)
         self.saveMetadata()
     
-    def __hash__(self):
+    @staticmethod
+    def fileHash(imageFile):
         """
-        __hash__ creates an hash of an image, in bytes, using MD5
+        fileHash computes the hash of the bytes of a file. The file is mapped in memory (mmap)
+        so it is read by the operating system without being copied
+
+        Args:
+            imageFile (String): path to the file
 
         Returns:
-            int: hash value
+            String: hexadecimal BLAKE2b digest
+        """
+        digest = hashlib.blake2b(digest_size = 20)
+        with open(imageFile, 'rb') as readfile:
+            # Empty files can't be mapped
+            if os.fstat(readfile.fileno()).st_size > 0:
+                with mmap.mmap(readfile.fileno(), 0, access = mmap.ACCESS_READ) as data:
+                    digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def pixelHash(imageFile):
+        """
+        pixelHash computes the hash of the decoded pixels of an image, so the same picture saved
+        with other metadata or another encoding has the same hash. Much slower than fileHash
+
+        Args:
+            imageFile (String): path to the image
+
+        Returns:
+            String: hexadecimal BLAKE2b digest
         """
-        im = Image.open(self.imageFile)
-        h = int(hashlib.md5(im.tobytes()).hexdigest(), 16)
+        from PIL import Image
+        im = Image.open(imageFile)
+        h = hashlib.blake2b(im.tobytes(), digest_size = 20).hexdigest()
         im.close()
         return h
+
+    def getHash(self):
+        """
+        getHash returns the content hash of the image, in the mode given by the AppModule ("file" or "pixels").
+        It is computed only once (usually at import) and saved with the metadata, so the image file is not read
+        again, even if it is rotated later
+
+        Returns:
+            String: hexadecimal digest
+        """
+        mode = self.module.getHashMode()
+        if self.hash is None or self.hashMode != mode:
+            self.setHash(CPImage.pixelHash(self.imageFile) if mode == "pixels" else CPImage.fileHash(self.imageFile), mode)
+        return self.hash.hex()
+
+    def hasHash(self):
+        """
+        hasHash checks if the content hash, in the mode given by the AppModule, is already known
+
+        Returns:
+            bool: True if getHash doesn't need to read the image file
+        """
+        return self.hash is not None and self.hashMode == self.module.getHashMode()
+
+    def setHash(self, hash, mode):
+        """
+        setHash sets the content hash of the image (it is saved with the metadata)
+
+        Args:
+            hash (String): hexadecimal digest
+            mode (String): "file" or "pixels"
+        """
+        self.hash = bytes.fromhex(hash)
+        self.hashMode = CPImage.share(mode)
+
+    def __hash__(self):
+        """
+        __hash__ returns an hash of the image, obtained from its content hash (see getHash)
+
+        Returns:
+            int: hash value
+        """
+        if self.hash is None or self.hashMode != self.module.getHashMode():
+            self.getHash()
+        return int.from_bytes(self.hash[:8], 'big')
     
     def __eq__(self,p):
         """
@@ -185,36 +475,76 @@ class CPImage(Serializable):
         Returns:
             bool: if the two images are equal or not
         """
-        return isinstance(p, CPImage) and self.__hash__() == p.__hash__()
+        if not isinstance(p, CPImage):
+            return False
+        if not self.hasHash():
+            self.getHash()
+        if not p.hasHash():
+            p.getHash()
+        return self.hash == p.hash
         
     @staticmethod
-    def makeCPImage(filename, module):
+    def makeCPImage(filename, module, mode = None):
         """
         makeCPImage obtains the date in which the image was taken/saved.
         Creates a sub-folder in the root folder of the app using getDateFromFile()
             ex: root_folder/YYYY/MM/DD/
 
-        Copies a file to a folder
+        Copies (or moves, or links) a file to a folder
         Returns an instance of CPImage
 
         Args:
             filename (String): name of the file
             module (AppModule): AppModule instance
+            mode (String, optional): import mode (see FileTransfer). Defaults to None, for the mode of the AppModule
         """
         img = CPImage(filename, module)
-        date = img.getDateFromFile()
-        collectionsRootFolder = module.getCollectionsRootFolder()
-        path = os.path.join(collectionsRootFolder, date)
-        os.makedirs(path, exist_ok = True)
-        img.copyToFolder(path)
+        if img.importToDateFolder(mode) == FileTransfer.EXISTING:
+            # The same image is already in the folder, its metadata is kept
+            return CPImage(img.getImageFile(), module)
+        img.saveMetadata()
         return img
+
+    def importToDateFolder(self, mode = None):
+        """
+        importToDateFolder copies the image to the sub-folder of the root folder of the app given by getDateFromFile()
+            ex: root_folder/YYYY/MM/DD/
+        Depending on the import mode, the image may instead be moved or linked there, which only changes directory
+        entries on the same filesystem (see FileTransfer).
+        The metadata is not saved, so the copy and the metadata writing can be done by different threads
+
+        Args:
+            mode (String, optional): import mode. Defaults to None, for the mode of the AppModule
+
+        Returns:
+            String: import mode that was used ("copy" if the given mode couldn't be used),
+            FileTransfer.EXISTING if the same image is already in the folder (the image is then that file)
+        """
+        path = os.path.join(self.module.getCollectionsRootFolder(), self.getDateFromFile())
+        os.makedirs(path, exist_ok = True)
+        path, used = FileTransfer.transfer(self.getImageFile(), path, mode or self.module.getImportMode(), CPImage.SIBLINGS)
+        self.setImageFile(path)
+        return used
     
     def saveMetadata(self):
         """
-        saveMetadata saves the metadata to a Json file
+        saveMetadata saves the metadata through the MetadataStore: the image is marked as changed and its metadata
+        is written later, together with the other changes (see MetadataStore)
         """
-        with open(self.jsonfile, 'w') as json_file:
-            json.dump(self.metadata, json_file, sort_keys=True, indent=4,  default=str)
+        self.module.getMetadataStore().markDirty(self)
+
+    def writeMetadata(self):
+        """
+        writeMetadata writes the metadata, with the exif subset, right away to the catalog if it is enabled,
+        if not to a Json file (used by the import, which already writes from background threads)
+        """
+        catalog = self.module.getCatalog()
+        with Metrics.span("write metadata"):
+            if catalog is not None:
+                catalog.saveImage(self)
+                return
+            with open(self.jsonfile, 'w') as json_file:
+                json.dump(dict(self.metadata, exif = self.exif), json_file, sort_keys=True, indent=4,  default=str)
     
     def addTag(self, tag):
         """
@@ -223,8 +553,9 @@ class CPImage(Serializable):
         Args:
             tag (String): name of the Tag
         """
-        if tag not in self.metadata["tags"]:
-            self.metadata["tags"].append(tag)
+        if tag not in self.tags:
+            self.tags += (CPImage.share(tag),)
+            self.module.getImgCollection().getTagIndex().addTag(self, tag)
             self.saveMetadata()
     
     def removeTag(self, tag):
@@ -234,8 +565,9 @@ class CPImage(Serializable):
         Args:
             tag (String): name of the Tag
         """
-        if tag in self.metadata["tags"]:
-            self.metadata["tags"].remove(tag)
+        if tag in self.tags:
+            self.tags = tuple(t for t in self.tags if t != tag)
+            self.module.getImgCollection().getTagIndex().removeTag(self, tag)
             self.saveMetadata()
     
     def hasTag(self, tag):
@@ -248,20 +580,61 @@ class CPImage(Serializable):
         Returns:
             true or false
         """
-        return tag in self.metadata["tags"]
+        return tag in self.tags
     
     def getTags(self):
         """
         getTags returns the Tags of an image
 
+        Returns:
+            list: names of the tags (a new list, see setTags)
+        """
+        return list(self.tags)
+
+    def setTags(self, tags):
+        """
+        setTags replaces the Tags of an image (they are not saved, see saveMetadata)
+
+        Args:
+            tags (iterable): names of the tags
         """
-        return self.metadata["tags"]
+        self.tags = tuple(CPImage.share(tag) for tag in tags)
     
     def rotate(self):
         """
-        rotate rotates an image by 90 degrees, clockwise
+        rotate rotates an image by 90 degrees, clockwise.
+        If the image has an exif orientation tag, only the tag is changed (in place, the image data is untouched,
+        so there is no loss of quality and it takes milliseconds whatever the size of the image).
+        If not, the tag is added to its exif (or an exif segment is added), the image data is still untouched.
+        Only if the exif can't be changed, the pixels are rotated and the image is encoded again (with some loss of quality,
+        its exif is kept), and its width and height are swapped in the exif subset.
+        Its thumbnails are removed from the cache
 
         """
-        img = Image.open(self.imageFile)
-        rotated = img.rotate(-90, expand = True)
-        rotated.save(self.imageFile)
\ No newline at end of file
+        with Metrics.span("rotate"):
+            # A hardlinked image shares its data with the file it was imported from, which must not be rotated too
+            FileTransfer.detach(self.imageFile)
+            orientation = CPImage.ROTATE_CLOCKWISE.get(ExifReader.orientation(self.imageFile), 6)
+            if ExifReader.writeOrientation(self.imageFile, orientation) or ExifReader.addOrientation(self.imageFile, orientation):
+                self.setExif(dict(self.exif, Orientation = orientation))
+            else:
+                Metrics.count("rotations encoded again")
+                from PIL import Image
+                with Image.open(self.imageFile) as img:
+                    fileExif = img.getexif()
+                    # The pixels are turned, so the orientation of the new file is the normal one
+                    if ExifReader.ORIENTATION in fileExif:
+                        fileExif[ExifReader.ORIENTATION] = 1
+                    rotated = img.rotate(-90, expand = True)
+                    options = {"format": img.format, "exif": fileExif}
+                    if img.format == 'JPEG':
+                        # The quantization tables of the original file are kept, to lose as little quality as possible
+                        options["qtables"] = img.quantization
+                rotated.save(self.imageFile, **options)
+                width, height = self.getDimensions()
+                exif = self.exif
+                exif['ExifImageWidth'], exif['ExifImageHeight'] = height, width
+                exif.pop('Orientation', None)
+                self.setExif(exif)
+        self.module.getThumbnailCache().invalidate(self)
+        self.saveMetadata()
\ No newline at end of file
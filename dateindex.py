@@ -0,0 +1,384 @@
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
+from functools import lru_cache
+from heapq import merge
+from array import array
+import datetime
+
+class DateIndex:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    DateIndex : images of an ImageCollection kept sorted by date, used to show them in date order and to find them by date.
+    The images are kept sorted by their key (day ordinal of their date, path to the image), so adding, removing
+    and finding an image or a date is a binary search, and the collection is never sorted again.
+    The day ordinals are kept in an array of ints (4 bytes per image), and the key each image was added with
+    is kept by image, so an image that is being moved is still found where it was added.
+    """
+
+    # Day ordinal of the dates that can't be read (ex: typed by the user), shown after all the others
+    UNKNOWN = datetime.date.max.toordinal() + 1
+
+    def __init__(self):
+        """
+        __init__ : DateIndex class constructor, the index is empty
+        """
+        # self.images (list): images, sorted by their key
+        self.images = []
+        # self.ordinals (array): day ordinal of each image of self.images
+        self.ordinals = array('i')
+        # self.imageKeys (Dict): id() of the image -> its key in the index (the one it was added with, even if it was moved since).
+        # Images are identified by the object, two images with the same content (equal CPImages) are kept apart
+        self.imageKeys = {}
+        # self.version (int): changes each time the order of the images changes
+        self.version = 0
+
+    @staticmethod
+    @lru_cache(maxsize = 65536)
+    def ordinal(date):
+        """
+        ordinal : day ordinal of a date (number of days since 0001/01/01)
+
+        Args:
+            date (String): date in YYYY/MM/DD format
+
+        Returns:
+            int: day ordinal, DateIndex.UNKNOWN if the date can't be read
+            (the same int for the same date, the results are cached)
+        """
+        try:
+            return datetime.date(*map(int, date.split("/"))).toordinal()
+        except (ValueError, TypeError, AttributeError):
+            return DateIndex.UNKNOWN
+
+    @staticmethod
+    def parseRange(text):
+        """
+        parseRange : reads a range of dates, "YYYY/MM/DD..YYYY/MM/DD". Either side may be left empty for no limit,
+        and a single date is a range of one day. Dates may leave out the day or the month ("2019/06" is all June 2019)
+
+        Args:
+            text (String): range of dates
+
+        Returns:
+            tuple: day ordinals of the first and last days of the range
+
+        Raises:
+            ValueError: if a date can't be read
+        """
+        start, separator, end = text.partition("..")
+        if separator == "":
+            end = start
+        first = DateIndex.boundary(start, False) if start.strip() != "" else 0
+        last = DateIndex.boundary(end, True) if end.strip() != "" else DateIndex.UNKNOWN - 1
+        return (first, last)
+
+    @staticmethod
+    def boundary(date, last):
+        """
+        boundary : day ordinal of the first or last day of a full or partial date
+
+        Args:
+            date (String): date in YYYY, YYYY/MM or YYYY/MM/DD format
+            last (bool): True for the last day of the date, False for the first
+
+        Returns:
+            int: day ordinal
+
+        Raises:
+            ValueError: if the date can't be read
+        """
+        parts = [int(part) for part in date.strip().split("/")]
+        if not 1 <= len(parts) <= 3:
+            raise ValueError("Invalid date: " + date)
+        year = parts[0]
+        month = parts[1] if len(parts) > 1 else (12 if last else 1)
+        day = parts[2] if len(parts) > 2 else (monthrange(year, month)[1] if last else 1)
+        return datetime.date(year, month, day).toordinal()
+
+    @staticmethod
+    def key(img):
+        """
+        key : key of an image in the index
+
+        Args:
+            img (CPImage): image
+
+        Returns:
+            tuple: day ordinal of its date and path to the image
+        """
+        return (DateIndex.ordinal(img.getDate()), img.getImageFile())
+
+    def build(self, imgs):
+        """
+        build : rebuilds the index with the given images (the only time all the images are sorted)
+
+        Args:
+            imgs (iterable): CPImage instances
+        """
+        entries = sorted(((DateIndex.key(img), img) for img in imgs), key = lambda entry: entry[0])
+        self.images = [img for key, img in entries]
+        self.ordinals = array('i', [key[0] for key, img in entries])
+        self.imageKeys = {id(img): key for key, img in entries}
+        self.version += 1
+
+    def pathPosition(self, low, high, imageFile):
+        """
+        pathPosition : position of an image file among images of the same day (sorted by their path)
+
+        Args:
+            low (int): position of the first image of the day
+            high (int): position after the last image of the day
+            imageFile (String): path to the image
+
+        Returns:
+            int: position of the first image whose path is not before the given one
+        """
+        while low < high:
+            middle = (low + high) // 2
+            # The path the image was added with, the images are sorted by it even if one of them is being moved
+            if self.imageKeys[id(self.images[middle])][1] < imageFile:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def add(self, img):
+        """
+        add : adds an image to the index, at the position of its date, if it is not in it
+
+        Args:
+            img (CPImage): image
+        """
+        if id(img) in self.imageKeys:
+            return
+        key = DateIndex.key(img)
+        low = bisect_left(self.ordinals, key[0])
+        position = self.pathPosition(low, bisect_right(self.ordinals, key[0], low), key[1])
+        self.ordinals.insert(position, key[0])
+        self.images.insert(position, img)
+        self.imageKeys[id(img)] = key
+        self.version += 1
+
+    def addAll(self, imgs):
+        """
+        addAll : adds several images to the index (those that are not in it). The new images are sorted,
+        then merged with the images of the index in a single pass, instead of being inserted one at a time
+
+        Args:
+            imgs (iterable): CPImage instances
+        """
+        added = {}
+        for img in imgs:
+            if id(img) not in self.imageKeys:
+                added[id(img)] = (DateIndex.key(img), img)
+        if len(added) == 0:
+            return
+        entries = sorted(added.values(), key = lambda entry: entry[0])
+        indexed = ((self.imageKeys[id(img)], img) for img in self.images)
+        merged = list(merge(indexed, entries, key = lambda entry: entry[0]))
+        self.images = [img for key, img in merged]
+        self.ordinals = array('i', [key[0] for key, img in merged])
+        self.imageKeys.update((id(img), key) for key, img in entries)
+        self.version += 1
+
+    def remove(self, img):
+        """
+        remove : removes an image from the index, if it is in it.
+        The image is found by a binary search on the key it was added with, even if it was moved since
+
+        Args:
+            img (CPImage): image
+        """
+        key = self.imageKeys.get(id(img))
+        if key is None:
+            return
+        low = bisect_left(self.ordinals, key[0])
+        high = bisect_right(self.ordinals, key[0], low)
+        position = self.pathPosition(low, high, key[1])
+        # Two images have the same path while one of them is being moved: the image is among those with its path
+        while self.images[position] is not img:
+            position += 1
+        del self.imageKeys[id(img)]
+        del self.ordinals[position]
+        del self.images[position]
+        self.version += 1
+
+    def update(self, img):
+        """
+        update : moves an image to the position of its new date (used when its date changes), if it is in the index
+
+        Args:
+            img (CPImage): image
+        """
+        if id(img) in self.imageKeys:
+            self.remove(img)
+            self.add(img)
+
+    def size(self):
+        """
+        size : number of images in the index
+
+        Returns:
+            int: number of images
+        """
+        return len(self.images)
+
+    def getVersion(self):
+        """
+        getVersion : self.version getter
+
+        Returns:
+            int: number that changes each time the order of the images changes
+        """
+        return self.version
+
+    def getImages(self):
+        """
+        getImages : images sorted by date (the list of the index, it must not be changed)
+
+        Returns:
+            list: CPImage instances
+        """
+        return self.images
+
+    def position(self, ordinal):
+        """
+        position : position in date order of the first image of a day or, if there is none, of the first image after it
+
+        Args:
+            ordinal (int): day ordinal
+
+        Returns:
+            int: position of the image (the number of images if every image is before the day)
+        """
+        return bisect_left(self.ordinals, ordinal)
+
+    @staticmethod
+    def positionIn(imgs, ordinal):
+        """
+        positionIn : same as position, for any list of images sorted by date (ex: the images shown by the PictureGrid)
+
+        Args:
+            imgs (list): CPImage instances, sorted by date
+            ordinal (int): day ordinal
+
+        Returns:
+            int: position of the image (the number of images if every image is before the day)
+        """
+        low, high = 0, len(imgs)
+        while low < high:
+            middle = (low + high) // 2
+            if DateIndex.ordinal(imgs[middle].getDate()) < ordinal:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def page(self, page, imgsPerPage):
+        """
+        page : images of a page, when the images are shown in date order
+
+        Args:
+            page (int): page (the first is 0)
+            imgsPerPage (int): number of images per page
+
+        Returns:
+            list: CPImage instances
+        """
+        return self.images[page * imgsPerPage : (page + 1) * imgsPerPage]
+
+    def pageOfDate(self, date, imgsPerPage):
+        """
+        pageOfDate : page with the first image of a date (or of the next date with images)
+
+        Args:
+            date (String): date in YYYY/MM/DD format (the day or the month may be left out)
+            imgsPerPage (int): number of images per page
+
+        Returns:
+            int: page (the first is 0)
+
+        Raises:
+            ValueError: if the date can't be read
+        """
+        position = min(self.position(DateIndex.boundary(date, False)), max(0, len(self.images) - 1))
+        return position // imgsPerPage
+
+    def findRange(self, text):
+        """
+        findRange : finds the images of a range of dates, see parseRange
+
+        Args:
+            text (String): range of dates, ex: "2019/06/01..2019/08/31"
+
+        Returns:
+            DateRangeView: the images found
+
+        Raises:
+            ValueError: if a date can't be read
+        """
+        first, last = DateIndex.parseRange(text)
+        return DateRangeView(self, first, last)
+
+class DateRangeView:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    DateRangeView : result of a DateIndex range query. It only keeps the range, the images are the part of
+    the index between its first and last days when they are asked for. It can be displayed by the PictureGrid
+    like an ImageCollection (size, getItems and getVersion).
+    """
+    def __init__(self, index, first, last):
+        """
+        __init__ : DateRangeView class constructor
+
+        Args:
+            index (DateIndex): index that was queried
+            first (int): day ordinal of the first day
+            last (int): day ordinal of the last day
+        """
+        self.index = index
+        self.first = first
+        self.last = last
+
+    def bounds(self):
+        """
+        bounds : positions of the images of the range in the index
+
+        Returns:
+            tuple: position of the first image and position after the last one
+        """
+        return (self.index.position(self.first), self.index.position(self.last + 1))
+
+    def size(self):
+        """
+        size : number of images in the range
+
+        Returns:
+            int: number of images
+        """
+        start, end = self.bounds()
+        return end - start
+
+    def getItems(self):
+        """
+        getItems : images in the range, in date order
+
+        Returns:
+            list: CPImage instances
+        """
+        start, end = self.bounds()
+        return self.index.getImages()[start:end]
+
+    def getVersion(self):
+        """
+        getVersion : the images of the range are taken from the index each time they are asked for,
+        so they change with the index
+
+        Returns:
+            int: version of the index
+        """
+        return self.index.getVersion()
@@ -0,0 +1,249 @@
+import struct
+import os
+
+class ExifReader:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ExifReader : reads the exif segment (APP1) of a JPEG file directly, without decoding the image.
+    Used to get the thumbnail that cameras embed in the exif (IFD1) and the orientation of the image,
+    and to change or add the orientation without touching the image data (lossless rotation).
+    """
+
+    # Size in bytes of each TIFF field type
+    TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+    ORIENTATION = 0x0112
+    THUMBNAIL_OFFSET = 0x0201
+    THUMBNAIL_LENGTH = 0x0202
+
+    @staticmethod
+    def readExifSegment(imageFile):
+        """
+        readExifSegment : finds the exif segment of a JPEG file, reading only the segments before it
+
+        Args:
+            imageFile (String): path to the image
+
+        Returns:
+            tuple: (TIFF data of the exif, position of the TIFF data in the file), or None if the file has no exif
+        """
+        with open(imageFile, 'rb') as readfile:
+            if readfile.read(2) != b'\xff\xd8':
+                return None
+            while True:
+                marker = readfile.read(2)
+                while len(marker) == 2 and marker[0] == 0xFF and marker[1] == 0xFF:
+                    # Fill bytes before a marker
+                    marker = marker[1:] + readfile.read(1)
+                # SOS (start of the image data) or EOI: there are no more metadata segments
+                if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xDA, 0xD9):
+                    return None
+                header = readfile.read(2)
+                if len(header) < 2:
+                    return None
+                length = struct.unpack('>H', header)[0] - 2
+                if marker[1] == 0xE1:
+                    data = readfile.read(length)
+                    if data[:6] == b'Exif\x00\x00':
+                        return (data[6:], readfile.tell() - length + 6)
+                else:
+                    readfile.seek(length, 1)
+
+    @staticmethod
+    def readIfd(tiff, offset, order):
+        """
+        readIfd : reads the entries of an IFD (list of tags) of the TIFF data
+
+        Args:
+            tiff (bytes): TIFF data of the exif
+            offset (int): position of the IFD in the TIFF data
+            order (str): byte order, '<' or '>'
+
+        Returns:
+            tuple: (Dict tag -> (type, count, position of the value in the TIFF data), position of the next IFD or 0)
+        """
+        count = struct.unpack_from(order + 'H', tiff, offset)[0]
+        entries = {}
+        for i in range(count):
+            position = offset + 2 + 12 * i
+            tag, type, n = struct.unpack_from(order + 'HHI', tiff, position)
+            if ExifReader.TYPE_SIZES.get(type, 1) * n <= 4:
+                # Values of 4 bytes or less are stored in the entry itself
+                entries[tag] = (type, n, position + 8)
+            else:
+                entries[tag] = (type, n, struct.unpack_from(order + 'I', tiff, position + 8)[0])
+        nextIfd = struct.unpack_from(order + 'I', tiff, offset + 2 + 12 * count)[0]
+        return (entries, nextIfd)
+
+    @staticmethod
+    def readInt(tiff, entry, order):
+        """
+        readInt : reads the value of a SHORT or LONG entry
+
+        Args:
+            tiff (bytes): TIFF data of the exif
+            entry (tuple): (type, count, position of the value)
+            order (str): byte order, '<' or '>'
+
+        Returns:
+            int: value of the entry
+        """
+        type, n, position = entry
+        return struct.unpack_from(order + ('H' if type == 3 else 'I'), tiff, position)[0]
+
+    @staticmethod
+    def parse(imageFile):
+        """
+        parse : reads the IFD0 (main image) and IFD1 (embedded thumbnail) of a JPEG file
+
+        Args:
+            imageFile (String): path to the image
+
+        Returns:
+            Dict: "tiff", "tiffOffset", "order", "ifd0" and "ifd1" (ifd1 is {} if there is no thumbnail),
+            or None if the file has no readable exif
+        """
+        segment = ExifReader.readExifSegment(imageFile)
+        if segment is None:
+            return None
+        tiff, tiffOffset = segment
+        try:
+            order = {b'II': '<', b'MM': '>'}[tiff[:2]]
+            ifd0, nextIfd = ExifReader.readIfd(tiff, struct.unpack_from(order + 'I', tiff, 4)[0], order)
+            ifd1 = ExifReader.readIfd(tiff, nextIfd, order)[0] if nextIfd != 0 else {}
+        except (KeyError, struct.error):
+            return None
+        return {"tiff": tiff, "tiffOffset": tiffOffset, "order": order, "ifd0": ifd0, "ifd1": ifd1}
+
+    @staticmethod
+    def orientation(imageFile):
+        """
+        orientation : reads the exif orientation of a JPEG file
+
+        Args:
+            imageFile (String): path to the image
+
+        Returns:
+            int: orientation (1 to 8), 1 if the file has none
+        """
+        exif = ExifReader.parse(imageFile)
+        if exif is None or ExifReader.ORIENTATION not in exif["ifd0"]:
+            return 1
+        return ExifReader.readInt(exif["tiff"], exif["ifd0"][ExifReader.ORIENTATION], exif["order"])
+
+    @staticmethod
+    def writeOrientation(imageFile, orientation):
+        """
+        writeOrientation : changes the exif orientation of a JPEG file in place, only the 2 (or 4) bytes of its value
+        are written, the rest of the file (and the image data) is left untouched
+
+        Args:
+            imageFile (String): path to the image
+            orientation (int): new orientation (1 to 8)
+
+        Returns:
+            bool: True if the orientation was written, False if the file has no orientation tag to change
+        """
+        exif = ExifReader.parse(imageFile)
+        if exif is None or ExifReader.ORIENTATION not in exif["ifd0"]:
+            return False
+        type, n, position = exif["ifd0"][ExifReader.ORIENTATION]
+        if type not in (3, 4):
+            return False
+        with open(imageFile, 'r+b') as outfile:
+            outfile.seek(exif["tiffOffset"] + position)
+            outfile.write(struct.pack(exif["order"] + ('H' if type == 3 else 'I'), orientation))
+        return True
+
+    @staticmethod
+    def addOrientation(imageFile, orientation):
+        """
+        addOrientation : adds an exif orientation tag to a JPEG file that has none, without decoding the image.
+        If the file has no exif, an exif segment with only the orientation is inserted (after the JFIF segment if there
+        is one). If not, a copy of its IFD0 with the orientation is added at the end of the exif, and the TIFF header
+        points to it (the old IFD0 is left unused, so the positions of the other values of the exif don't change).
+        The file is written again, to another file first so a crash can't leave a half written image
+
+        Args:
+            imageFile (String): path to the image
+            orientation (int): orientation (1 to 8)
+
+        Returns:
+            bool: True if the orientation was added, False if the file is not a JPEG or its exif can't be changed
+        """
+        with open(imageFile, 'rb') as readfile:
+            data = readfile.read()
+        if data[:2] != b'\xff\xd8':
+            return False
+        exif = ExifReader.parse(imageFile)
+        if exif is None:
+            if ExifReader.readExifSegment(imageFile) is not None:
+                # There is an exif segment, but it can't be read
+                return False
+            # TIFF header (big endian, IFD0 right after it) and an IFD0 with only the orientation
+            tiff = b'MM\x00\x2a' + struct.pack('>I', 8) + struct.pack('>H', 1)
+            tiff += struct.pack('>HHIHH', ExifReader.ORIENTATION, 3, 1, orientation, 0) + struct.pack('>I', 0)
+            start = end = 2
+            if data[2:4] == b'\xff\xe0':
+                # The JFIF segment must stay the first one
+                start = end = 4 + struct.unpack_from('>H', data, 4)[0]
+        else:
+            tiff, order, ifd0 = exif["tiff"], exif["order"], exif["ifd0"]
+            if ExifReader.ORIENTATION in ifd0:
+                return False
+            try:
+                offset = struct.unpack_from(order + 'I', tiff, 4)[0]
+                count = struct.unpack_from(order + 'H', tiff, offset)[0]
+                entries = [tiff[offset + 2 + 12 * i:offset + 14 + 12 * i] for i in range(count)]
+                nextIfd = tiff[offset + 2 + 12 * count:offset + 6 + 12 * count]
+            except struct.error:
+                return False
+            entries.append(struct.pack(order + 'HHIHH', ExifReader.ORIENTATION, 3, 1, orientation, 0))
+            # The entries of an IFD are sorted by tag
+            entries.sort(key = lambda entry: struct.unpack_from(order + 'H', entry)[0])
+            # An IFD starts on an even position
+            tiff += b'\x00' * (len(tiff) % 2)
+            newOffset = len(tiff)
+            tiff = tiff[:4] + struct.pack(order + 'I', newOffset) + tiff[8:]
+            tiff += struct.pack(order + 'H', len(entries)) + b''.join(entries) + nextIfd
+            start = exif["tiffOffset"] - 10
+            end = exif["tiffOffset"] + len(exif["tiff"])
+        segment = b'Exif\x00\x00' + tiff
+        if len(segment) + 2 > 0xFFFF:
+            return False
+        tmp = imageFile + ".tmp"
+        with open(tmp, 'wb') as outfile:
+            outfile.write(data[:start])
+            outfile.write(b'\xff\xe1' + struct.pack('>H', len(segment) + 2) + segment)
+            outfile.write(data[end:])
+        os.replace(tmp, imageFile)
+        return True
+
+    @staticmethod
+    def embeddedThumbnail(imageFile):
+        """
+        embeddedThumbnail : reads the JPEG thumbnail embedded in the exif of a JPEG file, without decoding the image
+
+        Args:
+            imageFile (String): path to the image
+
+        Returns:
+            bytes: the thumbnail JPEG file, or None if the file has no embedded thumbnail
+        """
+        exif = ExifReader.parse(imageFile)
+        if exif is None:
+            return None
+        tiff, order, ifd1 = exif["tiff"], exif["order"], exif["ifd1"]
+        if ExifReader.THUMBNAIL_OFFSET not in ifd1 or ExifReader.THUMBNAIL_LENGTH not in ifd1:
+            return None
+        try:
+            offset = ExifReader.readInt(tiff, ifd1[ExifReader.THUMBNAIL_OFFSET], order)
+            length = ExifReader.readInt(tiff, ifd1[ExifReader.THUMBNAIL_LENGTH], order)
+        except struct.error:
+            return None
+        thumbnail = tiff[offset:offset + length]
+        if len(thumbnail) != length or thumbnail[:2] != b'\xff\xd8':
+            return None
+        return thumbnail
@@ -0,0 +1,188 @@
+from shutil import copy, copy2, copymode
+import threading
+import filecmp
+import errno
+import os
+
+class FileTransfer:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    FileTransfer : puts an image file into the collection's folder, in one of these import modes:
+        - "copy": the file is copied (the original is kept, the collection takes the same space again)
+        - "move": the file is moved, only its directory entry changes if it stays on the same filesystem
+        - "hardlink": the collection's file is a second name of the original, no data is written.
+          Only on the same filesystem
+        - "reflink": the collection's file shares the data of the original until one of them is changed (copy on write).
+          Only on filesystems that support it (Btrfs, XFS, APFS...), otherwise the kernel copies the data
+          itself (copy_file_range), without it going through Python
+    When a mode can't be used (ex: a hardlink to another disk), the file is copied.
+    A file of the folder is never replaced: when the name is already used, the new file is named "name (2).ext",
+    "name (3).ext"... (as in ZipExporter.arcnames), unless the file with that name has the same content,
+    in which case it is the copy of the file and nothing is written.
+    """
+
+    MODES = ("copy", "move", "hardlink", "reflink")
+
+    # Mode returned by transfer when a file with the same name and content is already in the folder
+    EXISTING = "existing"
+
+    # Held while a name is chosen and its file created, so two threads never choose the same name
+    nameLock = threading.Lock()
+
+    # ioctl of Linux that clones a file (FICLONE)
+    FICLONE = 0x40049409
+
+    @staticmethod
+    def transfer(source, folder, mode = "copy", siblings = ()):
+        """
+        transfer : puts a file into a folder, under a name not used in the folder (see uniqueDestination).
+        If the file, or a file with its name (or "name (2).ext"...) and its content, is already in the folder,
+        nothing is written and the source file is left untouched (even in the "move" mode)
+
+        Args:
+            source (String): path to the file
+            folder (String): destination folder
+            mode (String, optional): import mode, see FileTransfer.MODES. Defaults to "copy".
+            siblings (tuple, optional): extensions of the files named after the file (see uniqueDestination). Defaults to ().
+
+        Returns:
+            tuple: path to the new file and the mode that was used ("copy" if the given mode couldn't be used),
+            or path to the file already in the folder and FileTransfer.EXISTING
+
+        Raises:
+            ValueError: if the mode is unknown
+        """
+        if mode not in FileTransfer.MODES:
+            raise ValueError("Unknown import mode: " + str(mode))
+        existing = os.path.join(folder, os.path.basename(source))
+        if os.path.exists(existing) and os.path.samefile(source, existing):
+            return (existing, mode)
+        destination, found = FileTransfer.uniqueDestination(folder, os.path.basename(source), siblings, source)
+        if found:
+            return (destination, FileTransfer.EXISTING)
+        try:
+            if mode == "move":
+                try:
+                    # Only the directory entry changes on the same filesystem
+                    os.replace(source, destination)
+                except OSError:
+                    copy2(source, destination)
+                    os.remove(source)
+                return (destination, mode)
+            if mode != "copy":
+                # Made under a temporary name and renamed, the empty file created by uniqueDestination is replaced
+                temporary = destination + ".import"
+                try:
+                    if mode == "hardlink":
+                        os.link(source, temporary)
+                    else:
+                        mode = FileTransfer.reflink(source, temporary)
+                    os.replace(temporary, destination)
+                    return (destination, mode)
+                except OSError:
+                    FileTransfer.remove(temporary)
+            copy(source, destination)
+            return (destination, "copy")
+        except BaseException:
+            # The name is given back, the source file is still there
+            FileTransfer.remove(destination)
+            raise
+
+    @staticmethod
+    def uniqueDestination(folder, name, siblings = (), source = None):
+        """
+        uniqueDestination : creates an empty file in a folder, named after the given name if it isn't used,
+        if not "name (2).ext", "name (3).ext"... The file is created exclusively, so it is never an existing file,
+        even if another thread or process chooses the same name at the same time.
+        If one of these names is the name of a file with the same content as the source file, no file is created
+
+        Args:
+            folder (String): folder
+            name (String): name of the file
+            siblings (tuple, optional): extensions of the files named after the file (ex: ".json" for its metadata),
+            a name is not used if one of them exists, in lower or upper case. Defaults to ().
+            source (String, optional): path to the file whose copy is looked for, None to not look for it. Defaults to None.
+
+        Returns:
+            tuple: path of the created file and False, or path of the file with the content of source and True
+        """
+        root, extension = os.path.splitext(name)
+        count = 1
+        with FileTransfer.nameLock:
+            while True:
+                candidate = root if count == 1 else "{} ({})".format(root, count)
+                count += 1
+                path = os.path.join(folder, candidate + extension)
+                # The sizes are compared first, the contents only if they are equal
+                if source is not None and os.path.isfile(path) and filecmp.cmp(source, path, shallow = False):
+                    return (path, True)
+                if any(os.path.exists(os.path.join(folder, candidate + sibling)) for sibling in
+                       {variant for sibling in siblings for variant in (sibling.lower(), sibling.upper())}):
+                    continue
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                except FileExistsError:
+                    continue
+                return (path, False)
+
+    @staticmethod
+    def remove(path):
+        """
+        remove : removes a file, if it exists
+
+        Args:
+            path (String): path to the file
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def reflink(source, destination):
+        """
+        reflink : clones a file if the filesystem allows it, otherwise copies it in the kernel (copy_file_range)
+
+        Args:
+            source (String): path to the file
+            destination (String): path to the new file
+
+        Returns:
+            String: "reflink" if the file was cloned, "copy" if it was copied
+
+        Raises:
+            OSError: if the file can be neither cloned nor copied in the kernel (ex: on Windows)
+        """
+        with open(source, 'rb') as readfile, open(destination, 'wb') as writefile:
+            try:
+                import fcntl
+                fcntl.ioctl(writefile.fileno(), FileTransfer.FICLONE, readfile.fileno())
+                mode = "reflink"
+            except (ImportError, OSError):
+                if not hasattr(os, "copy_file_range"):
+                    raise OSError(errno.ENOTSUP, "Reflinks are not supported", source)
+                remaining = os.fstat(readfile.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(readfile.fileno(), writefile.fileno(), remaining)
+                    if copied == 0:
+                        raise OSError(errno.EIO, "File truncated while copied", source)
+                    remaining -= copied
+                mode = "copy"
+        copymode(source, destination)
+        return mode
+
+    @staticmethod
+    def detach(path):
+        """
+        detach : gives a file its own copy of its data if it is a hardlink, so it can be changed
+        without changing the original (used before an image is changed in place, ex: rotated)
+
+        Args:
+            path (String): path to the file
+        """
+        if os.stat(path).st_nlink > 1:
+            temporary = path + ".detach"
+            copy(path, temporary)
+            os.replace(temporary, path)
@@ -1,6 +1,8 @@
 from kivy.uix.relativelayout import RelativeLayout
 from kivy.uix.image import Image
 from kivy.graphics import Color, Rectangle
+from kivy.clock import Clock
+from imageboxcache import ImageBoxCache
 
 class ImageBox(RelativeLayout):
     """
@@ -10,11 +12,17 @@ class ImageBox(RelativeLayout):
     ImageBox is a classe that implements a selectable image. The image 
     is drawn in a white frame. When the image is selected, the frame becomes red. 
     An ImageBox instance contain an instance of CPImage. 
+    The selected images are kept by the CentralPanel, so an ImageBox can be evicted
+    from the cache and created again without losing its selection.
     """
-    # a class attribute that contain a dictionary of ImageBoxes created. The 
+    # a class attribute that contain a bounded cache of ImageBoxes created. The 
     # objective is to speed up the application by avoiding the creation of 
-    # new objects each time a image is shown in the UI.
-    imb_dict = dict()
+    # new objects each time a image is shown in the UI, without keeping
+    # the boxes (and textures) of every image of the library in memory.
+    cache = ImageBoxCache()
+
+    # height of the image inside the white frame
+    IMAGE_HEIGHT = 140
 
     def __init__(self, cpimage, centralPanel, **kwargs):
         """
@@ -25,30 +33,63 @@ class ImageBox(RelativeLayout):
             centralPanel (CentralPanel): CentralPanel layout used to update the selected images
         """
         super().__init__(**kwargs)
-        self.selected = False
         self.size_hint = (None, None)
         #self.height = 300
         self.height = 150
-        self.image = Image(source=cpimage.getImageFile())
         self.cpImage = cpimage
+        self.centralPanel = centralPanel
+        self.thumbnailCache = centralPanel.getPicLib().getAppModule().getThumbnailCache()
+        # The image file is never shown, only its thumbnail, which is generated in the background if needed.
+        # Until then, the thumbnail embedded in the exif is shown, if there is one
+        thumbnail = self.thumbnailCache.get(cpimage, ImageBox.IMAGE_HEIGHT)
+        self.image = Image(source=thumbnail or self.thumbnailCache.getPreview(cpimage) or '')
         self.add_widget(self.image)
         #self.image.allow_stretch = True
         self.image.allow_stretch = False
         self.image.keep_ratio = False
         self.image.size_hint_x = None
         self.image.size_hint_y = None
-        imageratio = self.image.get_image_ratio()
-        #self.width = 290 * imageratio + 10
-        self.width = 140 * imageratio + 10
-        #self.image.size = (290 * imageratio,290)
-        self.image.size = (140 * imageratio,140)
+        self.updateSize()
         self.image.pos = (5, 5)
         with self.canvas.before:
-            Color(1,1,1,1)
+            self.frameColor = Color(1,1,1,1)
             self.rect = Rectangle(size=self.size, pos=(0,0))
         self.bind(pos=ImageBox.__update_rect, size=ImageBox.__update_rect)
+        self.drawFrame()
 
-        self.centralPanel = centralPanel
+        if thumbnail is None:
+            self.requestThumbnail()
+
+    def updateSize(self):
+        """
+        updateSize : updates the width of the ImageBox and the size of its image using the ratio of the image.
+        The ratio is taken from the image's dimensions (turned by its exif orientation, like the thumbnails),
+        so it is known before the thumbnail is loaded
+        """
+        width, height = self.cpImage.getDisplayDimensions()
+        imageratio = width / height
+        #self.width = 290 * imageratio + 10
+        self.width = ImageBox.IMAGE_HEIGHT * imageratio + 10
+        #self.image.size = (290 * imageratio,290)
+        self.image.size = (ImageBox.IMAGE_HEIGHT * imageratio, ImageBox.IMAGE_HEIGHT)
+
+    def requestThumbnail(self):
+        """
+        requestThumbnail : asks the thumbnail cache for the thumbnail of the image, it is shown when it is ready
+        """
+        # The thumbnail is ready in a background thread, the image is updated in the UI thread
+        self.thumbnailCache.request(self.cpImage, ImageBox.IMAGE_HEIGHT,
+                                    lambda path: Clock.schedule_once(lambda dt: self.setThumbnail(path)))
+
+    def setThumbnail(self, path):
+        """
+        setThumbnail : shows a thumbnail in the ImageBox
+
+        Args:
+            path (str): path of the thumbnail, None if it couldn't be generated
+        """
+        if path is not None:
+            self.image.source = path
 
     @staticmethod    
     def __update_rect(instance, value):
@@ -65,8 +106,8 @@ class ImageBox(RelativeLayout):
     @classmethod
     def makeImageBox(cls, cpimage, centralPanel):
         """
-        makeImageBox : given a CPImage instance, returns the associated ImageBox instance if there is one,
-        or creates a new one if there isn't
+        makeImageBox : given a CPImage instance, returns the associated ImageBox instance if it is in the cache,
+        or creates a new one (and adds it to the cache) if it isn't
 
         Args:
             cpimage (CPImage): CPImage instance associated with the ImageBox instance
@@ -75,47 +116,64 @@ class ImageBox(RelativeLayout):
         Returns:
             ImageBox: ImageBox instance
         """
-        imfile = cpimage.getImageFile()
-        if imfile in ImageBox.imb_dict:
-            return ImageBox.imb_dict[imfile]
+        imb = ImageBox.cache.get(cpimage.getHash())
+        if imb is not None:
+            # The selection may have changed while the box was not shown
+            imb.drawFrame()
+            return imb
         imb = ImageBox(cpimage, centralPanel)
-        ImageBox.imb_dict[imfile] = imb
+        ImageBox.cache.put(cpimage.getHash(), imb, imb.textureBytes())
         return imb
 
+    @classmethod
+    def findImageBox(cls, cpimage):
+        """
+        findImageBox : returns the ImageBox of a CPImage instance if it is in the cache, without creating it
+
+        Args:
+            cpimage (CPImage): CPImage instance associated with the ImageBox instance
+
+        Returns:
+            ImageBox: ImageBox instance, or None
+        """
+        return ImageBox.cache.peek(cpimage.getHash())
+
+    def textureBytes(self):
+        """
+        textureBytes : estimated size of the texture of the ImageBox (4 bytes per pixel of the shown image)
+
+        Returns:
+            int: size in bytes
+        """
+        return int(self.image.width * self.image.height * 4)
+
     def on_touch_down(self, touch):
         """
         on_touch_down : Provides instructions for when the ImageBox is clicked by the user
         """
         if self.collide_point(*touch.pos):
-            print(self.image.source + ' pressed')
+            print(self.cpImage.getImageFile() + ' pressed')
             #*******************
             # add code below to do something
-            self.select()
             self.centralPanel.updateSelectedImgs(self)
             
-    def select(self):
+    def drawFrame(self):
         """
-        select : updates the color of the border and the self.selected atribute
+        drawFrame : updates the color of the border, red if the image is selected and white if it isn't
         """
-        if self.selected:
-            with self.canvas.before:
-                Color(1,1,1,1)
-                self.rect = Rectangle(size=self.size, pos=(0,0))
-            self.selected = False
+        if self.isSelected():
+            self.frameColor.rgba = (1,0,0,1)
         else:
-            with self.canvas.before:
-                Color(1,0,0,1)
-                self.rect = Rectangle(size=self.size, pos=(0,0))
-            self.selected = True
+            self.frameColor.rgba = (1,1,1,1)
 
     def isSelected(self):
         """
-        isSelected : self.selected getter (used to know if ImageBox is selected)
+        isSelected : used to know if ImageBox is selected (the selection is kept by the CentralPanel)
 
         Returns:
             bool: True if ImageBox is selected
         """
-        return self.selected
+        return self.centralPanel.isImgSelected(self.cpImage)
     
     def getCPImage(self):
         """
@@ -131,9 +189,15 @@ class ImageBox(RelativeLayout):
         rotate : rotates the image associated with the ImageBox instance and updates its width and image size
         """
         self.cpImage.rotate()
-        self.image.reload()
-        imageratio = self.image.get_image_ratio()
-        #self.width = 290 * imageratio + 10
-        self.width = 140 * imageratio + 10
-        #self.image.size = (290 * imageratio,290)
-        self.image.size = (140 * imageratio,140)
\ No newline at end of file
+        self.refreshRotation()
+
+    def refreshRotation(self):
+        """
+        refreshRotation : updates the width, image size and thumbnail of the ImageBox after its image was rotated
+        (by rotate, or by a RotationBatch in the background)
+        """
+        self.updateSize()
+        # The thumbnails of the image were removed by CPImage.rotate, the texture of the old one is removed from Kivy's cache
+        self.image.remove_from_cache()
+        self.image.source = self.thumbnailCache.getPreview(self.cpImage) or ''
+        self.requestThumbnail()
\ No newline at end of file
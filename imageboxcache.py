@@ -0,0 +1,104 @@
+from collections import OrderedDict
+
+class ImageBoxCache:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ImageBoxCache : bounded cache of ImageBox widgets. It is limited by the number of boxes and by the
+    estimated size of their textures, and evicts the least recently shown boxes first.
+    Counts hits, misses and evictions.
+    """
+    def __init__(self, maxEntries = 300, maxBytes = 128 * 2**20):
+        """
+        __init__ : ImageBoxCache class constructor
+
+        Args:
+            maxEntries (int, optional): maximum number of boxes. Defaults to 300.
+            maxBytes (int, optional): maximum estimated size of the textures of the boxes, in bytes. Defaults to 128MB.
+        """
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        # self.boxes (OrderedDict): key -> (ImageBox, estimated bytes), least recently shown first
+        self.boxes = OrderedDict()
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        get : returns a box and marks it as the most recently shown
+
+        Args:
+            key (String): key of the box
+
+        Returns:
+            ImageBox: the box, or None if it is not in the cache
+        """
+        if key not in self.boxes:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.boxes.move_to_end(key)
+        return self.boxes[key][0]
+
+    def peek(self, key):
+        """
+        peek : returns a box without changing the order of eviction or the counters
+
+        Args:
+            key (String): key of the box
+
+        Returns:
+            ImageBox: the box, or None if it is not in the cache
+        """
+        entry = self.boxes.get(key)
+        return None if entry is None else entry[0]
+
+    def put(self, key, box, size):
+        """
+        put : adds a box to the cache and evicts the least recently shown ones if the cache is over its limits
+
+        Args:
+            key (String): key of the box
+            box (ImageBox): box
+            size (int): estimated size of the box's texture, in bytes
+        """
+        self.remove(key)
+        self.boxes[key] = (box, size)
+        self.totalBytes += size
+        while len(self.boxes) > 1 and (len(self.boxes) > self.maxEntries or self.totalBytes > self.maxBytes):
+            oldKey, (oldBox, oldSize) = self.boxes.popitem(last = False)
+            self.totalBytes -= oldSize
+            self.evictions += 1
+
+    def remove(self, key):
+        """
+        remove : removes a box from the cache, if it is in it
+
+        Args:
+            key (String): key of the box
+        """
+        entry = self.boxes.pop(key, None)
+        if entry is not None:
+            self.totalBytes -= entry[1]
+
+    def size(self):
+        """
+        size : number of boxes in the cache
+
+        Returns:
+            int: number of boxes
+        """
+        return len(self.boxes)
+
+    def stats(self):
+        """
+        stats : counters of the cache
+
+        Returns:
+            Dict: entries, bytes, hits, misses and evictions
+        """
+        return {"entries": len(self.boxes), "bytes": self.totalBytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
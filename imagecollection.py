@@ -1,5 +1,14 @@
 from cpcollection import CPCollection
 from cpimage import CPImage
+from importpipeline import ImportPipeline
+from importledger import ImportLedger
+from tagindex import TagIndex
+from dateindex import DateIndex
+from filetransfer import FileTransfer
+from metrics import Metrics
+from fnmatch import fnmatchcase
+from heapq import nsmallest
+import threading
 import os
 
 class ImageCollection(CPCollection):
@@ -10,34 +19,241 @@ class ImageCollection(CPCollection):
      Represents a collection of images.
     """
 
-    def scanFolder(self, folder = "./fotos/"):
+    # Name patterns of the files imported by scanFolder (compared in lower case)
+    JPG_PATTERNS = ("*.jpg", "*.jpeg")
+
+    def __init__(self, filename, module):
+        """
+        __init__ ImageCollection class constructor
+
+        Args:
+            filename (String): name of the file where the collection will be stored
+            module (AppModule): AppModule instance, allows usage of its methods
+        """
+        super().__init__(filename, module)
+        # self.tagIndex (TagIndex): tags of the images of the collection, used by findWithTags
+        self.tagIndex = TagIndex()
+        # self.dateIndex (DateIndex): images of the collection sorted by date, used by getItems and findDates
+        self.dateIndex = DateIndex()
+        # self.unhashed (Dict): id() of the image -> image loaded without a content hash. They are in the indexes,
+        # but not in self.items (a set of images needs their hash) until backfillHashes hashes them
+        self.unhashed = {}
+        # Only one thread hashes the images at a time
+        self.backfillLock = threading.Lock()
+
+    def registerItem(self, item):
+        """
+        registerItem redefinition of the registerItem method, the image is also added to the tag and date indexes
+
+        Args:
+            item (CPImage): image to be added
+        """
+        super().registerItem(item)
+        self.tagIndex.add(item)
+        self.dateIndex.add(item)
+
+    def registerItems(self, items):
+        """
+        registerItems redefinition of the registerItems method, the images are also added to the tag index,
+        and merged into the date index in a single pass (see DateIndex.addAll)
+
+        Args:
+            items (list): images to be added
+        """
+        super().registerItems(items)
+        for item in items:
+            self.tagIndex.add(item)
+        self.dateIndex.addAll(items)
+
+    def unregisterItem(self, item):
+        """
+        unregisterItem redefinition of the unregisterItem method, the image is also removed from the tag and date indexes
+
+        Args:
+            item (CPImage): image to be removed
+        """
+        with self.lock:
+            unhashed = self.unhashed.pop(id(item), None) is not None
+        if unhashed:
+            self.version += 1
+        else:
+            super().unregisterItem(item)
+        self.tagIndex.remove(item)
+        self.dateIndex.remove(item)
+
+    def updateDate(self, item, previous):
+        """
+        updateDate moves an image to its new date in the date index and saves its new path
+        in the operation log (called by CPImage.setDate)
+
+        Args:
+            item (CPImage): image whose date changed
+            previous (Dict): Json of the image before it was moved
+        """
+        self.dateIndex.update(item)
+        self.version += 1
+        self.updateItem(item, previous)
+
+    def logOperation(self, operation, item, previous = None):
+        """
+        logOperation redefinition of the logOperation method.
+        If the catalog is enabled, the operation is applied to it (a single row), if not it is appended to the log
+
+        Args:
+            operation (String): "add", "remove" or "update"
+            item (CPImage): image added, removed or updated
+            previous (Dict, optional): Json of the image before an update. Defaults to None.
+        """
+        catalog = self.module.getCatalog()
+        if catalog is None:
+            super().logOperation(operation, item, previous)
+        elif operation == "add":
+            catalog.saveImage(item)
+        elif operation == "remove":
+            catalog.removeImage(item.getImageFile())
+        # The path of a moved image is already updated in the catalog by CPImage.setDate
+
+    def getTagIndex(self):
         """
-        scanFolder used to import a set of images.
+        getTagIndex self.tagIndex getter
+
+        Returns:
+            TagIndex: tags of the images of the collection
+        """
+        return self.tagIndex
+
+    def getDateIndex(self):
+        """
+        getDateIndex self.dateIndex getter
+
+        Returns:
+            DateIndex: images of the collection sorted by date
+        """
+        return self.dateIndex
+
+    def savedItems(self):
+        """
+        savedItems redefinition of the savedItems method, the images not hashed yet are saved too
+
+        Returns:
+            list: images of the collection
+        """
+        return list(self.items) + list(self.unhashed.values())
+
+    def size(self):
+        """
+        size redefinition of the size method, the images not hashed yet are counted too
+
+        Returns:
+            int: number of images in the collection
+        """
+        return self.dateIndex.size()
+
+    def getItems(self):
+        """
+        getItems redefinition of the getItems method, the images are given in date order (taken from the date index,
+        the collection is not sorted)
+
+        Returns:
+            list: images of the collection sorted by date (the list must not be changed)
+        """
+        return self.dateIndex.getImages()
+
+    def scanFolder(self, folder = "./fotos/", onProgress = None, threads = 4, processes = 0, exclude = (), maxDepth = None, importMode = None):
+        """
+        scanFolder used to import a set of images, using an ImportPipeline.
+        The images are sent to the pipeline as they are found, the folder tree is never held in memory.
+        Files already imported by a previous scan, or with the content of an image of the collection, are skipped
+        (see ImportLedger), and files that changed since are imported again, replacing their previous copy
+        in the collection (keeping its tags).
+        Can be called outside of the UI thread, in which case onProgress is also called outside of it.
 
         Args:
             folder (String): folder with images to scan
+            onProgress (function, optional): called with ImportProgress instances during the import. Defaults to None.
+            threads (int, optional): number of threads of each stage of the import. Defaults to 4.
+            processes (int, optional): number of processes used to read the exif (0 to not use processes). Defaults to 0.
+            exclude (tuple, optional): name patterns of the files and folders to skip. Defaults to ().
+            maxDepth (int, optional): maximum depth of the sub-folders to scan, None for no limit. Defaults to None.
+            importMode (String, optional): "copy", "move", "hardlink" or "reflink" (see FileTransfer).
+            Defaults to None, for the mode of the AppModule.
+
+        Returns:
+            ScanSummary: files added, changed, skipped and that could not be imported
+        """
+        ledger = ImportLedger(self.module.getCollectionsRootFolder() + "importLedger.json")
+        self.backfillHashes()
+        with self.lock:
+            imgs = list(self.items)
+        # Files with the content of an image of the collection are skipped, also when the ledger doesn't know them
+        # (ex: a library imported before there was a ledger)
+        known = {img.getHash(): img.getImageFile() for img in imgs}
+        pipeline = ImportPipeline(self.module, ledger, threads = threads, processes = processes, onProgress = onProgress,
+                                  importMode = importMode, known = known)
+        with Metrics.span("import"):
+            cpimg = pipeline.run(ImageCollection.allJPGFiles(folder, exclude, maxDepth, onError = pipeline.addError))
+            with self.module.getMetadataStore().batch():
+                for previousImageFile, img in pipeline.replaced:
+                    self.replaceImage(previousImageFile, img)
+            self.addItems(cpimg)
+            ledger.save()
+        Metrics.count("images imported", len(pipeline.summary.added) + len(pipeline.summary.changed))
+        Metrics.count("import errors", len(pipeline.summary.errors))
+        return pipeline.summary
+
+    def findImageFile(self, imageFile):
+        """
+        findImageFile finds the image of the collection with the given path
+
+        Args:
+            imageFile (String): path to the image
+
+        Returns:
+            CPImage: the image, or None if it is not in the collection
+        """
+        with self.lock:
+            imgs = self.savedItems()
+        for img in imgs:
+            if img.getImageFile() == imageFile:
+                return img
+        return None
+
+    def replaceImage(self, previousImageFile, img):
+        """
+        replaceImage removes from the collection the previous copy of an image imported again,
+        its tags are given to the new copy. The files of the previous copy (made by the import for the same source file)
+        are removed, the new copy never replaces them (see FileTransfer.uniqueDestination)
+
+        Args:
+            previousImageFile (String): path of the previous copy
+            img (CPImage): new copy of the image
         """
-        img_list = ImageCollection.allJPGFiles(folder)
-        paths = map(lambda x: x.path, img_list)
-        cpimg = [CPImage.makeCPImage(x, self.module) for x in paths]
-        list(map(self.registerItem, cpimg))
-        self.saveCollection()
+        previous = self.findImageFile(previousImageFile)
+        if previous is None:
+            return
+        self.removeItem(previous)
+        img.setTags(previous.getTags())
+        img.saveMetadata()
+        if previous.getImageFile() != img.getImageFile():
+            FileTransfer.remove(previous.getImageFile())
+            FileTransfer.remove(previous.jsonfile)
     
     @staticmethod
-    def allJPGFiles(folder):
+    def allJPGFiles(folder, exclude = (), maxDepth = None, onError = None):
         """
-        allJPGFiles uses the allFiles function, uses a filter to only obtain the wanted files.
+        allJPGFiles uses the walkFiles function to only obtain the wanted files.
 
         Args:
             folder (String): folder with images to scan
+            exclude (tuple, optional): name patterns of the files and folders to skip. Defaults to ().
+            maxDepth (int, optional): maximum depth of the sub-folders to scan, None for no limit. Defaults to None.
+            onError (function, optional): called with the path and the OSError of each folder that can't be read. Defaults to None.
 
         Returns:
-            list: List of wanted files
+            generator: os.DirEntry of the wanted files, as they are found
         """
-        img = ImageCollection.allFiles(folder)
-        format = (".jpg", ".jpeg", ".JPG", ".JPEG")
-        return list(filter(lambda x: x.name.endswith(format), img))
-    
+        return ImageCollection.walkFiles(folder, ImageCollection.JPG_PATTERNS, exclude, maxDepth, onError)
+
     @staticmethod
     def splitIf(func, l):
         """
@@ -49,14 +265,13 @@ class ImageCollection(CPCollection):
             func: function that returns True or False
             l (list): list to split
         """
-        def _splitIf(func, l, result):
-                if l == []: return result
-                if func(l[0]):
-                    result[0].append(l[0])
-                else:
-                    result[1].append(l[0])
-                return _splitIf(func, l[1:], result)
-        return _splitIf(func, l, ([], []))
+        result = ([], [])
+        for x in l:
+            if func(x):
+                result[0].append(x)
+            else:
+                result[1].append(x)
+        return result
 
     @staticmethod
     def allFiles(folder):
@@ -65,15 +280,220 @@ class ImageCollection(CPCollection):
 
         Args:
             folder (String): folder with images to scan
+
+        Returns:
+            list: os.DirEntry of all files
         """
-        def _allFiles(folder):
-            it1 = list(os.scandir(folder))
-            folders, files = ImageCollection.splitIf(lambda x: x.is_dir(), it1)
-            for f in folders:
-                files.extend(_allFiles(f))
-            return files
-        return _allFiles(folder)
+        return list(ImageCollection.walkFiles(folder))
+
+    @staticmethod
+    def walkFiles(folder, include = ("*",), exclude = (), maxDepth = None, onError = None):
+        """
+        walkFiles iterative scan of a folder and its sub-folders, yields the files as they are found.
+        Only the folders still to scan are kept in memory, and DirEntry.is_dir() uses the information
+        obtained by os.scandir, so no extra system call is made per file.
+        Symbolic links to folders are not followed, and folders that can't be read are skipped (after calling onError)
+        while the rest of the tree is still scanned.
+
+        Args:
+            folder (String): folder to scan
+            include (tuple, optional): name patterns of the files to yield (compared in lower case). Defaults to ("*",).
+            exclude (tuple, optional): name patterns of the files and folders to skip (compared in lower case). Defaults to ().
+            maxDepth (int, optional): maximum depth of the sub-folders to scan (0 scans only the given folder),
+            None for no limit. Defaults to None.
+            onError (function, optional): called with the path and the OSError of each folder that can't be read
+            (or stops being readable while it is scanned), None to skip them silently. Defaults to None.
+
+        Yields:
+            os.DirEntry: files whose name matches one of the include patterns
+        """
+        include = [pattern.lower() for pattern in include]
+        exclude = [pattern.lower() for pattern in exclude]
+        folders = [(folder, 0)]
+        while folders:
+            current, depth = folders.pop()
+            try:
+                it = os.scandir(current)
+            except OSError as e:
+                if onError is not None:
+                    onError(current, e)
+                continue
+            with it:
+                try:
+                    for entry in it:
+                        name = entry.name.lower()
+                        if any(fnmatchcase(name, pattern) for pattern in exclude):
+                            continue
+                        if entry.is_dir(follow_symlinks = False):
+                            if maxDepth is None or depth < maxDepth:
+                                folders.append((entry.path, depth + 1))
+                        elif any(fnmatchcase(name, pattern) for pattern in include):
+                            yield entry
+                except OSError as e:
+                    if onError is not None:
+                        onError(current, e)
     
+    def loadCollection(self, preloaded = (), onProgress = None):
+        """
+        loadCollection redefinition of the loadCollection method.
+        If the catalog is enabled, every image is read from it in bulk (no Json file is opened),
+        if not the collection's Json file is loaded.
+        Images saved without a content hash (see CPImage.getHash) are shown right away, and get one
+        in a background thread (see backfillHashes)
+
+        Args:
+            preloaded (iterable, optional): images already read by loadFirst, kept instead of being read again
+            (so the images shown while the collection was loaded are the images of the collection). Defaults to ().
+            onProgress (function, optional): called with the number of images read and the number of images
+            of the collection while they are read (see CPCollection.createItems). Defaults to None.
+        """
+        catalog = self.module.getCatalog()
+        if catalog is None:
+            imgs = self.loadItems(preloaded, onProgress)
+        else:
+            known = {img.getImageFile(): img for img in preloaded}
+
+            def create(row):
+                imageFile, metadata, exif = row
+                return known.get(imageFile) or CPImage(imageFile, self.module, metadata, exif)
+
+            imgs = CPCollection.createItems(catalog.loadImages(), create, onProgress)
+        hashed, unhashed = ImageCollection.splitIf(lambda img: img.hasHash(), imgs)
+        with self.lock:
+            self.items = set(hashed)
+            self.unhashed = {id(img): img for img in unhashed}
+            imgs = self.savedItems()
+        self.version += 1
+        self.dateIndex.build(imgs)
+        # The ids of the tag index follow the date order, so search results are mostly in date order too
+        self.tagIndex.build(self.dateIndex.getImages())
+        if len(unhashed) > 0:
+            threading.Thread(target = self.backfillHashes, daemon = True).start()
+        if catalog is None:
+            self.compactIfNeeded()
+
+    def backfillHashes(self):
+        """
+        backfillHashes computes the content hash of the images loaded without one (saved by an older version),
+        and saves it with their metadata so it's only computed once. The images are then added to self.items,
+        and those with the content of another image of the collection are removed from the indexes
+        (as the collection only keeps one image per content). Run in a background thread by loadCollection,
+        and by scanFolder, which needs the hashes of all the images
+        """
+        with self.backfillLock:
+            with self.lock:
+                imgs = list(self.unhashed.values())
+            if len(imgs) == 0:
+                return
+            with Metrics.span("hash backfill"):
+                [img.getHash() for img in imgs]
+            with self.module.getMetadataStore().batch():
+                [img.saveMetadata() for img in imgs]
+            duplicates = []
+            with self.lock:
+                for img in imgs:
+                    # Images removed meanwhile are left out
+                    if self.unhashed.pop(id(img), None) is None:
+                        continue
+                    if img in self.items:
+                        duplicates.append(img)
+                    else:
+                        self.items.add(img)
+            for img in duplicates:
+                self.tagIndex.remove(img)
+                self.dateIndex.remove(img)
+            self.version += 1
+
+    def loadFirst(self, count):
+        """
+        loadFirst reads only the first images of the collection in date order, without loading the collection,
+        so they can be shown while the collection is loaded. The images are kept in the folder of their date,
+        so the order of their paths is their date order (see DateIndex).
+        The time taken doesn't depend on the size of the collection: the catalog reads them with its date index,
+        and without it they are read from the first date folders (see firstInDateFolders).
+        The collection's Json file is only read if no image is found in the date folders
+
+        Args:
+            count (int): number of images
+
+        Returns:
+            list: CPImage instances, sorted by date (empty if the collection was never saved)
+        """
+        with Metrics.span("load first page"):
+            catalog = self.module.getCatalog()
+            if catalog is not None:
+                return [CPImage(imageFile, self.module, metadata, exif) for imageFile, metadata, exif in catalog.loadFirstImages(count)]
+            imgs = self.firstInDateFolders(count)
+            if len(imgs) > 0:
+                return imgs
+            try:
+                filename, items, operations = CPCollection.readJson(self.path)
+            except FileNotFoundError:
+                return []
+            return [self.elementFromJson(x, self.module) for x in nsmallest(count, items, key = lambda x: x["imageFile"])]
+
+    def firstInDateFolders(self, count):
+        """
+        firstInDateFolders reads the first images of the date folders of the collection (root/YYYY/MM/DD/), in date order.
+        Only the folders of the first dates are listed, and only the images with a Json file
+        (the images imported, see CPImage.writeMetadata) are read
+
+        Args:
+            count (int): number of images
+
+        Returns:
+            list: CPImage instances, sorted by date
+        """
+        imgs = []
+        root = self.module.getCollectionsRootFolder()
+        for year in ImageCollection.numberedFolders(root):
+            for month in ImageCollection.numberedFolders(os.path.join(root, year)):
+                for day in ImageCollection.numberedFolders(os.path.join(root, year, month)):
+                    # Same path as the one given by CPImage.importToDateFolder
+                    folder = os.path.join(root, "/".join((year, month, day)))
+                    names = sorted(entry.name for entry in os.scandir(folder)
+                                   if entry.is_file() and any(fnmatchcase(entry.name.lower(), pattern) for pattern in ImageCollection.JPG_PATTERNS))
+                    for name in names:
+                        imageFile = os.path.join(folder, name)
+                        if os.path.exists(os.path.splitext(imageFile)[0] + ".json"):
+                            imgs.append(CPImage(imageFile, self.module))
+                            if len(imgs) == count:
+                                return imgs
+        return imgs
+
+    @staticmethod
+    def numberedFolders(folder):
+        """
+        numberedFolders returns the sub-folders of a folder whose name is a number (the date folders), in numeric order
+
+        Args:
+            folder (String): folder
+
+        Returns:
+            list: names of the sub-folders (empty if the folder can't be read)
+        """
+        try:
+            with os.scandir(folder) as it:
+                names = [entry.name for entry in it if entry.name.isdigit() and entry.is_dir(follow_symlinks = False)]
+        except OSError:
+            return []
+        return sorted(names, key = int)
+
+    def saveCollection(self):
+        """
+        saveCollection redefinition of the saveCollection method.
+        If the catalog is enabled, all images are saved to it in a single transaction,
+        if not the collection is saved to its Json file
+        """
+        catalog = self.module.getCatalog()
+        if catalog is None:
+            super().saveCollection()
+        else:
+            with self.lock:
+                imgs = self.savedItems()
+            with Metrics.span("save collection"):
+                catalog.saveImages(imgs)
+
     @staticmethod
     def elementFromJson(json, module):
         """
@@ -88,16 +508,34 @@ class ImageCollection(CPCollection):
         """
         return CPImage.fromJson(json, module)
     
-    def findWithTags(self, tags):
+    def findWithTags(self, tags, allTags = (), noTags = ()):
         """
-        findWithTags : finds all images in the collection that have one of the given tags
+        findWithTags : finds all images in the collection that have one of the given tags, using the tag index.
+        The images are not copied to a new collection, the result only refers to them
 
         Args:
-            tags (list): list of tags (str) to search
+            tags (list): list of tags (str) to search, the images have at least one of them (ignored if empty)
+            allTags (list, optional): tags the images must all have. Defaults to ().
+            noTags (list, optional): tags the images must not have. Defaults to ().
 
         Returns:
-            ImageCollection: new instance of ImageCollection with the results of the search
+            TagQueryView: the results of the search, displayed like an ImageCollection
+        """
+        with Metrics.span("search tags"):
+            return self.tagIndex.query(tags, allTags, noTags)
+
+    def findDates(self, dates):
+        """
+        findDates : finds all images in the collection taken in a range of dates, using the date index
+
+        Args:
+            dates (str): range of dates, ex: "2019/06/01..2019/08/31" (see DateIndex.parseRange)
+
+        Returns:
+            DateRangeView: the results of the search, displayed like an ImageCollection
+
+        Raises:
+            ValueError: if a date can't be read
         """
-        searchColl = ImageCollection("search", self.module)
-        list(map(searchColl.registerItem,filter(lambda img: any(searchtag in img.metadata["tags"] for searchtag in tags), self.items)))
-        return searchColl
\ No newline at end of file
+        with Metrics.span("search dates"):
+            return self.dateIndex.findRange(dates)
\ No newline at end of file
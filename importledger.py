@@ -0,0 +1,111 @@
+import threading
+import json
+import os
+
+class ImportLedger:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ImportLedger : persistent record of every file imported by scanFolder, used to skip files already imported.
+    Each source file is recorded by its absolute path, size, modification time and content hash, together with
+    the path of its copy in the collection's root folder.
+    """
+
+    # Status of a source file
+    NEW = "new"
+    UNCHANGED = "unchanged"
+    CHANGED = "changed"
+
+    def __init__(self, path):
+        """
+        __init__ : ImportLedger class constructor, loads the ledger file if it exists
+
+        Args:
+            path (String): path to the ledger's Json file
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # self.entries (Dict): absolute source path -> {"size", "mtime", "hash", "imageFile"}
+        self.entries = {}
+        # self.hashes (Dict): content hash -> absolute source path, to find files already imported from another path
+        self.hashes = {}
+        if os.path.exists(path):
+            with open(path, 'r') as readfile:
+                self.entries = json.load(readfile)
+            self.hashes = {entry["hash"]: source for source, entry in self.entries.items()}
+
+    def status(self, path, size, mtime):
+        """
+        status : compares a source file with its record, without reading the file
+
+        Args:
+            path (String): path to the source file
+            size (int): size of the file
+            mtime (int): modification time of the file, in nanoseconds
+
+        Returns:
+            String: ImportLedger.NEW, ImportLedger.UNCHANGED or ImportLedger.CHANGED
+        """
+        with self.lock:
+            entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return ImportLedger.NEW
+        if entry["size"] == size and entry["mtime"] == mtime:
+            return ImportLedger.UNCHANGED
+        return ImportLedger.CHANGED
+
+    def findHash(self, hash):
+        """
+        findHash : returns the record of a file already imported with the given content hash
+
+        Args:
+            hash (String): content hash
+
+        Returns:
+            Dict: record of the file, or None if no file with this content was imported
+        """
+        with self.lock:
+            entry = self.entries.get(self.hashes.get(hash))
+        # The file may have changed since it was recorded with this hash
+        return entry if entry is not None and entry["hash"] == hash else None
+
+    def getImageFile(self, path):
+        """
+        getImageFile : returns the path of the copy of a source file in the collection's root folder
+
+        Args:
+            path (String): path to the source file
+
+        Returns:
+            String: path of the copy, or None if the file was never imported
+        """
+        with self.lock:
+            entry = self.entries.get(os.path.abspath(path))
+        return None if entry is None else entry["imageFile"]
+
+    def record(self, path, size, mtime, hash, imageFile):
+        """
+        record : records an imported (or skipped) source file
+
+        Args:
+            path (String): path to the source file
+            size (int): size of the file
+            mtime (int): modification time of the file, in nanoseconds
+            hash (String): content hash of the file
+            imageFile (String): path of the copy in the collection's root folder
+        """
+        source = os.path.abspath(path)
+        with self.lock:
+            self.entries[source] = {"size": size, "mtime": mtime, "hash": hash, "imageFile": imageFile}
+            self.hashes[hash] = source
+
+    def save(self):
+        """
+        save : saves the ledger to its Json file. A temporary file is written first, so a crash
+        can't leave a half written ledger
+        """
+        with self.lock:
+            with open(self.path + ".tmp", 'w') as outfile:
+                json.dump(self.entries, outfile)
+            os.replace(self.path + ".tmp", self.path)
@@ -0,0 +1,482 @@
+from cpimage import CPImage
+from importledger import ImportLedger
+from filetransfer import FileTransfer
+from queue import Queue
+import threading
+import time
+
+def readExifSubset(imageFile):
+    """
+    readExifSubset : reads the exif subset of an image file.
+    Module level function so it can be sent to the worker processes
+
+    Args:
+        imageFile (String): path to the image
+
+    Returns:
+        Dict: exif subset (see CPImage.EXIF_SUBSET)
+    """
+    return CPImage.exifSubset(CPImage.loadExif(imageFile))
+
+class ImportItem:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ImportItem : a file going through the stages of the ImportPipeline
+    """
+    def __init__(self, path, size, mtime, status):
+        """
+        __init__ : ImportItem class constructor
+
+        Args:
+            path (String): path to the source file
+            size (int): size of the file
+            mtime (int): modification time of the file, in nanoseconds
+            status (String): status of the file in the ImportLedger
+        """
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.status = status
+        # Path of the copy made by the previous import of a changed file
+        self.previousImageFile = None
+        # Filled by the extraction stage
+        self.hash = None
+        self.img = None
+        # True once the write stage saved the image
+        self.imported = False
+
+class ScanSummary:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ScanSummary : result of a scan, the source paths of the files that were added, changed, skipped or failed
+    """
+    def __init__(self):
+        """
+        __init__ : ScanSummary class constructor
+        """
+        # self.added (list): paths of the files imported for the first time
+        self.added = []
+        # self.changed (list): paths of the files imported again because they changed since the last import
+        self.changed = []
+        # self.skipped (list): paths of the files already imported, and not changed
+        self.skipped = []
+        # self.errors (list): (path, exception) of the files that could not be imported
+        self.errors = []
+        # self.copied (list): paths of the files copied because the import mode could not be used (ex: hardlink to another disk)
+        self.copied = []
+
+    def __str__(self):
+        """
+        __str__ : toString method
+
+        Returns:
+            str: string representation of the summary, to be shown to the user
+        """
+        text = "{} added, {} changed, {} skipped, {} errors".format(
+            len(self.added), len(self.changed), len(self.skipped), len(self.errors))
+        if len(self.copied) > 0:
+            text += " ({} copied, the import mode is not supported)".format(len(self.copied))
+        return text
+
+class ImportProgress:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ImportProgress : progress event sent by the ImportPipeline while images are imported
+    """
+    def __init__(self, files, totalFiles, bytes, totalBytes, elapsed, skipped, errors, finished):
+        """
+        __init__ : ImportProgress class constructor
+
+        Args:
+            files (int): number of images already processed (imported or skipped)
+            totalFiles (int): number of images found so far
+            bytes (int): size of the images already processed
+            totalBytes (int): size of the images found so far
+            elapsed (float): seconds since the import started
+            skipped (int): number of images skipped because they were already imported
+            errors (int): number of images that could not be imported
+            finished (bool): True if the discovery of images is over
+        """
+        self.files = files
+        self.totalFiles = totalFiles
+        self.bytes = bytes
+        self.totalBytes = totalBytes
+        self.elapsed = elapsed
+        self.skipped = skipped
+        self.errors = errors
+        self.finished = finished
+
+    def filesPerSec(self):
+        """
+        filesPerSec : import speed in images per second
+
+        Returns:
+            float: images per second
+        """
+        return self.files / self.elapsed if self.elapsed > 0 else 0.0
+
+    def bytesPerSec(self):
+        """
+        bytesPerSec : import speed in bytes per second
+
+        Returns:
+            float: bytes per second
+        """
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def eta(self):
+        """
+        eta : estimated time until the import ends, using the bytes still to import
+
+        Returns:
+            float: seconds, or None if it can't be estimated yet
+        """
+        speed = self.bytesPerSec()
+        if speed == 0:
+            return None
+        return (self.totalBytes - self.bytes) / speed
+
+    def __str__(self):
+        """
+        __str__ : toString method
+
+        Returns:
+            str: string representation of the progress, to be shown to the user
+        """
+        eta = self.eta()
+        return "{}/{} images ({} already imported)  {:.1f} images/s  {:.1f} MB/s  ETA {}".format(
+            self.files, self.totalFiles, self.skipped, self.filesPerSec(), self.bytesPerSec() / 2**20,
+            "{:.0f}s".format(eta) if eta is not None else "--")
+
+class ImportPipeline:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ImportPipeline : imports images into the collection's root folder in four stages connected by bounded queues:
+        - discovery: reads the image files to import, skipping the ones the ImportLedger knows are not changed
+        - extraction: hashes each image, skipping the ones already imported from another path or with the same content,
+        and reads its exif and date (thread pool, optionally a process pool)
+        - copy: copies (or moves, or links, see FileTransfer) each image to its date folder (thread pool)
+        - write: saves the metadata of each image (one thread, so the Json files and the catalog are written in order)
+    Progress events (ImportProgress) are sent to the onProgress function while the import runs.
+    """
+
+    # Marks the end of the items of a queue
+    _DONE = object()
+
+    def __init__(self, module, ledger = None, threads = 4, processes = 0, queueSize = 64, onProgress = None, progressInterval = 0.1,
+                 importMode = None, known = None):
+        """
+        __init__ : ImportPipeline class constructor
+
+        Args:
+            module (AppModule): AppModule instance
+            ledger (ImportLedger, optional): ledger of the files already imported, None to import every file. Defaults to None.
+            threads (int, optional): number of threads of the extraction and copy stages. Defaults to 4.
+            processes (int, optional): number of processes used to read the exif, 0 to read it in the threads. Defaults to 0.
+            queueSize (int, optional): maximum number of images waiting between two stages. Defaults to 64.
+            onProgress (function, optional): called with an ImportProgress instance. Defaults to None.
+            progressInterval (float, optional): minimum number of seconds between two progress events. Defaults to 0.1.
+            importMode (String, optional): "copy", "move", "hardlink" or "reflink". Defaults to None, for the mode of the module.
+            known (Dict, optional): content hash (in the hash mode of the module) -> path of the image of the collection
+            with this content, the files with one of these contents are skipped. Defaults to None.
+        """
+        self.module = module
+        self.ledger = ledger
+        self.threads = threads
+        self.processes = processes
+        self.queueSize = queueSize
+        self.onProgress = onProgress
+        self.progressInterval = progressInterval
+        self.importMode = importMode or module.getImportMode()
+        self.known = known or {}
+
+        self.lock = threading.Lock()
+        self.processPool = None
+        self.summary = ScanSummary()
+
+    def run(self, entries):
+        """
+        run : imports the given image files and waits for the import to end
+
+        Args:
+            entries (iterable): os.DirEntry instances of the images to import
+
+        Returns:
+            list: list of the imported CPImage instances (see self.summary for the files that were not imported)
+        """
+        self.files = self.totalFiles = self.bytes = self.totalBytes = 0
+        self.discoveryFinished = False
+        self.summary = ScanSummary()
+        self.imported = []
+        # self.replaced (list): (path of the previous copy, new CPImage instance) of the changed files
+        self.replaced = []
+        # self.reserved (Dict): content hash -> first item of this import with this content
+        self.reserved = {}
+        # self.duplicates (list): (item, first item with the same content) of the files skipped because
+        # a file with the same content is imported by this import
+        self.duplicates = []
+        self.start = time.monotonic()
+        self.lastProgress = 0
+
+        discovered = Queue(self.queueSize)
+        extracted = Queue(self.queueSize)
+        copied = Queue(self.queueSize)
+
+        if self.processes > 0:
+            # Imported only when needed, multiprocessing is slow to import (it would slow down every start of the command line)
+            from concurrent.futures import ProcessPoolExecutor
+            self.processPool = ProcessPoolExecutor(self.processes)
+        try:
+            threads = [threading.Thread(target = self._discover, args = (entries, discovered), daemon = True)]
+            threads.extend(self._startStage(self._extract, discovered, extracted, self.threads))
+            threads.extend(self._startStage(self._copy, extracted, copied, self.threads))
+            threads.extend(self._startStage(self._write, copied, None, 1))
+            threads[0].start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if self.processPool is not None:
+                self.processPool.shutdown()
+                self.processPool = None
+        self._recordDuplicates()
+        self._sendProgress(force = True)
+        return self.imported
+
+    def _startStage(self, func, inQueue, outQueue, workers):
+        """
+        _startStage : starts the threads of a stage. Each thread takes an item from inQueue, applies func to it
+        and puts the result in outQueue. When all threads of the stage end, the end mark is put in outQueue
+
+        Args:
+            func (function): work done by the stage on each item
+            inQueue (Queue): items received from the previous stage
+            outQueue (Queue): items sent to the next stage, None for the last stage
+            workers (int): number of threads of the stage
+
+        Returns:
+            list: threads of the stage (the last one waits for the others and ends the stage)
+        """
+        def work():
+            while True:
+                item = inQueue.get()
+                if item is ImportPipeline._DONE:
+                    # The end mark is put back so the other threads of the stage also see it
+                    inQueue.put(item)
+                    return
+                try:
+                    result = func(item)
+                except Exception as e:
+                    with self.lock:
+                        self.summary.errors.append((item.path, e))
+                        self.files += 1
+                        self.bytes += item.size
+                    continue
+                # A stage returns None for the items that must not go to the next stage
+                if outQueue is not None and result is not None:
+                    outQueue.put(result)
+
+        workerThreads = [threading.Thread(target = work, daemon = True) for _ in range(max(1, workers))]
+
+        def end():
+            for thread in workerThreads:
+                thread.join()
+            if outQueue is not None:
+                outQueue.put(ImportPipeline._DONE)
+
+        endThread = threading.Thread(target = end, daemon = True)
+        for thread in workerThreads:
+            thread.start()
+        endThread.start()
+        return workerThreads + [endThread]
+
+    def _discover(self, entries, outQueue):
+        """
+        _discover : discovery stage, sends each new or changed image to the extraction stage
+
+        Args:
+            entries (iterable): os.DirEntry instances of the images to import
+            outQueue (Queue): queue of the extraction stage
+        """
+        try:
+            for entry in entries:
+                # DirEntry.stat() reuses the information obtained by os.scandir when possible
+                try:
+                    stat = entry.stat()
+                except OSError as e:
+                    # The file can't be read or was removed since it was found, the others are still imported
+                    self.addError(entry.path, e)
+                    continue
+                status = ImportLedger.NEW if self.ledger is None else self.ledger.status(entry.path, stat.st_size, stat.st_mtime_ns)
+                with self.lock:
+                    self.totalFiles += 1
+                    self.totalBytes += stat.st_size
+                if status == ImportLedger.UNCHANGED:
+                    self._skip(entry.path, stat.st_size)
+                    continue
+                item = ImportItem(entry.path, stat.st_size, stat.st_mtime_ns, status)
+                if status == ImportLedger.CHANGED:
+                    item.previousImageFile = self.ledger.getImageFile(entry.path)
+                outQueue.put(item)
+        finally:
+            self.discoveryFinished = True
+            outQueue.put(ImportPipeline._DONE)
+
+    def addError(self, path, error):
+        """
+        addError : records a file or folder that could not be imported, without stopping the import
+
+        Args:
+            path (String): path to the file or folder
+            error (Exception): reason why it could not be imported
+        """
+        with self.lock:
+            self.summary.errors.append((path, error))
+
+    def _extract(self, item):
+        """
+        _extract : extraction stage, hashes an image and reads its exif and date.
+        If a file with the same content was already imported, or is in the collection (ex: imported before there
+        was a ledger), the image is skipped and recorded in the ledger.
+        The hash is then reserved, so another file with the same content found by this import is skipped too
+
+        Args:
+            item (ImportItem): image to import
+
+        Returns:
+            ImportItem: the same item with its hash and CPImage instance, or None if the image is skipped
+        """
+        item.hash = CPImage.fileHash(item.path)
+        if self.ledger is not None:
+            imported = self.ledger.findHash(item.hash)
+            if imported is not None:
+                # Same content as an imported file (the file was touched, or is a duplicate in another folder)
+                self.ledger.record(item.path, item.size, item.mtime, item.hash, imported["imageFile"])
+                self._skip(item.path, item.size)
+                return None
+        # Hash in the mode of the collection, to compare it with the hashes of its images
+        contentHash = item.hash if self.module.getHashMode() == "file" else CPImage.pixelHash(item.path)
+        if contentHash in self.known:
+            self._skipExisting(item, self.known[contentHash])
+            return None
+        with self.lock:
+            first = self.reserved.setdefault(contentHash, item)
+            if first is not item:
+                # Same content as a file of this import (ex: the same photo in two sub-folders)
+                self.duplicates.append((item, first))
+        if first is not item:
+            self._skip(item.path, item.size)
+            return None
+        if self.processPool is not None:
+            exif = self.processPool.submit(readExifSubset, item.path).result()
+        else:
+            exif = readExifSubset(item.path)
+        item.img = CPImage(item.path, self.module, exif = exif)
+        # The hash is saved with the metadata, so the collection never has to read the file again to identify it
+        item.img.setHash(contentHash, self.module.getHashMode())
+        return item
+
+    def _copy(self, item):
+        """
+        _copy : copy stage, copies an image to the folder of its date (or moves or links it, depending on the import mode)
+
+        Args:
+            item (ImportItem): image to import
+
+        Returns:
+            ImportItem: the same item, or None if the same file is already in the folder
+        """
+        used = item.img.importToDateFolder(self.importMode)
+        if used == FileTransfer.EXISTING:
+            self._skipExisting(item, item.img.getImageFile())
+            return None
+        if used != self.importMode:
+            with self.lock:
+                self.summary.copied.append(item.path)
+        return item
+
+    def _write(self, item):
+        """
+        _write : write stage, saves the metadata of an image, records it in the ledger and sends a progress event
+
+        Args:
+            item (ImportItem): image to import
+        """
+        item.img.writeMetadata()
+        if self.ledger is not None:
+            self.ledger.record(item.path, item.size, item.mtime, item.hash, item.img.getImageFile())
+        with self.lock:
+            item.imported = True
+            self.imported.append(item.img)
+            if item.status == ImportLedger.CHANGED:
+                self.summary.changed.append(item.path)
+                self.replaced.append((item.previousImageFile, item.img))
+            else:
+                self.summary.added.append(item.path)
+            self.files += 1
+            self.bytes += item.size
+        self._sendProgress()
+
+    def _skipExisting(self, item, imageFile):
+        """
+        _skipExisting : skips an image whose content is already in the collection, and records it in the ledger
+        with the copy that has its content (so the next scans skip it without hashing it)
+
+        Args:
+            item (ImportItem): image not imported
+            imageFile (String): path of the copy in the collection's root folder
+        """
+        if self.ledger is not None:
+            self.ledger.record(item.path, item.size, item.mtime, item.hash, imageFile)
+        self._skip(item.path, item.size)
+
+    def _recordDuplicates(self):
+        """
+        _recordDuplicates : records in the ledger the files skipped because a file with the same content was imported
+        by this import, with the copy of that file (so the next scans skip them without hashing them)
+        """
+        if self.ledger is None:
+            return
+        for item, first in self.duplicates:
+            # If the first file could not be imported, the duplicate is not recorded and will be imported by the next scan
+            if first.imported:
+                self.ledger.record(item.path, item.size, item.mtime, item.hash, first.img.getImageFile())
+
+    def _skip(self, path, size):
+        """
+        _skip : counts an image that doesn't need to be imported and sends a progress event
+
+        Args:
+            path (String): path to the source file
+            size (int): size of the file
+        """
+        with self.lock:
+            self.summary.skipped.append(path)
+            self.files += 1
+            self.bytes += size
+        self._sendProgress()
+
+    def _sendProgress(self, force = False):
+        """
+        _sendProgress : sends a progress event to self.onProgress, at most one every self.progressInterval seconds
+
+        Args:
+            force (bool, optional): sends the event even if the last one is too recent. Defaults to False.
+        """
+        if self.onProgress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.lastProgress < self.progressInterval:
+            return
+        self.lastProgress = now
+        with self.lock:
+            progress = ImportProgress(self.files, self.totalFiles, self.bytes, self.totalBytes, now - self.start,
+                                      len(self.summary.skipped), len(self.summary.errors), self.discoveryFinished)
+        self.onProgress(progress)
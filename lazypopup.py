@@ -0,0 +1,40 @@
+class LazyPopup:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    LazyPopup : popups are only created the first time they are opened, most of them are never opened
+    during a session and creating them (and importing their widgets) slows down the start of the app.
+    The widget that owns a popup keeps it in an attribute set to None until the popup is created.
+    """
+    @staticmethod
+    def get(owner, attribute, create):
+        """
+        get : returns a popup, creating it if it wasn't created yet
+
+        Args:
+            owner (Widget): widget that keeps the popup
+            attribute (String): name of the attribute of owner with the popup
+            create (function): method of owner that creates the popup and sets the attribute
+
+        Returns:
+            Popup: the popup
+        """
+        if getattr(owner, attribute) is None:
+            create()
+        return getattr(owner, attribute)
+
+    @staticmethod
+    def opener(owner, attribute, create):
+        """
+        opener : function that opens a popup, creating it the first time, to be bound to a button
+
+        Args:
+            owner (Widget): widget that keeps the popup
+            attribute (String): name of the attribute of owner with the popup
+            create (function): method of owner that creates the popup and sets the attribute
+
+        Returns:
+            function: function called with the button pressed
+        """
+        return lambda button: LazyPopup.get(owner, attribute, create).open()
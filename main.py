@@ -1,6 +1,24 @@
-from kivy.app import App
-from kivy.core.window import Window
-from piclib import PicLib
+from startupprofile import StartupProfile
+from metrics import Metrics
+import sys
+
+# python main.py --startup-profile : prints where the start of the app spends its time (see StartupProfile)
+if "--startup-profile" in sys.argv:
+    # Removed before Kivy reads the command line, it doesn't know this option
+    sys.argv.remove("--startup-profile")
+    StartupProfile.begin()
+
+# python main.py --metrics : records timing spans and counters, shown in the bottom row and written to
+# ./PicLib/metrics.json when the app is closed (see Metrics)
+if "--metrics" in sys.argv:
+    sys.argv.remove("--metrics")
+    Metrics.enable()
+
+with StartupProfile.imports("kivy"):
+    from kivy.app import App
+    from kivy.core.window import Window
+with StartupProfile.imports("piclib"):
+    from piclib import PicLib
 
 Window.size = (1000, 600)
 Window.minimum_width, Window.minimum_height = Window.size
@@ -19,7 +37,25 @@ class MyApp(App):
         Returns:
             PicLib: App layout
         """
+        Window.bind(on_draw = MyApp.firstFrame)
         return PicLib()
 
+    @staticmethod
+    def firstFrame(window):
+        """
+        firstFrame : records when the first frame of the app is drawn
+
+        Args:
+            window (Window): window of the app
+        """
+        window.unbind(on_draw = MyApp.firstFrame)
+        StartupProfile.mark("first frame")
+
+    def on_stop(self):
+        """
+        on_stop : writes the metrics, if they are enabled, when the app is closed
+        """
+        Metrics.dump("./PicLib/metrics.json")
+
 if __name__ == '__main__':
     MyApp().run()
\ No newline at end of file
@@ -0,0 +1,257 @@
+from contextlib import contextmanager
+from metrics import Metrics
+import threading
+import atexit
+import time
+import json
+import sys
+import os
+
+class MetadataStore:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    MetadataStore : write-behind layer between the images and their Json files (or the catalog).
+    CPImage.saveMetadata only marks the image as dirty: its metadata is copied and appended to a journal,
+    and the Json files are written later, once per image whatever the number of changes, by a background thread:
+        - after a short delay without changes (debounce)
+        - at the end of a batch (see batch)
+        - when the application exits
+    The journal is replayed when the application starts, so changes not yet written when it crashed are not lost.
+    A single background thread (the flusher) writes the images, each change only moves its deadline.
+    """
+    def __init__(self, journalPath, module, delay = 1.0):
+        """
+        __init__ : MetadataStore class constructor
+
+        Args:
+            journalPath (String): path to the journal file
+            module (AppModule): AppModule instance, gives the catalog if it is enabled
+            delay (float, optional): seconds without changes before the dirty images are written. Defaults to 1.0.
+        """
+        self.journalPath = journalPath
+        self.module = module
+        self.delay = delay
+        self.lock = threading.Lock()
+        # Only one thread writes the Json files at a time
+        self.flushLock = threading.Lock()
+        # self.dirty (Dict): path to the image -> last record of its metadata, not yet written
+        self.dirty = {}
+        # self.unjournaled (Dict): images marked dirty during a batch, their records are taken at its end
+        self.unjournaled = {}
+        self.batchDepth = 0
+        # self.deadline (float): time.monotonic() at which the flusher writes the dirty images, None if there is nothing to write
+        self.deadline = None
+        # self.wakeup wakes the flusher up when the deadline is brought forward (it shares self.lock)
+        self.wakeup = threading.Condition(self.lock)
+        self.flusher = None
+        self.journal = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def record(cpimage):
+        """
+        record : copies the metadata of an image, the copy is not changed when the image is
+
+        Args:
+            cpimage (CPImage): image
+
+        Returns:
+            String: Json line with "imageFile", "jsonfile" and "metadata" (with the exif subset)
+        """
+        return json.dumps({"imageFile": cpimage.getImageFile(), "jsonfile": cpimage.jsonfile,
+                           "metadata": dict(cpimage.metadata, exif = cpimage.exif)}, sort_keys = True, default = str)
+
+    def markDirty(self, cpimage):
+        """
+        markDirty : marks the metadata of an image as changed, it is written later.
+        Outside of a batch, the change is written to the journal before returning
+
+        Args:
+            cpimage (CPImage): image
+        """
+        with self.lock:
+            self.unjournaled[id(cpimage)] = cpimage
+            if self.batchDepth == 0:
+                self._writeJournal()
+                self._schedule(self.delay)
+
+    def _writeJournal(self):
+        """
+        _writeJournal : appends the records of the images marked dirty to the journal.
+        Must be called with the lock held
+        """
+        if len(self.unjournaled) == 0:
+            return
+        if self.journal is None:
+            self.journal = open(self.journalPath, 'a')
+        for cpimage in self.unjournaled.values():
+            line = MetadataStore.record(cpimage)
+            self.journal.write(line + "\n")
+            self.dirty[cpimage.getImageFile()] = line
+        self.unjournaled = {}
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def _schedule(self, delay):
+        """
+        _schedule : moves the deadline of the flusher, which is started the first time. Must be called with the lock held
+
+        Args:
+            delay (float): seconds before the images are written
+        """
+        deadline = time.monotonic() + delay
+        if self.flusher is None:
+            self.flusher = threading.Thread(target = self._runFlusher, daemon = True)
+            self.flusher.start()
+        elif self.deadline is None or deadline < self.deadline:
+            # A later deadline is seen by the flusher when it wakes up at the previous one
+            self.wakeup.notify()
+        self.deadline = deadline
+
+    def _runFlusher(self):
+        """
+        _runFlusher : loop of the flusher thread, writes the dirty images once their deadline is reached
+        """
+        with self.lock:
+            while True:
+                if self.deadline is None:
+                    self.wakeup.wait()
+                    continue
+                remaining = self.deadline - time.monotonic()
+                if remaining > 0:
+                    self.wakeup.wait(remaining)
+                    continue
+                self.deadline = None
+                self.lock.release()
+                try:
+                    self.flush()
+                except Exception as e:
+                    # The images are still dirty, they are written by the next flush (at the latest when the application exits)
+                    Metrics.count("metadata write errors")
+                    print("Could not write metadata: {}".format(e), file = sys.stderr)
+                finally:
+                    self.lock.acquire()
+
+    def beginBatch(self):
+        """
+        beginBatch : starts a batch (see batch), for batches that don't end in the thread that starts them
+        (ex: RotationBatch). Each beginBatch must be followed by an endBatch
+        """
+        with self.lock:
+            self.batchDepth += 1
+
+    def endBatch(self):
+        """
+        endBatch : ends a batch started by beginBatch
+        """
+        with self.lock:
+            self.batchDepth -= 1
+            if self.batchDepth == 0:
+                self._writeJournal()
+                self._schedule(0)
+
+    @contextmanager
+    def batch(self):
+        """
+        batch : context manager grouping many changes (ex: tagging all the selected images).
+        The changes are written to the journal once, at the end of the batch, and then to the Json files
+        by a background thread. Batches can be nested, only the outermost one writes
+        """
+        self.beginBatch()
+        try:
+            yield self
+        finally:
+            self.endBatch()
+
+    def flush(self):
+        """
+        flush : writes the dirty images to their Json files (or to the catalog, in a single transaction),
+        in the calling thread. The journal is emptied if no image was marked dirty meanwhile
+
+        Raises:
+            OSError: if the metadata could not be written, the images stay dirty
+        """
+        with self.flushLock:
+            with self.lock:
+                self._writeJournal()
+                records = list(self.dirty.values())
+                self.dirty = {}
+            if len(records) == 0:
+                return
+            try:
+                MetadataStore.write(self.module, [json.loads(line) for line in records])
+            except Exception:
+                # The images stay dirty (and in the journal), unless they were changed again meanwhile
+                # or no longer exist (as in replay)
+                with self.lock:
+                    for line in records:
+                        imageFile = json.loads(line)["imageFile"]
+                        if os.path.exists(imageFile):
+                            self.dirty.setdefault(imageFile, line)
+                raise
+            with self.lock:
+                if len(self.dirty) == 0 and len(self.unjournaled) == 0 and self.journal is not None:
+                    self.journal.close()
+                    self.journal = None
+                    try:
+                        os.remove(self.journalPath)
+                    except FileNotFoundError:
+                        pass
+
+    def pending(self):
+        """
+        pending : number of images whose metadata is not written yet
+
+        Returns:
+            int: number of images
+        """
+        with self.lock:
+            return len(self.dirty) + len(self.unjournaled)
+
+    @staticmethod
+    def write(module, records):
+        """
+        write : writes records of metadata
+
+        Args:
+            module (AppModule): AppModule instance, gives the catalog if it is enabled
+            records (list): records (see record), the last record of each image is the one written
+        """
+        latest = {record["imageFile"]: record for record in records}
+        Metrics.count("metadata written", len(latest))
+        catalog = module.getCatalog()
+        with Metrics.span("write metadata"):
+            if catalog is not None:
+                catalog.saveRecords([(record["imageFile"], record["metadata"]) for record in latest.values()])
+                return
+            for record in latest.values():
+                with open(record["jsonfile"], 'w') as json_file:
+                    json.dump(record["metadata"], json_file, sort_keys=True, indent=4, default=str)
+
+    def replay(self):
+        """
+        replay : writes the changes left in the journal by a previous run that didn't end normally,
+        then empties the journal. Records of images that no longer exist are ignored
+        """
+        if not os.path.exists(self.journalPath):
+            return
+        records = []
+        with open(self.journalPath, 'r') as readfile:
+            for line in readfile:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last line may have been cut by the crash
+                    break
+        MetadataStore.write(self.module, [record for record in records if os.path.exists(record["imageFile"])])
+        os.remove(self.journalPath)
+
+    def close(self):
+        """
+        close : writes the dirty images, called when the application exits
+        """
+        with self.lock:
+            self.deadline = None
+        self.flush()
@@ -0,0 +1,244 @@
+from contextlib import nullcontext
+import threading
+import json
+import math
+import time
+
+class Histogram:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    Histogram : durations of a span, counted in buckets that are each GROWTH times wider than the previous one,
+    so it takes the same memory whatever the number of durations and its percentiles are within 5% of the real ones
+    """
+
+    # Upper bound of the first bucket, in seconds
+    SMALLEST = 1e-6
+
+    # Ratio between the upper bounds of two consecutive buckets
+    GROWTH = 1.05
+
+    def __init__(self):
+        """
+        __init__ : Histogram class constructor
+        """
+        # self.buckets (Dict): index of the bucket -> number of durations in it
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """
+        add : counts a duration
+
+        Args:
+            seconds (float): duration
+        """
+        index = 0
+        if seconds > Histogram.SMALLEST:
+            index = math.ceil(math.log(seconds / Histogram.SMALLEST, Histogram.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """
+        percentile : duration under which a fraction of the durations are
+
+        Args:
+            fraction (float): fraction of the durations, ex: 0.95
+
+        Returns:
+            float: upper bound of the bucket of the percentile (at most the longest duration), 0 if there are no durations
+        """
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.max, Histogram.SMALLEST * Histogram.GROWTH ** index)
+        return 0.0
+
+    def summary(self):
+        """
+        summary : numbers of the histogram
+
+        Returns:
+            Dict: count, total, mean, p50, p95, p99 and max, the durations in ms
+        """
+        return {"count": self.count, "totalMs": round(self.total * 1000, 3),
+                "meanMs": round(self.total * 1000 / self.count, 3) if self.count > 0 else 0.0,
+                "p50Ms": round(self.percentile(0.50) * 1000, 3), "p95Ms": round(self.percentile(0.95) * 1000, 3),
+                "p99Ms": round(self.percentile(0.99) * 1000, 3), "maxMs": round(self.max * 1000, 3)}
+
+class Span:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    Span : context manager timing a block of code, its duration is added to the histogram of its name when it ends
+    """
+    def __init__(self, metrics, name):
+        """
+        __init__ : Span class constructor
+
+        Args:
+            metrics (Metrics): metrics the duration is added to
+            name (String): name of the span
+        """
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        """
+        __enter__ : starts the span
+
+        Returns:
+            Span: the span
+        """
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        """
+        __exit__ : ends the span, also when the block raised an exception (which is not caught)
+        """
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    Metrics : timing spans and counters of the hot paths of PicLib (import, load, save, search, rotation, zip export,
+    grid render...), enabled by python main.py --metrics or python piclibcli.py --metrics FILE.
+    The durations of each span are aggregated in a Histogram (p50, p95, p99), the metrics can be dumped to a Json file
+    and are shown in the BottomRow while PicLib runs.
+    When the metrics are not enabled, span returns a context manager that does nothing and count returns right away.
+
+        with Metrics.span("rotate"):
+            ...
+        Metrics.count("images imported")
+    """
+
+    # Metrics being recorded, None if they are not enabled
+    active = None
+
+    # Context manager returned by span when the metrics are not enabled
+    DISABLED = nullcontext()
+
+    def __init__(self):
+        """
+        __init__ : Metrics class constructor
+        """
+        # Spans and counters are recorded by background threads too
+        self.lock = threading.Lock()
+        # self.histograms (Dict): name of the span -> Histogram of its durations
+        self.histograms = {}
+        # self.counters (Dict): name of the counter -> value
+        self.counters = {}
+        self.start = time.time()
+
+    @staticmethod
+    def enable():
+        """
+        enable : starts recording the metrics
+
+        Returns:
+            Metrics: metrics recorded
+        """
+        if Metrics.active is None:
+            Metrics.active = Metrics()
+        return Metrics.active
+
+    @staticmethod
+    def span(name):
+        """
+        span : times a block of code (with Metrics.span(name): ...)
+
+        Args:
+            name (String): name of the span
+
+        Returns:
+            context manager: Span, or Metrics.DISABLED if the metrics are not enabled
+        """
+        metrics = Metrics.active
+        if metrics is None:
+            return Metrics.DISABLED
+        return Span(metrics, name)
+
+    @staticmethod
+    def count(name, value = 1):
+        """
+        count : adds to a counter
+
+        Args:
+            name (String): name of the counter
+            value (int, optional): number added. Defaults to 1.
+        """
+        metrics = Metrics.active
+        if metrics is None:
+            return
+        with metrics.lock:
+            metrics.counters[name] = metrics.counters.get(name, 0) + value
+
+    def record(self, name, seconds):
+        """
+        record : adds a duration to the histogram of a span
+
+        Args:
+            name (String): name of the span
+            seconds (float): duration
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def summary(self):
+        """
+        summary : metrics recorded so far
+
+        Returns:
+            Dict: seconds recorded, summary of each span (see Histogram.summary) and value of each counter
+        """
+        with self.lock:
+            return {"seconds": round(time.time() - self.start, 3),
+                    "spans": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+                    "counters": dict(sorted(self.counters.items()))}
+
+    def overlayText(self, spans = 3):
+        """
+        overlayText : short text of the spans that took the most time, for the debug overlay of the BottomRow
+
+        Args:
+            spans (int, optional): number of spans shown. Defaults to 3.
+
+        Returns:
+            String: name and p50/p95/p99 in ms of each span
+        """
+        with self.lock:
+            slowest = sorted(self.histograms.items(), key = lambda item: item[1].total, reverse = True)[:spans]
+            return "  ".join("{} {:.1f}/{:.1f}/{:.1f}ms".format(name, histogram.percentile(0.50) * 1000,
+                                                                 histogram.percentile(0.95) * 1000, histogram.percentile(0.99) * 1000)
+                             for name, histogram in slowest)
+
+    @staticmethod
+    def dump(path):
+        """
+        dump : writes the metrics recorded to a Json file, if they are enabled
+
+        Args:
+            path (String): path to the file
+        """
+        metrics = Metrics.active
+        if metrics is None:
+            return
+        with open(path, 'w') as writefile:
+            json.dump(metrics.summary(), writefile, indent = 4)
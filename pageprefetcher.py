@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+class PagePrefetcher:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    PagePrefetcher : prepares the pages next to the one shown, so changing page doesn't wait for images to load.
+    The thumbnails of the images are generated in background threads, then the function that makes their
+    ImageBoxes (and textures) is scheduled in the UI thread. Starting a new prefetch cancels the previous one.
+    Doesn't depend on Kivy, the UI thread scheduling function is given by the caller.
+    """
+    def __init__(self, thumbnailCache, height, makeBox = None, schedule = None, depth = 1, workers = 2):
+        """
+        __init__ : PagePrefetcher class constructor
+
+        Args:
+            thumbnailCache (ThumbnailCache): cache of the thumbnails
+            height (int): height the images are shown with
+            makeBox (function, optional): called in the UI thread with each CPImage whose thumbnail is ready. Defaults to None.
+            schedule (function, optional): runs a function (without arguments) in the UI thread. Defaults to None.
+            depth (int, optional): number of pages prefetched before and after the page shown. Defaults to 1.
+            workers (int, optional): number of background threads. Defaults to 2.
+        """
+        self.thumbnailCache = thumbnailCache
+        self.height = height
+        self.makeBox = makeBox
+        self.schedule = schedule
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(workers)
+        self.lock = threading.Lock()
+        # self.token (int): changes each time the work in progress is cancelled
+        self.token = 0
+
+    def setDepth(self, depth):
+        """
+        setDepth : self.depth setter
+
+        Args:
+            depth (int): number of pages prefetched before and after the page shown, 0 to disable the prefetch
+        """
+        self.depth = depth
+
+    @staticmethod
+    def adjacentPages(imgs, page, imgsPerPage, depth):
+        """
+        adjacentPages : returns the images of the pages around a page, the closest pages first
+
+        Args:
+            imgs (list): images of the collection, in the order they are shown
+            page (int): page shown (the first is 0)
+            imgsPerPage (int): number of images per page
+            depth (int): number of pages before and after the page shown
+
+        Returns:
+            list: list of lists of images, one per page
+        """
+        lastPage = (len(imgs) - 1) // imgsPerPage
+        pages = []
+        for distance in range(1, depth + 1):
+            for p in (page + distance, page - distance):
+                if 0 <= p <= lastPage:
+                    pages.append(imgs[p * imgsPerPage : (p + 1) * imgsPerPage])
+        return pages
+
+    @staticmethod
+    def adjacentRanges(imgs, first, last, depth):
+        """
+        adjacentRanges : same as adjacentPages, for a range of images that doesn't start at a page
+        (ex: the rows on the screen of a scrolled grid). The ranges have the size of the given range
+
+        Args:
+            imgs (list): images of the collection, in the order they are shown
+            first (int): index of the first image shown
+            last (int): index after the last image shown
+            depth (int): number of ranges before and after the range shown
+
+        Returns:
+            list: list of lists of images, one per range
+        """
+        size = last - first
+        ranges = []
+        for distance in range(depth):
+            after = imgs[last + distance * size : last + (distance + 1) * size]
+            before = imgs[max(0, first - (distance + 1) * size) : max(0, first - distance * size)]
+            ranges += [imgsRange for imgsRange in (after, before) if len(imgsRange) > 0]
+        return ranges
+
+    def prefetch(self, imgs, page, imgsPerPage):
+        """
+        prefetch : cancels the previous prefetch and starts preparing the pages around the given page
+
+        Args:
+            imgs (list): images of the collection, in the order they are shown
+            page (int): page shown (the first is 0)
+            imgsPerPage (int): number of images per page
+        """
+        self._submit(PagePrefetcher.adjacentPages(imgs, page, imgsPerPage, self.depth))
+
+    def prefetchRange(self, imgs, first, last):
+        """
+        prefetchRange : cancels the previous prefetch and starts preparing the images around the ones shown
+        (used by the RecycleGrid, whose screen doesn't start at a page)
+
+        Args:
+            imgs (list): images of the collection, in the order they are shown
+            first (int): index of the first image shown
+            last (int): index after the last image shown
+        """
+        self._submit(PagePrefetcher.adjacentRanges(imgs, first, last, self.depth))
+
+    def _submit(self, groups):
+        """
+        _submit : cancels the previous prefetch and loads the images of each group, the first groups first
+
+        Args:
+            groups (list): list of lists of images
+        """
+        token = self.cancel()
+        for groupImgs in groups:
+            for img in groupImgs:
+                self.executor.submit(self._load, img, token)
+
+    def cancel(self):
+        """
+        cancel : cancels the work in progress (used when the user jumps to another page or collection,
+        or changes the number of images per page)
+
+        Returns:
+            int: the new token
+        """
+        with self.lock:
+            self.token += 1
+            return self.token
+
+    def _load(self, img, token):
+        """
+        _load : generates the thumbnail of an image and schedules the creation of its ImageBox, unless cancelled
+
+        Args:
+            img (CPImage): image
+            token (int): token of the prefetch that asked for the image
+        """
+        if token != self.token:
+            return
+        path = self.thumbnailCache.ensure(img, self.height)
+        if path is None or token != self.token or self.makeBox is None:
+            return
+        self.schedule(lambda: self.makeBox(img) if token == self.token else None)
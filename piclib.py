@@ -3,6 +3,7 @@ from toprow import TopRow
 from middlerow import MiddleRow
 from bottomrow import BottomRow
 from appmodule import AppModule
+from startupprofile import StartupProfile
 
 class PicLib(BoxLayout):
     """
@@ -18,12 +19,17 @@ class PicLib(BoxLayout):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
         
-        self.appModule = AppModule()
+        # The images are loaded by the PictureGrid, after it shows the first page (see PictureGrid.loadCollection)
+        with StartupProfile.step("AppModule"):
+            self.appModule = AppModule(loadImages = False)
         self.imgCollection = self.appModule.getImgCollection()
         self.tagCollection = self.appModule.getTagCollection()
-        self.topRow = TopRow()
-        self.bottomRow = BottomRow()
-        self.middleRow = MiddleRow(self)
+        with StartupProfile.step("TopRow"):
+            self.topRow = TopRow()
+        with StartupProfile.step("BottomRow"):
+            self.bottomRow = BottomRow()
+        with StartupProfile.step("MiddleRow"):
+            self.middleRow = MiddleRow(self)
 
         self.add_widget(self.topRow)
         self.add_widget(self.middleRow)
@@ -38,6 +44,15 @@ class PicLib(BoxLayout):
         """
         return self.bottomRow
     
+    def getAppModule(self):
+        """
+        getAppModule : self.appModule getter
+
+        Returns:
+            AppModule: Class that contains the collections and the caches of the app
+        """
+        return self.appModule
+
     def getImgCollection(self):
         """
         getImgCollection : self.imgCollection getter
@@ -0,0 +1,315 @@
+from appmodule import AppModule
+from dateindex import DateIndex
+from metrics import Metrics
+import argparse
+import json
+import sys
+import os
+
+class PicLibCLI:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    PicLibCLI : command line interface of PicLib, for scripts and servers without a display.
+    It uses the AppModule and its collections like the application does, but never imports Kivy.
+    PicLib is not a package (its modules are at the top of the repository, and piclib.py is the Kivy window),
+    so the entry point is this module: "python piclibcli.py" or "python -m piclibcli" from the repository.
+    stats only reads the SQLite catalog when it is enabled (see Catalog.stats), the other commands load the collection.
+    Every command prints a single Json document to the standard output (search --paths prints one path per line),
+    errors are printed as Json to the standard error, with exit code 1.
+
+        python piclibcli.py scan FOLDER [--mode copy|move|hardlink|reflink]
+        python piclibcli.py tag TAG [IMAGE ...] [--any TAG ...] [--all TAG ...] [--none TAG ...] [--dates RANGE]
+        python piclibcli.py untag TAG [IMAGE ...] [selection]
+        python piclibcli.py search [selection] [--paths] [--count]
+        python piclibcli.py export-zip PATH [IMAGE ...] [selection] [--max-volume-mb N]
+        python piclibcli.py stats
+    """
+    def __init__(self, module):
+        """
+        __init__ : PicLibCLI class constructor
+
+        Args:
+            module (AppModule): AppModule instance, with its collections loaded (for stats, the images may not be loaded)
+        """
+        self.module = module
+        self.imgCollection = module.getImgCollection()
+        self.tagCollection = module.getTagCollection()
+
+    @staticmethod
+    def makeParser():
+        """
+        makeParser : creates the parser of the command line
+
+        Returns:
+            ArgumentParser: parser, each command sets "command" to the name of the PicLibCLI method that runs it
+        """
+        parser = argparse.ArgumentParser(prog = "piclibcli", description = "PicLib without its window.")
+        parser.add_argument("--dir", default = ".", help = "folder with the PicLib folder of the library (default: current folder)")
+        parser.add_argument("--metrics", metavar = "FILE", help = "writes the timing spans and counters of the command to a Json file")
+        commands = parser.add_subparsers(dest = "name", required = True)
+
+        scan = commands.add_parser("scan", help = "imports the images of a folder")
+        scan.add_argument("folder")
+        scan.add_argument("--mode", choices = ("copy", "move", "hardlink", "reflink"), help = "import mode (default: copy)")
+        scan.add_argument("--exclude", nargs = "+", default = [], metavar = "PATTERN", help = "names of files and folders to skip")
+        scan.add_argument("--max-depth", type = int, help = "maximum depth of the sub-folders to scan")
+        scan.add_argument("--threads", type = int, default = 4, help = "threads of each stage of the import (default: 4)")
+        scan.add_argument("--progress", action = "store_true", help = "prints the progress to the standard error")
+        scan.set_defaults(command = "scan")
+
+        for name, method, text in (("tag", "tag", "adds a tag to images"), ("untag", "untag", "removes a tag from images")):
+            command = commands.add_parser(name, help = text)
+            command.add_argument("tag")
+            PicLibCLI.addSelection(command)
+            command.set_defaults(command = method)
+
+        search = commands.add_parser("search", help = "finds images (all of them without selection)")
+        PicLibCLI.addSelection(search)
+        search.add_argument("--paths", action = "store_true", help = "prints one path per line instead of Json")
+        search.add_argument("--count", action = "store_true", help = "only prints the number of images")
+        search.set_defaults(command = "search")
+
+        export = commands.add_parser("export-zip", help = "zips images")
+        export.add_argument("path", help = "path to the zip file, without the .zip extension")
+        PicLibCLI.addSelection(export)
+        export.add_argument("--max-volume-mb", type = int, help = "splits the export in zip files of at most this size")
+        export.set_defaults(command = "exportZip")
+
+        stats = commands.add_parser("stats", help = "numbers of images and tags, and range of dates")
+        stats.set_defaults(command = "stats")
+        return parser
+
+    @staticmethod
+    def addSelection(command):
+        """
+        addSelection : adds to a command the arguments that select images (see findImages)
+
+        Args:
+            command (ArgumentParser): parser of the command
+        """
+        command.add_argument("images", nargs = "*", help = "paths to images of the library")
+        command.add_argument("--any", nargs = "+", default = [], metavar = "TAG", help = "images with at least one of the tags")
+        command.add_argument("--all", nargs = "+", default = [], metavar = "TAG", help = "images with all the tags")
+        command.add_argument("--none", nargs = "+", default = [], metavar = "TAG", help = "images without any of the tags")
+        command.add_argument("--dates", metavar = "RANGE", help = "images of a date or range of dates (YYYY/MM/DD..YYYY/MM/DD)")
+
+    def findImages(self, args, required = True):
+        """
+        findImages : images selected by the arguments of a command, the given paths and/or the result of a search.
+        With both, only the given images that match the search are selected
+
+        Args:
+            args (Namespace): arguments of the command
+            required (bool, optional): True if an empty selection is an error, False if it selects every image. Defaults to True.
+
+        Returns:
+            list: CPImage instances, in date order (or in the order of the paths)
+
+        Raises:
+            ValueError: if the selection is empty and required, if a date can't be read or if a path is not in the library
+        """
+        searched = None
+        if args.any or args.all or args.none:
+            searched = self.imgCollection.findWithTags(args.any, args.all, args.none).getItems()
+            if args.dates is not None:
+                first, last = DateIndex.parseRange(args.dates)
+                searched = [img for img in searched if first <= DateIndex.ordinal(img.getDate()) <= last]
+        elif args.dates is not None:
+            searched = self.imgCollection.findDates(args.dates).getItems()
+        if args.images:
+            byPath = {os.path.abspath(img.getImageFile()): img for img in self.imgCollection.getItems()}
+            imgs = []
+            for path in args.images:
+                img = byPath.get(path)
+                if img is None:
+                    raise ValueError("Not in the library: " + path)
+                imgs.append(img)
+            if searched is not None:
+                found = set(searched)
+                imgs = [img for img in imgs if img in found]
+            return imgs
+        if searched is not None:
+            return searched
+        if required:
+            raise ValueError("No images selected: give paths to images or a search (--any, --all, --none, --dates)")
+        return self.imgCollection.getItems()
+
+    @staticmethod
+    def imageJson(img):
+        """
+        imageJson : what is printed of an image
+
+        Args:
+            img (CPImage): image
+
+        Returns:
+            Dict: path, date and tags of the image
+        """
+        return {"imageFile": os.path.abspath(img.getImageFile()), "date": img.getDate(), "tags": list(img.getTags())}
+
+    def scan(self, args):
+        """
+        scan : imports the images of a folder (see ImageCollection.scanFolder)
+
+        Args:
+            args (Namespace): arguments of the command
+
+        Returns:
+            Dict: paths of the files added, changed, skipped, copied and that could not be imported
+        """
+        onProgress = (lambda progress: print(progress, file = sys.stderr)) if args.progress else None
+        summary = self.imgCollection.scanFolder(args.folder, onProgress = onProgress, threads = args.threads,
+                                                exclude = tuple(pattern.lower() for pattern in args.exclude),
+                                                maxDepth = args.max_depth, importMode = args.mode)
+        return {"added": summary.added, "changed": summary.changed, "skipped": len(summary.skipped),
+                "copied": summary.copied, "errors": [{"path": path, "error": str(e)} for path, e in summary.errors]}
+
+    def tag(self, args):
+        """
+        tag : adds a tag to the selected images (and to the tags of the library, if it is new)
+
+        Args:
+            args (Namespace): arguments of the command
+
+        Returns:
+            Dict: the tag and the number of images that didn't have it
+        """
+        imgs = self.findImages(args)
+        self.tagCollection.addTag(args.tag)
+        changed = [img for img in imgs if not img.hasTag(args.tag)]
+        with self.module.getMetadataStore().batch():
+            for img in changed:
+                img.addTag(args.tag)
+        return {"tag": args.tag, "images": len(imgs), "changed": len(changed)}
+
+    def untag(self, args):
+        """
+        untag : removes a tag from the selected images
+
+        Args:
+            args (Namespace): arguments of the command
+
+        Returns:
+            Dict: the tag and the number of images that had it
+        """
+        imgs = self.findImages(args)
+        changed = [img for img in imgs if img.hasTag(args.tag)]
+        with self.module.getMetadataStore().batch():
+            for img in changed:
+                img.removeTag(args.tag)
+        return {"tag": args.tag, "images": len(imgs), "changed": len(changed)}
+
+    def search(self, args):
+        """
+        search : finds the selected images, every image if nothing is selected
+
+        Args:
+            args (Namespace): arguments of the command
+
+        Returns:
+            Dict: number of images found and their path, date and tags
+        """
+        imgs = self.findImages(args, required = False)
+        if args.count:
+            return {"count": len(imgs)}
+        return {"count": len(imgs), "images": [PicLibCLI.imageJson(img) for img in imgs]}
+
+    def exportZip(self, args):
+        """
+        exportZip : zips the selected images (see ZipExporter)
+
+        Args:
+            args (Namespace): arguments of the command
+
+        Returns:
+            Dict: zip files written, number of files and bytes, speed and files that could not be zipped
+        """
+        from zipexporter import ZipExporter
+        imgs = self.findImages(args)
+        maxVolumeBytes = args.max_volume_mb * 2**20 if args.max_volume_mb is not None else None
+        progress = ZipExporter(args.path, maxVolumeBytes).export([img.getImageFile() for img in imgs])
+        return {"volumes": progress.volumes, "files": progress.files, "bytes": progress.bytesDone,
+                "bytesPerSecond": round(progress.bytesPerSecond()), "cancelled": progress.cancelled,
+                "errors": [{"path": path, "error": str(e)} for path, e in progress.errors]}
+
+    def stats(self, args):
+        """
+        stats : numbers of images and tags of the library. With the catalog they are counted by SQLite,
+        no image is read (the collection is not loaded, see main). Without it, the collection is loaded
+
+        Args:
+            args (Namespace): arguments of the command
+
+        Returns:
+            Dict: number of images, number of images with each tag, first and last readable dates, if the catalog is used
+            and number of images whose metadata is not written yet
+        """
+        tags = sorted(tagInstance.getname() for tagInstance in self.tagCollection.getItems())
+        catalog = self.module.getCatalog()
+        if catalog is not None:
+            count, tagCounts, firstDate, lastDate = catalog.stats()
+            tagCounts = {tag: tagCounts.get(tag, 0) for tag in tags}
+        else:
+            if not self.module.isImgCollectionLoaded():
+                self.module.loadImgCollection()
+            dateIndex = self.imgCollection.getDateIndex()
+            # Images whose date can't be read are after the others
+            imgs = dateIndex.getImages()[:dateIndex.position(DateIndex.UNKNOWN)]
+            count = self.imgCollection.size()
+            tagIndex = self.imgCollection.getTagIndex()
+            tagCounts = {tag: tagIndex.bitmap(tag).bit_count() for tag in tags}
+            firstDate = imgs[0].getDate() if imgs else None
+            lastDate = imgs[-1].getDate() if imgs else None
+        return {"images": count, "tags": tagCounts, "firstDate": firstDate, "lastDate": lastDate,
+                "catalog": catalog is not None, "pendingMetadata": self.module.getMetadataStore().pending()}
+
+    def run(self, args):
+        """
+        run : runs a command
+
+        Args:
+            args (Namespace): arguments of the command line
+
+        Returns:
+            Dict: result of the command
+        """
+        return getattr(self, args.command)(args)
+
+def main(argv = None):
+    """
+    main : runs the command line, in the folder of the library (paths given on the command line are made absolute before)
+
+    Args:
+        argv (list, optional): arguments, None for sys.argv. Defaults to None.
+
+    Returns:
+        int: exit code, 0 if the command succeeded
+    """
+    args = PicLibCLI.makeParser().parse_args(argv)
+    if args.metrics is not None:
+        Metrics.enable()
+    for name in ("folder", "path", "metrics"):
+        if getattr(args, name, None) is not None:
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    args.images = [os.path.abspath(path) for path in getattr(args, "images", [])]
+    try:
+        os.chdir(args.dir)
+        # stats reads the catalog, the images are only loaded without it (see stats)
+        cli = PicLibCLI(AppModule(loadImages = args.command != "stats"))
+        result = cli.run(args)
+        cli.module.getMetadataStore().flush()
+        Metrics.dump(args.metrics)
+    except (ValueError, OSError) as e:
+        print(json.dumps({"error": str(e)}), file = sys.stderr)
+        return 1
+    if getattr(args, "paths", False) and "images" in result:
+        for img in result["images"]:
+            print(img["imageFile"])
+    else:
+        print(json.dumps(result))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
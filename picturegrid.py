@@ -1,11 +1,17 @@
 from kivy.uix.stacklayout import StackLayout
 from kivy.uix.boxlayout import BoxLayout
 from imagebox import ImageBox
+from dateindex import DateIndex
+from pageprefetcher import PagePrefetcher
+from lazypopup import LazyPopup
+from startupprofile import StartupProfile
+from metrics import Metrics
 from kivy.uix.popup import Popup
-from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
+from kivy.clock import Clock
 from math import ceil
 from kivy.uix.label import Label
+import threading
 
 class PictureGrid(StackLayout):
     """
@@ -26,11 +32,23 @@ class PictureGrid(StackLayout):
 
         self.centralPanel = centralPanel
         self.imgsPerPage = 9
+        # When True, the images are scrolled continuously in a RecycleGrid instead of shown by pages
+        self.recycling = False
         self.imgCollection = centralPanel.getPicLib().getImgCollection()
         self.currentCollection = self.imgCollection
         self.buttonsBar = centralPanel.getMiddleRow().getButtonsBar()
         self.bottomRow = self.centralPanel.getBottomRow()
 
+        # Prepares the image boxes of the pages next to the one shown (set its depth to 0 to disable it)
+        self.prefetcher = PagePrefetcher(centralPanel.getPicLib().getAppModule().getThumbnailCache(), ImageBox.IMAGE_HEIGHT,
+                                         makeBox = lambda img: ImageBox.makeImageBox(img, self.centralPanel),
+                                         schedule = lambda func: Clock.schedule_once(lambda dt: func()))
+        # Created the first time the images are scrolled continuously (see displayRecycleGrid)
+        self.recycleGrid = None
+        # Images of the collection in the order they are shown, rebuilt only when the collection changes
+        self.imgsToDisplay = []
+        self.displayedVersion = None
+
         self.buttonsBar.buttonNext.bind(on_press = self.displayNextImgs)
         self.buttonsBar.buttonPrevious.bind(on_press = self.displayPreviousImgs)
         self.buttonsBar.buttonSearchClear.bind(on_press = self.clearSearch)
@@ -41,12 +59,67 @@ class PictureGrid(StackLayout):
         self.buttonsBar.buttonRemoveTag.bind(on_press = lambda instance: self.centralPanel.displayTagsPanel(instance, self.buttonsBar.buttonRemoveTag.text))
         self.buttonsBar.buttonSearch.bind(on_press = lambda instance: self.centralPanel.displayTagsPanel(instance, self.buttonsBar.buttonSearch.text))
 
-        self.createFirstScanPopup()
-        self.createSettingsPopup()
-        self.createDatePopup()
+        # The popups are created the first time they are opened (see LazyPopup)
+        self.firstScan = None
+        self.scanProgress = None
+        self.rotationProgress = None
+        self.settings = None
+        self.date = None
+        self.buttonsBar.buttonSettings.bind(on_press = LazyPopup.opener(self, "settings", self.createSettingsPopup))
+        self.buttonsBar.buttonDate.bind(on_press = LazyPopup.opener(self, "date", self.createDatePopup))
+
+        self.loadCollection()
+
+    def loadCollection(self):
+        """
+        loadCollection : displays the collection. If the AppModule didn't load it yet, only its first page is read
+        and shown right away, and the rest of the collection is loaded in a background thread. Meanwhile the buttons
+        are disabled, the number of pages grows as the images are read, and the collection is displayed when it is loaded
+        """
+        module = self.centralPanel.getPicLib().getAppModule()
+        if module.isImgCollectionLoaded():
+            self.displayCollection()
+            return
+        with StartupProfile.step("first page"):
+            first = self.imgCollection.loadFirst(self.imgsPerPage)
+            if len(first) > 0:
+                self.displayPreview(first)
+        if len(first) == 0:
+            # Nothing to show before the collection is loaded (ex: first run)
+            module.loadImgCollection()
+            self.endLoad()
+            return
+
+        def progress(loaded, total):
+            Clock.schedule_once(lambda dt: self.bottomRow.updateLabelPage(0, ceil(loaded/self.imgsPerPage)))
+
+        def load():
+            # The images shown are kept by the collection, so they can be selected while it is loaded
+            module.loadImgCollection(first, progress)
+            Clock.schedule_once(lambda dt: self.endLoad())
+
+        threading.Thread(target = load, daemon = True).start()
+
+    def displayPreview(self, imgs):
+        """
+        displayPreview : shows images while the collection is loaded, with the buttons disabled
+
+        Args:
+            imgs (list): CPImage instances of the first page
+        """
+        self.updateDisplay()
+        self.buttonsBar.disabled = True
+        self.clear_widgets()
+        [self.add_widget(ImageBox.makeImageBox(img, self.centralPanel)) for img in imgs]
+        self.bottomRow.updateLabelLoading()
 
-        self.loadImageBoxes()
+    def endLoad(self):
+        """
+        endLoad : enables the buttons and displays the collection, once it is loaded
+        """
+        self.buttonsBar.disabled = False
         self.displayCollection()
+        StartupProfile.mark("library loaded")
     
     def updateCurrentCollection(self, collection):
         """
@@ -85,26 +158,47 @@ class PictureGrid(StackLayout):
         """
         self.imgsPerPage = n
 
-    def loadImageBoxes(self):
+    def isRecycling(self):
         """
-        loadImageBoxes : loads the image boxes for every image in the main image collection
+        isRecycling : self.recycling getter
+
+        Returns:
+            bool: True if the images are scrolled continuously instead of shown by pages
         """
-        imgs = self.imgCollection.getItems()
-        [ImageBox.makeImageBox(img, self.centralPanel) for img in imgs]
+        return self.recycling
+
+    def setRecycling(self, recycling):
+        """
+        setRecycling : changes between showing the images by pages and scrolling them continuously, and displays the collection
+
+        Args:
+            recycling (bool): True to scroll the images continuously (see RecycleGrid)
+        """
+        self.recycling = recycling
+        self.displayCollection()
 
     def displayCollection(self):
         """
         displayCollection : Displays the current collection if it has at least one image.
         If the collection doesn't have any images, the firstScan popup is opened.
+        The prefetch of the pages of the previously displayed collection is cancelled.
+        The list of images to display is only rebuilt if images were added to or removed from the collection.
         """
+        self.prefetcher.cancel()
         if self.currentCollection.size() > 0:
             self.lastPage = ceil(self.currentCollection.size()/self.imgsPerPage)
-            self.imgsToDisplay = list(self.currentCollection.getItems())
+            version = (self.currentCollection, self.currentCollection.getVersion())
+            if version != self.displayedVersion:
+                self.imgsToDisplay = list(self.currentCollection.getItems())
+                self.displayedVersion = version
             self.currentPage = 0
             self.updateDisplay()
-            self.displayImageBoxes()
+            if self.recycling:
+                self.displayRecycleGrid()
+            else:
+                self.displayImageBoxes()
         else:
-            self.firstScan.open()
+            LazyPopup.get(self, "firstScan", self.createFirstScanPopup).open()
     
     def updateDisplay(self):
         """
@@ -136,22 +230,53 @@ class PictureGrid(StackLayout):
     def displayImageBoxes(self):
         """
         displayImageBoxes : given the current page and the number of images per page set in self.imgsPerPage,
-        displays that number of image boxes, updates the page label with the current and last page
+        displays that number of image boxes, updates the page label with the current and last page.
+        The image boxes are only created when their page is shown (see ImageBox.makeImageBox),
+        or just before, by the prefetch of the pages next to the one shown
         """
         self.imgsDisplayed = self.imgsToDisplay[self.currentPage * self.imgsPerPage : self.currentPage * self.imgsPerPage + self.imgsPerPage]
-        self.clear_widgets()
-        [self.add_widget(ImageBox.makeImageBox(img, self.centralPanel)) for img in self.imgsDisplayed]
+        with Metrics.span("grid render"):
+            if self.recycleGrid is not None and self.recycleGrid.parent is self:
+                # Unbinds the tiles of the RecycleGrid, which is replaced by the image boxes
+                self.recycleGrid.setImages([])
+            self.clear_widgets()
+            [self.add_widget(ImageBox.makeImageBox(img, self.centralPanel)) for img in self.imgsDisplayed]
         self.bottomRow.updateLabelPage(self.currentPage, self.lastPage)
         self.pictureButtonValidator()
+        self.prefetcher.prefetch(self.imgsToDisplay, self.currentPage, self.imgsPerPage)
     
+    def displayRecycleGrid(self):
+        """
+        displayRecycleGrid : displays all the images of the collection in the RecycleGrid, which only creates
+        widgets for the images on the screen. The bottom row shows the images on the screen instead of the page
+        """
+        with Metrics.span("grid render"):
+            if self.recycleGrid is None:
+                from recyclegrid import RecycleGrid
+                self.recycleGrid = RecycleGrid(self.centralPanel, onScroll = self.bottomRow.updateLabelRange)
+            if self.recycleGrid.parent is not self:
+                self.clear_widgets()
+                self.add_widget(self.recycleGrid)
+            self.recycleGrid.setImages(self.imgsToDisplay)
+        self.pictureButtonValidator()
+
+    def drawFrames(self):
+        """
+        drawFrames : updates the frame of the images shown in the RecycleGrid (the image boxes of the pages are
+        updated by CentralPanel.clearSelectedImgs)
+        """
+        if self.recycleGrid is not None:
+            self.recycleGrid.drawFrames()
+
     def pictureButtonValidator(self):
         """
         pictureButtonValidator : verifies which buttons should be enabled depending on the current page:
             - buttonPrevious: disabled when on the first page
             - buttonNext: disabled when on the last page
+        Both are disabled when the images are scrolled instead of shown by pages
         """
         # NEW added possibility of first page being the last and both buttons being disabled
-        if self.lastPage == 1:
+        if self.lastPage == 1 or self.recycling:
             self.buttonsBar.buttonPrevious.disable()
             self.buttonsBar.buttonNext.disable()
         elif self.currentPage == 0:
@@ -182,6 +307,7 @@ class PictureGrid(StackLayout):
         """
         createFirstScanPopup : creates the popup that allows to input the path to do the first scan
         """
+        from kivy.uix.textinput import TextInput
         box = BoxLayout(orientation='vertical')
         box.add_widget(Label(text = "Type directory to scan:"))
         self.firstFolder = TextInput(multiline=False)
@@ -196,13 +322,81 @@ class PictureGrid(StackLayout):
     
     def scanFirstFolder(self, button):
         """
-        scanFirstFolder : scans the folder input by the user, loads the new image boxes, displays the collection and
-        closes the firstScan popup
+        scanFirstFolder : closes the firstScan popup and scans the folder input by the user in the background,
+        showing its progress (see startScan)
         """
-        self.imgCollection.scanFolder(self.firstFolder.text)
-        self.loadImageBoxes()
-        self.displayCollection()
+        folder = self.firstFolder.text
         self.closeFirstScan()
+        self.startScan(folder)
+
+    def createScanProgressPopup(self):
+        """
+        createScanProgressPopup : creates the popup that shows the progress of a scan
+        """
+        from kivy.uix.progressbar import ProgressBar
+        box = BoxLayout(orientation='vertical')
+        self.scanProgressBar = ProgressBar(max = 1, value = 0)
+        box.add_widget(self.scanProgressBar)
+        self.scanProgressLabel = Label(text = "Looking for images...")
+        box.add_widget(self.scanProgressLabel)
+
+        self.scanProgress = Popup(title='Scanning',content=box,size_hint=(None, None), size=(500, 150), auto_dismiss=False)
+
+    def startScan(self, folder):
+        """
+        startScan : scans the given folder in a background thread so the app doesn't freeze.
+        The scanProgress popup is updated with the progress events of the scan, and when it ends (also if it fails),
+        the collection is displayed
+
+        Args:
+            folder (str): folder to scan
+        """
+        scanProgress = LazyPopup.get(self, "scanProgress", self.createScanProgressPopup)
+        self.scanProgressBar.max = 1
+        self.scanProgressBar.value = 0
+        self.scanProgressLabel.text = "Looking for images..."
+        scanProgress.open()
+
+        def scan():
+            summary = None
+            error = None
+            try:
+                # Progress events arrive in the scan thread, the widgets are only updated in the UI thread
+                summary = self.imgCollection.scanFolder(folder, onProgress = lambda progress: Clock.schedule_once(lambda dt: self.updateScanProgress(progress)))
+            except Exception as e:
+                error = e
+            finally:
+                # The popup is modal, it must be closed whatever happened to the scan
+                Clock.schedule_once(lambda dt: self.endScan(summary, error))
+
+        threading.Thread(target = scan, daemon = True).start()
+
+    def updateScanProgress(self, progress):
+        """
+        updateScanProgress : updates the scanProgress popup with a progress event
+
+        Args:
+            progress (ImportProgress): progress of the scan
+        """
+        self.scanProgressBar.max = max(1, progress.totalFiles)
+        self.scanProgressBar.value = progress.files
+        self.scanProgressLabel.text = str(progress)
+
+    def endScan(self, summary, error = None):
+        """
+        endScan : closes the scanProgress popup and displays the collection.
+        If the scan failed or some images could not be imported, a warning popup is opened
+
+        Args:
+            summary (ScanSummary): files added, changed, skipped and that could not be imported, None if the scan failed
+            error (Exception, optional): error that stopped the scan. Defaults to None.
+        """
+        self.scanProgress.dismiss()
+        self.displayCollection()
+        if error is not None:
+            self.centralPanel.createWarningPopup("The scan failed: " + str(error))
+        elif len(summary.errors) > 0:
+            self.centralPanel.createWarningPopup(str(summary))
 
     def closeFirstScan(self):
         """
@@ -216,6 +410,9 @@ class PictureGrid(StackLayout):
         createSettingsPopup : creates the Settings popup that allows to change the number of images to be
         displayed per page and allows to scan a given folder
         """
+        from kivy.uix.textinput import TextInput
+        from kivy.uix.togglebutton import ToggleButton
+        from filetransfer import FileTransfer
         box = BoxLayout(orientation='vertical')
         box.add_widget(Label(text="Images per page:"))
 
@@ -239,14 +436,39 @@ class PictureGrid(StackLayout):
         box3.add_widget(btnExit)
         box.add_widget(box3)
 
-        self.settings = Popup(title='Settings',content=box,size_hint=(None, None), size=(500, 250), auto_dismiss=False)
+        btnRecycling = ToggleButton(text="Continuous scrolling", size_hint=(0.5, 0.5))
+        box.add_widget(btnRecycling)
+
+        box.add_widget(Label(text = "Type date (YYYY/MM/DD) or range of dates (YYYY/MM/DD..YYYY/MM/DD):"))
+        self.dates = TextInput(multiline=False)
+        btnGoToDate = Button(text="Go to date")
+        btnShowDates = Button(text="Show dates")
+        box4 = BoxLayout(orientation = 'horizontal')
+        box4.add_widget(self.dates)
+        box4.add_widget(btnGoToDate)
+        box4.add_widget(btnShowDates)
+        box.add_widget(box4)
+
+        # The import mode is used by the next scans (see FileTransfer)
+        module = self.centralPanel.getPicLib().getAppModule()
+        box5 = BoxLayout(orientation = 'horizontal')
+        box5.add_widget(Label(text = "Import by:"))
+        for mode in FileTransfer.MODES:
+            btnMode = ToggleButton(text = mode, group = 'importMode', allow_no_selection = False,
+                                   state = 'down' if mode == module.getImportMode() else 'normal')
+            btnMode.bind(state = lambda instance, state: module.setImportMode(instance.text) if state == 'down' else None)
+            box5.add_widget(btnMode)
+        box.add_widget(box5)
+
+        self.settings = Popup(title='Settings',content=box,size_hint=(None, None), size=(500, 400), auto_dismiss=False)
 
         btnIncrease.bind(on_press = self.increaseItemsPerPage)
         btnDecrease.bind(on_press = self.decreaseItemsPerPage)
         btnScan.bind(on_press = self.scanFolder)
         btnExit.bind(on_press = self.cancelSettings)
-
-        self.buttonsBar.buttonSettings.bind(on_press = self.settings.open)
+        btnRecycling.bind(state = lambda instance, state: self.setRecycling(state == 'down'))
+        btnGoToDate.bind(on_press = self.goToDate)
+        btnShowDates.bind(on_press = self.showDates)
     
     def increaseItemsPerPage(self, button):
         """
@@ -278,25 +500,63 @@ class PictureGrid(StackLayout):
     
     def scanFolder(self, button):
         """
-        scanFolder : given the folder input by the user, used the scanFolder method of the image collection to
-        add new images to the collection, displays the updated collection and closes the settings popup
+        scanFolder : closes the settings popup and, given the folder input by the user, adds new images
+        to the collection in the background, showing the progress (see startScan)
         """
-        self.imgCollection.scanFolder(self.folder.text)
-        self.loadImageBoxes()
-        self.displayCollection()
+        folder = self.folder.text
         self.cancelSettings(button)
+        self.startScan(folder)
 
     def cancelSettings(self, button):
         """
-        cancelSettings : closes the settings popup and resets the text in its TextInput
+        cancelSettings : closes the settings popup and resets the text in its TextInputs
         """
         self.folder.text = ''
+        self.dates.text = ''
         self.settings.dismiss()
 
+    def goToDate(self, button):
+        """
+        goToDate : closes the settings popup and shows the page (or scrolls to the row) of the first image of the date
+        input by the user, or of the next date with images. The images are shown in date order, so the image is found
+        by a binary search (see DateIndex)
+        """
+        text = self.dates.text
+        self.cancelSettings(button)
+        try:
+            ordinal = DateIndex.boundary(text, False)
+        except ValueError:
+            self.centralPanel.createWarningPopup("Invalid date: " + text)
+            return
+        position = min(DateIndex.positionIn(self.imgsToDisplay, ordinal), max(0, len(self.imgsToDisplay) - 1))
+        if self.recycling:
+            self.recycleGrid.scrollToIndex(position)
+        else:
+            self.currentPage = position // self.imgsPerPage
+            self.displayImageBoxes()
+
+    def showDates(self, button):
+        """
+        showDates : closes the settings popup and displays the images of the date or range of dates input by the user,
+        like a search (the buttonSearchClear shows the whole collection again)
+        """
+        text = self.dates.text
+        self.cancelSettings(button)
+        try:
+            found = self.imgCollection.findDates(text)
+        except ValueError:
+            self.centralPanel.createWarningPopup("Invalid date: " + text)
+            return
+        if found.size() > 0:
+            self.updateCurrentCollection(found)
+        else:
+            self.centralPanel.createWarningPopup("No images between these dates:\n" + text)
+
     def createDatePopup(self):
         """
         createDatePopup : creates a popup that allows the user to input a new date for the selected image
         """
+        from kivy.uix.textinput import TextInput
         box = BoxLayout(orientation='vertical')
         box.add_widget(Label(text = "Type date in YYYY/MM/DD format:"))
         self.dateInput = TextInput(multiline=False)
@@ -313,21 +573,17 @@ class PictureGrid(StackLayout):
 
         btnChange.bind(on_press = self.changeDate)
         btnCancel.bind(on_press = self.cancelDate)
-
-        self.buttonsBar.buttonDate.bind(on_press = self.date.open)
     
     def changeDate(self, button):
         """
         changeDate : changes the date of the selected image into the given the date input by the user,
-        updates the information in the bottom row,
-        saves the image collection in its json file (since one of its images path has been updated) and
-        closes the date popup
+        updates the information in the bottom row and closes the date popup.
+        The new path of the image is saved by the image collection's operation log (see CPImage.setDate)
         """
         selected = self.centralPanel.getSelectedImgs()
         img = selected[0]
         img.setDate(self.dateInput.text)
         self.bottomRow.updateInfo(selected)
-        self.imgCollection.saveCollection()
         self.cancelDate(button)
     
     def cancelDate(self, button):
@@ -339,9 +595,63 @@ class PictureGrid(StackLayout):
     
     def rotateImg(self, button):
         """
-        rotateImg : rotates the selected image in 90 degrees clockwise, updating its image box
+        rotateImg : rotates the selected images in 90 degrees clockwise, in the background so the app doesn't freeze.
+        The image box of each image is updated as soon as it is rotated, and the rotationProgress popup
+        is updated with the progress events of the batch
+        """
+        from rotationbatch import RotationBatch
+        # The selection may change while the images are being rotated
+        selected = list(self.centralPanel.getSelectedImgs())
+        self.rotationBatch = RotationBatch(onImage = lambda img: Clock.schedule_once(lambda dt: self.refreshRotatedImg(img)),
+                                           onProgress = lambda progress: Clock.schedule_once(lambda dt: self.updateRotationProgress(progress)),
+                                           metadataStore = self.centralPanel.getPicLib().getAppModule().getMetadataStore())
+        rotationProgress = LazyPopup.get(self, "rotationProgress", self.createRotationProgressPopup)
+        self.rotationProgressBar.max = max(1, len(selected))
+        self.rotationProgressBar.value = 0
+        self.rotationProgressLabel.text = "Rotating {} images...".format(len(selected))
+        rotationProgress.open()
+        self.rotationBatch.run(selected)
+
+    def createRotationProgressPopup(self):
         """
-        selected = self.centralPanel.getSelectedImgs()
-        img = selected[0]
-        box = ImageBox.makeImageBox(img, self.centralPanel)
-        box.rotate()
\ No newline at end of file
+        createRotationProgressPopup : creates the popup that shows the progress of a rotation, with a button to cancel it
+        """
+        from kivy.uix.progressbar import ProgressBar
+        box = BoxLayout(orientation='vertical')
+        self.rotationProgressBar = ProgressBar(max = 1, value = 0)
+        box.add_widget(self.rotationProgressBar)
+        self.rotationProgressLabel = Label(text = "")
+        box.add_widget(self.rotationProgressLabel)
+        btnCancel = Button(text="Cancel", size_hint=(1, 0.6))
+        btnCancel.bind(on_press = lambda btn: self.rotationBatch.cancel())
+        box.add_widget(btnCancel)
+
+        self.rotationProgress = Popup(title='Rotating',content=box,size_hint=(None, None), size=(500, 200), auto_dismiss=False)
+
+    def refreshRotatedImg(self, img):
+        """
+        refreshRotatedImg : updates the image box (or the tile) of an image that was rotated, if it is shown
+
+        Args:
+            img (CPImage): image rotated
+        """
+        box = ImageBox.findImageBox(img)
+        if box is not None:
+            box.refreshRotation()
+        if self.recycling:
+            self.recycleGrid.rebindImage(img)
+
+    def updateRotationProgress(self, progress):
+        """
+        updateRotationProgress : updates the rotationProgress popup with a progress event.
+        When the batch is finished, the popup is closed and, if some images could not be rotated, a warning popup is opened
+
+        Args:
+            progress (RotationProgress): progress of the rotation
+        """
+        self.rotationProgressBar.value = progress.done
+        self.rotationProgressLabel.text = str(progress)
+        if progress.finished:
+            self.rotationProgress.dismiss()
+            if len(progress.errors) > 0:
+                self.centralPanel.createWarningPopup(str(progress))
\ No newline at end of file
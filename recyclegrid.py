@@ -0,0 +1,298 @@
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.relativelayout import RelativeLayout
+from kivy.uix.image import Image
+from kivy.graphics import Color, Rectangle
+from kivy.clock import Clock
+from imagebox import ImageBox
+from pageprefetcher import PagePrefetcher
+from math import ceil
+
+class ImageTile(RelativeLayout):
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ImageTile : selectable image of the RecycleGrid. Unlike an ImageBox, a tile is not tied to one image,
+    it is bound to whichever image is shown in its cell and bound to another one when the cell leaves the screen.
+    It can be used where an ImageBox is expected by the CentralPanel (getCPImage, isSelected and drawFrame).
+    """
+    def __init__(self, centralPanel, thumbnailCache, **kwargs):
+        """
+        __init__ : ImageTile class constructor
+
+        Args:
+            centralPanel (CentralPanel): CentralPanel layout used to update the selected images
+            thumbnailCache (ThumbnailCache): cache of the thumbnails
+        """
+        super().__init__(**kwargs)
+        self.size_hint = (None, None)
+        self.height = 150
+        self.centralPanel = centralPanel
+        self.thumbnailCache = thumbnailCache
+        self.cpImage = None
+        self.image = Image(source = '', size_hint = (None, None), allow_stretch = False, keep_ratio = False, pos = (5, 5))
+        self.add_widget(self.image)
+        with self.canvas.before:
+            self.frameColor = Color(1,1,1,1)
+            self.rect = Rectangle(size = self.size, pos = (0,0))
+        self.bind(size = ImageTile.__update_rect)
+
+    @staticmethod
+    def __update_rect(instance, value):
+        """
+        __update_rect : updates the rectangle
+
+        Args:
+            instance (ImageTile): ImageTile instance
+            value (value): size of the tile
+        """
+        instance.rect.size = instance.size
+
+    def bindImage(self, cpimage, maxWidth, reload = False):
+        """
+        bindImage : shows an image in the tile, its cached thumbnail if there is one, its preview otherwise,
+        while the thumbnail is generated in the background
+
+        Args:
+            cpimage (CPImage): image
+            maxWidth (float): width of the cell of the tile
+            reload (bool, optional): True if the image was rotated, its thumbnails have the same paths as before,
+            so the textures of the old ones are removed from Kivy's cache. Defaults to False.
+        """
+        self.cpImage = cpimage
+        width, height = cpimage.getDisplayDimensions()
+        imageratio = width / height
+        imageHeight = min(ImageBox.IMAGE_HEIGHT, (maxWidth - 10) / imageratio)
+        self.image.size = (imageHeight * imageratio, imageHeight)
+        self.size = (imageHeight * imageratio + 10, imageHeight + 10)
+        thumbnail = self.thumbnailCache.get(cpimage, ImageBox.IMAGE_HEIGHT)
+        if reload:
+            # As in ImageBox.refreshRotation, the texture of the thumbnail shown before is removed from Kivy's cache
+            self.image.remove_from_cache()
+        self.image.source = thumbnail or self.thumbnailCache.getPreview(cpimage) or ''
+        if reload:
+            # The preview may have been shown before the rotation too
+            self.image.reload()
+        self.drawFrame()
+        if thumbnail is None:
+            # The tile may be bound to another image when the thumbnail is ready
+            self.thumbnailCache.request(cpimage, ImageBox.IMAGE_HEIGHT,
+                                        lambda path: Clock.schedule_once(lambda dt: self.setThumbnail(cpimage, path)))
+
+    def setThumbnail(self, cpimage, path):
+        """
+        setThumbnail : shows the thumbnail of an image, if the tile is still bound to it
+
+        Args:
+            cpimage (CPImage): image of the thumbnail
+            path (str): path of the thumbnail, None if it couldn't be generated
+        """
+        if path is not None and cpimage is self.cpImage:
+            self.image.source = path
+
+    def on_touch_down(self, touch):
+        """
+        on_touch_down : selects or unselects the image of the tile when it is clicked by the user
+        """
+        if self.cpImage is not None and self.collide_point(*touch.pos):
+            self.centralPanel.updateSelectedImgs(self)
+
+    def drawFrame(self):
+        """
+        drawFrame : updates the color of the border, red if the image is selected and white if it isn't
+        """
+        if self.isSelected():
+            self.frameColor.rgba = (1,0,0,1)
+        else:
+            self.frameColor.rgba = (1,1,1,1)
+
+    def isSelected(self):
+        """
+        isSelected : used to know if the image of the tile is selected (the selection is kept by the CentralPanel)
+
+        Returns:
+            bool: True if the image is selected
+        """
+        return self.centralPanel.isImgSelected(self.cpImage)
+
+    def getCPImage(self):
+        """
+        getCPImage : self.cpImage getter
+
+        Returns:
+            CPImage: image the tile is bound to
+        """
+        return self.cpImage
+
+class RecycleGrid(ScrollView):
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    RecycleGrid : grid of images scrolled continuously, used by the PictureGrid instead of pages.
+    Only the cells on the screen (and one row above and below) have a tile: when a cell leaves the screen,
+    its tile is reused for a cell that enters it. The number of widgets depends on the size of the window,
+    not on the number of images, and no widget is created while scrolling once the pool is full.
+    The thumbnails of the rows around the screen are generated in advance by a PagePrefetcher.
+    """
+
+    # Size of each cell of the grid (the height of an ImageBox plus the spacing of the PictureGrid)
+    CELL_WIDTH = 225
+    CELL_HEIGHT = 157.5
+
+    # Rows with tiles above and below the screen
+    OVERSCAN = 1
+
+    def __init__(self, centralPanel, onScroll = None, **kwargs):
+        """
+        __init__ : RecycleGrid class constructor
+
+        Args:
+            centralPanel (CentralPanel): CentralPanel layout used to update the selected images
+            onScroll (function, optional): called with the first, last and total number of images
+            when the images on the screen change. Defaults to None.
+        """
+        super().__init__(**kwargs)
+        self.do_scroll_x = False
+        self.bar_width = 10
+        self.scroll_type = ['bars', 'content']
+
+        self.centralPanel = centralPanel
+        self.onScroll = onScroll
+        self.thumbnailCache = centralPanel.getPicLib().getAppModule().getThumbnailCache()
+        self.prefetcher = PagePrefetcher(self.thumbnailCache, ImageBox.IMAGE_HEIGHT)
+
+        # Only its height depends on the number of images, it has no more children than the pool of tiles
+        self.content = RelativeLayout(size_hint = (1, None), height = 0)
+        self.add_widget(self.content)
+
+        self.imgs = []
+        self.columns = 1
+        # self.tiles (Dict): index of the image in self.imgs -> tile bound to it
+        self.tiles = {}
+        # self.free (list): tiles not bound to any image, removed from the content
+        self.free = []
+        self.shown = None
+
+        self.bind(scroll_y = self.refresh, size = self.layoutContent)
+
+    def setImages(self, imgs):
+        """
+        setImages : shows a list of images, from the top of the grid
+
+        Args:
+            imgs (list): images, in the order they are shown (the list is not copied)
+        """
+        self.imgs = imgs
+        self.releaseTiles()
+        self.scroll_y = 1
+        self.layoutContent()
+
+    def layoutContent(self, *args):
+        """
+        layoutContent : computes the number of columns and the height of the grid from the width of the window
+        """
+        columns = max(1, int(self.width // RecycleGrid.CELL_WIDTH))
+        if columns != self.columns:
+            # Every image changes of cell
+            self.columns = columns
+            self.releaseTiles()
+        self.content.height = ceil(len(self.imgs) / self.columns) * RecycleGrid.CELL_HEIGHT
+        self.refresh()
+
+    def visibleRange(self):
+        """
+        visibleRange : indexes of the images whose cells are on the screen, or close to it
+
+        Returns:
+            tuple: index of the first image and index after the last one
+        """
+        # Distance between the top of the grid and the top of the screen
+        offset = (1 - self.scroll_y) * max(0, self.content.height - self.height)
+        firstRow = max(0, int(offset // RecycleGrid.CELL_HEIGHT) - RecycleGrid.OVERSCAN)
+        lastRow = int((offset + self.height) // RecycleGrid.CELL_HEIGHT) + RecycleGrid.OVERSCAN
+        return (min(len(self.imgs), firstRow * self.columns), min(len(self.imgs), (lastRow + 1) * self.columns))
+
+    def refresh(self, *args):
+        """
+        refresh : binds the cells that entered the screen to the tiles of the cells that left it
+        """
+        first, last = self.visibleRange()
+        for index in [index for index in self.tiles if not first <= index < last]:
+            self.releaseTile(index)
+        for index in range(first, last):
+            if index not in self.tiles:
+                tile = self.free.pop() if len(self.free) > 0 else ImageTile(self.centralPanel, self.thumbnailCache)
+                tile.bindImage(self.imgs[index], RecycleGrid.CELL_WIDTH)
+                self.placeTile(index, tile)
+                self.content.add_widget(tile)
+                self.tiles[index] = tile
+        if (first, last) != self.shown:
+            self.shown = (first, last)
+            if last > first:
+                self.prefetcher.prefetchRange(self.imgs, first, last)
+            if self.onScroll is not None:
+                self.onScroll(first, last, len(self.imgs))
+
+    def placeTile(self, index, tile):
+        """
+        placeTile : moves a tile to the cell of its image, centered in it
+
+        Args:
+            index (int): index of the image in self.imgs
+            tile (ImageTile): tile bound to the image
+        """
+        row, column = divmod(index, self.columns)
+        tile.pos = (column * RecycleGrid.CELL_WIDTH + (RecycleGrid.CELL_WIDTH - tile.width) / 2,
+                    self.content.height - (row + 1) * RecycleGrid.CELL_HEIGHT)
+
+    def scrollToIndex(self, index):
+        """
+        scrollToIndex : scrolls the grid so the row of an image is at the top of the screen
+
+        Args:
+            index (int): index of the image in self.imgs
+        """
+        offset = (index // self.columns) * RecycleGrid.CELL_HEIGHT
+        scrollable = self.content.height - self.height
+        self.scroll_y = 1 - min(1, offset / scrollable) if scrollable > 0 else 1
+
+    def releaseTile(self, index):
+        """
+        releaseTile : unbinds the tile of an image and keeps it for another cell
+
+        Args:
+            index (int): index of the image in self.imgs
+        """
+        tile = self.tiles.pop(index)
+        self.content.remove_widget(tile)
+        tile.cpImage = None
+        self.free.append(tile)
+
+    def releaseTiles(self):
+        """
+        releaseTiles : unbinds every tile (used when the images or the number of columns change)
+        """
+        for index in list(self.tiles):
+            self.releaseTile(index)
+        self.shown = None
+
+    def rebindImage(self, cpimage):
+        """
+        rebindImage : shows an image again in its tile, if it is on the screen (used when the image is rotated).
+        The thumbnails of a rotated image keep their paths, so they are reloaded instead of taken from Kivy's cache
+
+        Args:
+            cpimage (CPImage): image
+        """
+        for index, tile in self.tiles.items():
+            if tile.getCPImage() is cpimage:
+                tile.bindImage(cpimage, RecycleGrid.CELL_WIDTH, reload = True)
+                self.placeTile(index, tile)
+
+    def drawFrames(self):
+        """
+        drawFrames : updates the frame of every tile on the screen (used when the selection is cleared)
+        """
+        for tile in self.tiles.values():
+            tile.drawFrame()
@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+class RotationProgress:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    RotationProgress : progress event sent by a RotationBatch each time an image is rotated
+    """
+    def __init__(self, rotated, done, total, errors, elapsed, cancelled, finished):
+        """
+        __init__ : RotationProgress class constructor
+
+        Args:
+            rotated (int): number of images rotated
+            done (int): number of images rotated, that failed or that were skipped because the batch was cancelled
+            total (int): number of images to rotate
+            errors (list): (CPImage, exception) of the images that could not be rotated
+            elapsed (float): seconds since the batch started
+            cancelled (bool): True if the batch was cancelled
+            finished (bool): True if no image is being rotated anymore (sent once, with the last event)
+        """
+        self.rotated = rotated
+        self.done = done
+        self.total = total
+        self.errors = errors
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+        self.finished = finished
+
+    def __str__(self):
+        """
+        __str__ : toString method
+
+        Returns:
+            str: string representation of the progress, to be shown to the user
+        """
+        text = "{}/{} images rotated".format(self.rotated, self.total)
+        if len(self.errors) > 0:
+            text += ", {} errors".format(len(self.errors))
+        if self.cancelled:
+            text += " (cancelled)"
+        return text
+
+class RotationBatch:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    RotationBatch : rotates several images 90 degrees clockwise on a pool of background threads (see CPImage.rotate).
+    Each rotated image is given to onImage as soon as it is done, so its box can be refreshed while the others are
+    being rotated, and a progress event is sent to onProgress. Both are called from the background threads.
+    The batch can be cancelled, the images already rotated stay rotated.
+    """
+    def __init__(self, workers = 4, onImage = None, onProgress = None, metadataStore = None):
+        """
+        __init__ : RotationBatch class constructor
+
+        Args:
+            workers (int, optional): number of threads. Defaults to 4.
+            onImage (function, optional): called with each CPImage rotated. Defaults to None.
+            onProgress (function, optional): called with a RotationProgress after each image. Defaults to None.
+            metadataStore (MetadataStore, optional): store of the images, the new orientations are written to its journal
+            once, when the batch is finished (see MetadataStore.batch). Defaults to None.
+        """
+        self.workers = workers
+        self.metadataStore = metadataStore
+        self.onImage = onImage
+        self.onProgress = onProgress
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.rotated = 0
+        self.done = 0
+        self.total = 0
+        self.errors = []
+        self.start = None
+
+    def run(self, imgs):
+        """
+        run : starts rotating the images in the background and returns right away
+
+        Args:
+            imgs (iterable): CPImage instances, an image given twice is only rotated once
+        """
+        unique = list({id(img): img for img in imgs}.values())
+        self.total = len(unique)
+        self.start = time.time()
+        if self.total == 0:
+            self.finished.set()
+            self._sendProgress(self._progress())
+            return
+        if self.metadataStore is not None:
+            self.metadataStore.beginBatch()
+        executor = ThreadPoolExecutor(self.workers)
+        for img in unique:
+            executor.submit(self._rotate, img)
+        executor.shutdown(wait = False)
+
+    def _rotate(self, img):
+        """
+        _rotate : rotates an image, unless the batch was cancelled
+
+        Args:
+            img (CPImage): image
+        """
+        rotated = False
+        if not self.cancelled.is_set():
+            try:
+                img.rotate()
+                rotated = True
+                if self.onImage is not None:
+                    self.onImage(img)
+            except Exception as e:
+                with self.lock:
+                    self.errors.append((img, e))
+        with self.lock:
+            self.done += 1
+            self.rotated += rotated
+            if self.done == self.total:
+                if self.metadataStore is not None:
+                    self.metadataStore.endBatch()
+                self.finished.set()
+            # Taken with the lock held, so only the last image's event says the batch is finished
+            progress = self._progress()
+        self._sendProgress(progress)
+
+    def _progress(self):
+        """
+        _progress : current progress of the batch
+
+        Returns:
+            RotationProgress: progress event
+        """
+        return RotationProgress(self.rotated, self.done, self.total, list(self.errors), time.time() - self.start,
+                                self.cancelled.is_set(), self.done == self.total)
+
+    def _sendProgress(self, progress):
+        """
+        _sendProgress : sends a progress event to onProgress
+
+        Args:
+            progress (RotationProgress): progress event
+        """
+        if self.onProgress is not None:
+            self.onProgress(progress)
+
+    def cancel(self):
+        """
+        cancel : stops the batch, the images not rotated yet are skipped (the ones being rotated are finished)
+        """
+        self.cancelled.set()
+
+    def wait(self, timeout = None):
+        """
+        wait : waits until every image is rotated or skipped
+
+        Args:
+            timeout (float, optional): maximum seconds to wait, None for no limit. Defaults to None.
+
+        Returns:
+            bool: True if the batch is finished
+        """
+        return self.finished.wait(timeout)
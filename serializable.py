@@ -8,6 +8,9 @@ class Serializable:
      The Super class of all classes that will be saved to files
     """
 
+    # Empty, so subclasses can have no __dict__ (see CPImage)
+    __slots__ = ()
+
     def toJson(self):
         """
         toJson transforms an instance into a dictionary
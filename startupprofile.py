@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+import builtins
+import time
+import sys
+
+class StartupProfile:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    StartupProfile : measures the start of the app (python main.py --startup-profile):
+        - the time taken by the imports, and by the slowest modules they import
+        - the time taken to construct each part of the app
+        - the time until the first frame is drawn and until the library is loaded
+    The breakdown is printed to the standard error once both have happened.
+    When the app is not profiled, the methods do nothing.
+    """
+
+    # Running profile, None if the app is not profiled
+    active = None
+
+    # Milestones after which the profile is printed
+    END_MARKS = ("first frame", "library loaded")
+
+    # Number of modules shown in the breakdown of the imports
+    SLOWEST_IMPORTS = 15
+
+    def __init__(self):
+        """
+        __init__ : StartupProfile class constructor, the start of the app is now
+        """
+        self.start = time.perf_counter()
+        # self.steps (list): (name, seconds) of the imports and of the parts of the app constructed
+        self.steps = []
+        # self.modules (list): (seconds, depth, name) of each module imported during the imports measured
+        self.modules = []
+        # self.marks (Dict): milestone -> seconds since the start
+        self.marks = {}
+
+    @staticmethod
+    def begin():
+        """
+        begin : starts profiling the app
+        """
+        StartupProfile.active = StartupProfile()
+
+    @staticmethod
+    @contextmanager
+    def step(name):
+        """
+        step : context manager measuring a part of the start (ex: the construction of a widget)
+
+        Args:
+            name (String): name of the part, shown in the breakdown
+        """
+        profile = StartupProfile.active
+        if profile is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            profile.steps.append((name, time.perf_counter() - start))
+
+    @staticmethod
+    @contextmanager
+    def imports(name):
+        """
+        imports : context manager measuring imports, and each module they import for the first time
+        (the time of a module includes the modules it imports)
+
+        Args:
+            name (String): name of the imports, shown in the breakdown
+        """
+        profile = StartupProfile.active
+        if profile is None:
+            yield
+            return
+        original = builtins.__import__
+        depth = [0]
+
+        def timedImport(module, globals = None, locals = None, fromlist = (), level = 0):
+            if level != 0 or module in sys.modules:
+                return original(module, globals, locals, fromlist, level)
+            start = time.perf_counter()
+            depth[0] += 1
+            try:
+                return original(module, globals, locals, fromlist, level)
+            finally:
+                depth[0] -= 1
+                profile.modules.append((time.perf_counter() - start, depth[0], module))
+
+        builtins.__import__ = timedImport
+        try:
+            with StartupProfile.step("import " + name):
+                yield
+        finally:
+            builtins.__import__ = original
+
+    @staticmethod
+    def mark(name):
+        """
+        mark : records a milestone of the start, the profile is printed once all of END_MARKS are recorded
+
+        Args:
+            name (String): name of the milestone
+        """
+        profile = StartupProfile.active
+        if profile is None or name in profile.marks:
+            return
+        profile.marks[name] = time.perf_counter() - profile.start
+        if all(mark in profile.marks for mark in StartupProfile.END_MARKS):
+            print(profile.report(), file = sys.stderr)
+            StartupProfile.active = None
+
+    def report(self):
+        """
+        report : breakdown of the start
+
+        Returns:
+            String: times of the imports, of the slowest modules, of the parts of the app and of the milestones, in ms
+        """
+        lines = ["Startup profile (ms)", "  imports and construction:"]
+        lines += ["    {:8.1f}  {}".format(seconds * 1000, name) for name, seconds in self.steps]
+        lines.append("  slowest modules (including the modules they import):")
+        slowest = sorted(self.modules, reverse = True)[:StartupProfile.SLOWEST_IMPORTS]
+        lines += ["    {:8.1f}  {}{}".format(seconds * 1000, "  " * depth, name) for seconds, depth, name in slowest]
+        lines.append("  milestones (since the start):")
+        lines += ["    {:8.1f}  {}".format(seconds * 1000, name) for name, seconds in sorted(self.marks.items(), key = lambda mark: mark[1])]
+        return "\n".join(lines)
@@ -25,21 +25,20 @@ class TagCollection(CPCollection):
 
     def addTag(self, tag):
         """
-        addTag adds a tag to the collection and saves it in a json file
+        addTag adds a tag to the collection and saves it in the collection's operation log
 
         Args:
             tag (str): name of the tag to be added
         """
         if tag not in [tagInstance.getname() for tagInstance in self.items]:
-            self.registerItem(Tag(tag))
-        self.saveCollection()
+            self.addItem(Tag(tag))
     
     def removeTag(self, tag):
         """
-        removeTag removes a tag from the collection and saves it in a json file
+        removeTag removes a tag from the collection and saves it in the collection's operation log
 
         Args:
             tag (str): name of the tag to be removed
         """
-        self.items.discard(tag)
-        self.saveCollection()
\ No newline at end of file
+        for tagInstance in [tagInstance for tagInstance in self.items if tagInstance.getname() == tag]:
+            self.removeItem(tagInstance)
\ No newline at end of file
@@ -0,0 +1,243 @@
+class TagIndex:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    TagIndex : inverted index of the tags of an ImageCollection, used to search images by tags without looking at every image.
+    Each image gets a small integer id, and each tag has a bitmap where bit i is set if image i has the tag.
+    Images are identified by the object, not by CPImage.__eq__ (two images with the same content are two images).
+    The bitmaps are bytearrays, so tagging an image only changes one byte, and are turned into Python ints to be
+    combined (OR, AND and NOT are then done on whole machine words, a few microseconds for 500k images).
+    """
+    def __init__(self):
+        """
+        __init__ : TagIndex class constructor, the index is empty
+        """
+        # self.images (list): id -> image, None for removed images (ids are never reused until the index is rebuilt)
+        self.images = []
+        # self.ids (Dict): id() of the image -> id in the index (the image is kept by self.images while it is in the index)
+        self.ids = {}
+        # self.postings (Dict): tag -> bitmap of the ids of the images with the tag
+        self.postings = {}
+        # self.live (bytearray): bitmap of the ids of the images in the index
+        self.live = bytearray()
+        # self.ints (Dict): tag (or None for self.live) -> bitmap as an int, until the bitmap changes
+        self.ints = {}
+
+    @staticmethod
+    def setBit(bitmap, i):
+        """
+        setBit : sets a bit of a bitmap, growing it if needed
+
+        Args:
+            bitmap (bytearray): bitmap
+            i (int): position of the bit
+        """
+        if i >> 3 >= len(bitmap):
+            bitmap.extend(bytes((i >> 3) + 1 - len(bitmap)))
+        bitmap[i >> 3] |= 1 << (i & 7)
+
+    @staticmethod
+    def clearBit(bitmap, i):
+        """
+        clearBit : clears a bit of a bitmap
+
+        Args:
+            bitmap (bytearray): bitmap
+            i (int): position of the bit
+        """
+        if i >> 3 < len(bitmap):
+            bitmap[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def build(self, imgs):
+        """
+        build : rebuilds the index with the given images
+
+        Args:
+            imgs (iterable): CPImage instances
+        """
+        self.images = list(imgs)
+        self.ids = {id(img): i for i, img in enumerate(self.images)}
+        size = (len(self.images) >> 3) + 1
+        self.live = bytearray(((1 << len(self.images)) - 1).to_bytes(size, 'little'))
+        self.postings = {}
+        self.ints = {}
+        for i, img in enumerate(self.images):
+            for tag in img.getTags():
+                bitmap = self.postings.get(tag)
+                if bitmap is None:
+                    bitmap = self.postings[tag] = bytearray(size)
+                bitmap[i >> 3] |= 1 << (i & 7)
+
+    def add(self, img):
+        """
+        add : adds an image (and its tags) to the index, if it is not in it
+
+        Args:
+            img (CPImage): image
+        """
+        if id(img) in self.ids:
+            return
+        i = len(self.images)
+        self.images.append(img)
+        self.ids[id(img)] = i
+        TagIndex.setBit(self.live, i)
+        self.ints.pop(None, None)
+        for tag in img.getTags():
+            TagIndex.setBit(self.postings.setdefault(tag, bytearray()), i)
+            self.ints.pop(tag, None)
+
+    def remove(self, img):
+        """
+        remove : removes an image from the index, if it is in it
+
+        Args:
+            img (CPImage): image
+        """
+        i = self.ids.pop(id(img), None)
+        if i is None:
+            return
+        self.images[i] = None
+        TagIndex.clearBit(self.live, i)
+        for bitmap in self.postings.values():
+            TagIndex.clearBit(bitmap, i)
+        self.ints = {}
+
+    def addTag(self, img, tag):
+        """
+        addTag : records that an image has a tag (called by CPImage.addTag)
+
+        Args:
+            img (CPImage): image
+            tag (String): name of the tag
+        """
+        i = self.ids.get(id(img))
+        if i is not None:
+            TagIndex.setBit(self.postings.setdefault(tag, bytearray()), i)
+            self.ints.pop(tag, None)
+
+    def removeTag(self, img, tag):
+        """
+        removeTag : records that an image no longer has a tag (called by CPImage.removeTag)
+
+        Args:
+            img (CPImage): image
+            tag (String): name of the tag
+        """
+        i = self.ids.get(id(img))
+        if i is not None and tag in self.postings:
+            TagIndex.clearBit(self.postings[tag], i)
+            self.ints.pop(tag, None)
+
+    def bitmap(self, tag):
+        """
+        bitmap : bitmap of the images with a tag, converted to an int only once after each change
+
+        Args:
+            tag (String): name of the tag, None for the bitmap of all the images
+
+        Returns:
+            int: bit i is set if image i has the tag
+        """
+        value = self.ints.get(tag)
+        if value is None:
+            value = self.ints[tag] = int.from_bytes(self.live if tag is None else self.postings.get(tag, b''), 'little')
+        return value
+
+    def query(self, anyTags = (), allTags = (), noTags = ()):
+        """
+        query : finds the images with at least one of anyTags, all of allTags and none of noTags
+
+        Args:
+            anyTags (iterable, optional): tags combined with OR, ignored if empty. Defaults to ().
+            allTags (iterable, optional): tags combined with AND. Defaults to ().
+            noTags (iterable, optional): tags combined with NOT. Defaults to ().
+
+        Returns:
+            TagQueryView: the images found
+        """
+        result = self.bitmap(None)
+        if len(anyTags) > 0:
+            found = 0
+            for tag in anyTags:
+                found |= self.bitmap(tag)
+            result &= found
+        for tag in allTags:
+            result &= self.bitmap(tag)
+        for tag in noTags:
+            # Same as result & ~bitmap, without making a negative int (much slower to combine)
+            result ^= result & self.bitmap(tag)
+        return TagQueryView(self, result)
+
+    def getImage(self, i):
+        """
+        getImage : image with the given id
+
+        Args:
+            i (int): id of the image
+
+        Returns:
+            CPImage: the image, None if it was removed
+        """
+        return self.images[i]
+
+class TagQueryView:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    TagQueryView : result of a TagIndex query. It only keeps the bitmap of the ids of the images found,
+    the images are looked up when they are asked for. It can be displayed by the PictureGrid like an ImageCollection
+    (size, getItems and getVersion).
+    """
+    def __init__(self, index, bitmap):
+        """
+        __init__ : TagQueryView class constructor
+
+        Args:
+            index (TagIndex): index that was queried
+            bitmap (int): bit i is set if image i was found
+        """
+        self.index = index
+        self.bitmap = bitmap
+
+    def size(self):
+        """
+        size : number of images found
+
+        Returns:
+            int: number of images
+        """
+        return self.bitmap.bit_count()
+
+    def getIds(self):
+        """
+        getIds : ids of the images found, in increasing order
+
+        Returns:
+            generator: ids of the images
+        """
+        data = self.bitmap.to_bytes((self.bitmap.bit_length() + 7) >> 3, 'little')
+        for byteIndex, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                yield (byteIndex << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def getItems(self):
+        """
+        getItems : images found
+
+        Returns:
+            list: CPImage instances (images removed from the collection since the query are left out)
+        """
+        return [img for img in map(self.index.getImage, self.getIds()) if img is not None]
+
+    def getVersion(self):
+        """
+        getVersion : the result of a query doesn't change
+
+        Returns:
+            int: 0
+        """
+        return 0
@@ -1,9 +1,7 @@
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.stacklayout import StackLayout
 from tagbutton import TagButton
-from kivy.uix.popup import Popup
-from kivy.uix.textinput import TextInput
-from kivy.uix.button import Button
+from lazypopup import LazyPopup
 
 class TagsPanel(StackLayout):
     """
@@ -33,7 +31,9 @@ class TagsPanel(StackLayout):
 
         [self.add_widget(TagButton(centralPanel, text = tag.getname(), background_color=(0.25,0.25,0.25,1), font_size = 35)) for tag in self.tagCollection.getItems()]
 
-        self.createNewTagPopup()
+        # The NewTag popup is created the first time it is opened
+        self.popup = None
+        self.buttonsBar.buttonNewTag.bind(on_press = LazyPopup.opener(self, "popup", self.createNewTagPopup))
     
     def defaultTags(self):
         """
@@ -72,6 +72,9 @@ class TagsPanel(StackLayout):
         """
         createNewTagPopup : creates a popup that allows the user to input the name of a new tag
         """
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
+        from kivy.uix.button import Button
         box = BoxLayout(orientation='vertical')
         self.newtag = TextInput(multiline=False)
         box.add_widget(self.newtag)
@@ -87,8 +90,6 @@ class TagsPanel(StackLayout):
         
         btnTagEnter.bind(on_press = self.createNewTag)
         btnTagCancel.bind(on_press = self.cancelNewTag)
-        
-        self.buttonsBar.buttonNewTag.bind(on_press = self.popup.open)
     
     def createNewTag(self, button):
         """
@@ -0,0 +1,135 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_cpcollection : changes of a collection appended to its operation log, replayed when it is loaded
+and compacted into its file, also after a compaction that didn't end
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpcollection import CPCollection
+from tag import Tag
+from tagcollection import TagCollection
+
+class Module:
+    """
+    Module : stands for the AppModule, only gives the folder of the collections
+    """
+    def __init__(self, folder):
+        self.folder = folder
+
+    def getCollectionsRootFolder(self):
+        return self.folder
+
+class CPCollectionTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : a temporary folder for the collection's file and its log
+        """
+        self.folder = tempfile.TemporaryDirectory()
+        self.module = Module(self.folder.name + "/")
+
+    def tearDown(self):
+        """
+        tearDown : closes the log of the collections and removes the temporary folder
+        """
+        for collection in getattr(self, "collections", []):
+            if collection.log is not None:
+                collection.log.close()
+        self.folder.cleanup()
+
+    def makeCollection(self):
+        """
+        makeCollection : tag collection of the temporary folder, its file is not read
+
+        Returns:
+            TagCollection: the collection
+        """
+        collection = TagCollection("tags", self.module)
+        self.collections = getattr(self, "collections", []) + [collection]
+        return collection
+
+    def loaded(self):
+        """
+        loaded : names of the tags of the collection, as they are loaded from its file and log
+        (without starting a compaction, see CPCollection.loadCollection)
+
+        Returns:
+            list: names of the tags, sorted
+        """
+        collection = self.makeCollection()
+        return sorted(tag.getname() for tag in collection.loadItems())
+
+    def testReplay(self):
+        """
+        testReplay : the collection is loaded from its log only, adds, removes and updates are replayed
+        and a line cut by a crash is ignored
+        """
+        collection = self.makeCollection()
+        for name in ("a", "b", "c"):
+            collection.addTag(name)
+        collection.removeTag("b")
+        collection.updateItem(Tag("d"), Tag("c").toJson())
+        self.assertFalse(os.path.exists(collection.path))
+        self.assertEqual(collection.loggedOperations, 5)
+        with open(collection.logPath, 'a') as log:
+            log.write('{"op": "add", "item": {"tagna')
+        self.assertEqual(self.loaded(), ["a", "d"])
+        self.assertEqual(CPCollection.readJson(collection.path)[2], 5)
+
+    def testCompaction(self):
+        """
+        testCompaction : the compaction writes the collection's file and empties the log,
+        the operations logged after it are replayed on top of the file
+        """
+        collection = self.makeCollection()
+        for name in ("a", "b"):
+            collection.addTag(name)
+        collection.saveCollection()
+        self.assertFalse(os.path.exists(collection.logPath))
+        self.assertEqual(collection.loggedOperations, 0)
+        with open(collection.path, 'r') as readfile:
+            self.assertEqual(sorted(item["tagname"] for item in json.load(readfile)["items"]), ["a", "b"])
+        collection.addTag("c")
+        collection.removeTag("a")
+        self.assertEqual(self.loaded(), ["b", "c"])
+        self.assertEqual(CPCollection.readJson(collection.path)[2], 2)
+
+    def testUnfinishedCompaction(self):
+        """
+        testUnfinishedCompaction : after a crash during a compaction (its log renamed to .old, the file not written),
+        the operations of the .old log and of the new log are both replayed, and the next compaction keeps them
+        """
+        collection = self.makeCollection()
+        collection.addTag("a")
+        collection.saveCollection()
+        collection.addTag("b")
+        collection.removeTag("a")
+        collection.log.close()
+        collection.log = None
+        # The compaction renamed the log, then the application crashed
+        os.replace(collection.logPath, collection.logPath + ".old")
+        # While the .old log exists, each operation would start a compaction in the background, they are run by the test
+        with collection.compactLock:
+            collection.addTag("c")
+        self.assertEqual(self.loaded(), ["b", "c"])
+
+        collection = self.makeCollection()
+        collection.items = set(collection.loadItems())
+        with collection.compactLock:
+            collection.addTag("d")
+        collection.saveCollection()
+        self.assertFalse(os.path.exists(collection.logPath + ".old"))
+        self.assertFalse(os.path.exists(collection.logPath))
+        self.assertEqual(self.loaded(), ["b", "c", "d"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_dateindex : images kept in date order by the DateIndex, when they are added, moved and removed
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateindex import DateIndex
+
+class Image:
+    """
+    Image : stands for a CPImage, equal to the images with the same content (as CPImage.__eq__)
+    """
+    def __init__(self, date, imageFile, content = None):
+        self.date = date
+        self.imageFile = imageFile
+        self.content = content if content is not None else imageFile
+
+    def getDate(self):
+        return self.date
+
+    def getImageFile(self):
+        return self.imageFile
+
+    def __eq__(self, other):
+        return isinstance(other, Image) and self.content == other.content
+
+    def __hash__(self):
+        return hash(self.content)
+
+def image(day, name, content = None):
+    """
+    image : image of a day of January 2020, in the folder of its date
+
+    Returns:
+        Image: the image
+    """
+    date = "2020/01/%02d" % day
+    return Image(date, "./PicLib/" + date + "/" + name, content)
+
+class DateIndexTest(unittest.TestCase):
+
+    def assertSorted(self, index, expected):
+        """
+        assertSorted : the index has the expected images, sorted by date and path, and its ordinals match them
+        """
+        self.assertEqual([id(img) for img in index.getImages()],
+                         [id(img) for img in sorted(expected, key = DateIndex.key)])
+        self.assertEqual(list(index.ordinals), [DateIndex.ordinal(img.getDate()) for img in index.getImages()])
+
+    def testAddAndRemove(self):
+        """
+        testAddAndRemove : images added one at a time or all at once are kept in order, and removed from it
+        """
+        imgs = [image(random.randint(1, 28), "%04d.jpg" % i) for i in range(300)]
+        index = DateIndex()
+        index.build(imgs[:100])
+        for img in imgs[100:200]:
+            index.add(img)
+        index.addAll(imgs[200:] + imgs[:10])
+        self.assertSorted(index, imgs)
+        for img in imgs[::3]:
+            index.remove(img)
+        index.remove(imgs[0])
+        self.assertSorted(index, [img for i, img in enumerate(imgs) if i % 3 != 0])
+
+    def testSameContentImagesAreDistinct(self):
+        """
+        testSameContentImagesAreDistinct : two images with the same content are both kept, and removed separately
+        """
+        a = image(2, "a.jpg", "same")
+        b = image(1, "b.jpg", "same")
+        index = DateIndex()
+        index.add(a)
+        index.addAll([b])
+        self.assertSorted(index, [a, b])
+        index.remove(a)
+        self.assertSorted(index, [b])
+
+    def testMovedImage(self):
+        """
+        testMovedImage : an image whose path and date changed is found where it was added, and moved to its new date
+        """
+        imgs = [image(5, "%02d.jpg" % i) for i in range(20)]
+        index = DateIndex()
+        index.build(imgs)
+        moved = imgs[7]
+        moved.date, moved.imageFile = "2020/01/01", "./PicLib/2020/01/01/07.jpg"
+        index.update(moved)
+        self.assertSorted(index, imgs)
+        self.assertIs(index.getImages()[0], moved)
+        moved.date, moved.imageFile = "2020/01/09", "./PicLib/2020/01/09/07.jpg"
+        index.remove(moved)
+        self.assertSorted(index, imgs[:7] + imgs[8:])
+
+    def testSamePath(self):
+        """
+        testSamePath : an image is removed, not another one with the same path (an image being moved to its place)
+        """
+        a = image(3, "a.jpg", "a")
+        b = image(3, "a.jpg", "b")
+        index = DateIndex()
+        index.addAll([a, b])
+        index.remove(b)
+        self.assertEqual([id(img) for img in index.getImages()], [id(a)])
+
+    def testFindRange(self):
+        """
+        testFindRange : the images of a range of dates, with the dates that can't be read after all the others
+        """
+        imgs = [image(day, "x.jpg") for day in (1, 10, 15, 31)] + [Image("unknown", "y.jpg")]
+        index = DateIndex()
+        index.addAll(imgs)
+        self.assertEqual([img.getDate() for img in index.findRange("2020/01/10..2020/01/15").getItems()],
+                         ["2020/01/10", "2020/01/15"])
+        self.assertEqual(index.findRange("2020/01").size(), 4)
+        self.assertIs(index.getImages()[-1], imgs[-1])
+        self.assertEqual(index.pageOfDate("2020/01/11", 2), 1)
+
+if __name__ == '__main__':
+    unittest.main()
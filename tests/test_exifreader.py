@@ -0,0 +1,121 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_exifreader : exif orientation changed in place, or added to files that have none, without re-encoding the image
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from exifreader import ExifReader
+
+class ExifReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : runs each test in its own temporary folder
+        """
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "img.jpg")
+
+    def tearDown(self):
+        """
+        tearDown : removes the temporary folder
+        """
+        self.folder.cleanup()
+
+    def makeImage(self, tags):
+        """
+        makeImage : writes a JPEG image with the given exif tags (no exif if empty)
+
+        Args:
+            tags (Dict): exif tag -> value
+
+        Returns:
+            bytes: the image data, decoded
+        """
+        im = Image.new('RGB', (40, 30), (200, 30, 30))
+        im.paste((10, 10, 220), (0, 0, 20, 30))
+        if len(tags) > 0:
+            exif = Image.Exif()
+            for tag, value in tags.items():
+                exif[tag] = value
+            im.save(self.path, exif = exif)
+        else:
+            im.save(self.path)
+        with Image.open(self.path) as saved:
+            return saved.tobytes()
+
+    def readBack(self):
+        """
+        readBack : orientation and date read by PIL, and the decoded image
+
+        Returns:
+            tuple: orientation (None if there is none), date (None if there is none), decoded image data
+        """
+        with Image.open(self.path) as im:
+            exif = im.getexif()
+            return (exif.get(ExifReader.ORIENTATION), exif.get(306), im.tobytes())
+
+    def testWriteOrientationInPlace(self):
+        """
+        testWriteOrientationInPlace : only the bytes of the orientation value change
+        """
+        self.makeImage({ExifReader.ORIENTATION: 1, 306: "2020:01:02 10:00:00"})
+        with open(self.path, 'rb') as readfile:
+            before = readfile.read()
+        self.assertEqual(ExifReader.orientation(self.path), 1)
+        self.assertTrue(ExifReader.writeOrientation(self.path, 6))
+        with open(self.path, 'rb') as readfile:
+            after = readfile.read()
+        self.assertEqual(len(after), len(before))
+        self.assertLessEqual(sum(a != b for a, b in zip(before, after)), 4)
+        self.assertEqual(ExifReader.orientation(self.path), 6)
+        self.assertEqual(self.readBack()[0], 6)
+
+    def testAddOrientationToExif(self):
+        """
+        testAddOrientationToExif : a file with exif but no orientation gets one, and keeps its other tags and its image data
+        """
+        pixels = self.makeImage({306: "2020:01:02 10:00:00"})
+        self.assertFalse(ExifReader.writeOrientation(self.path, 6))
+        self.assertTrue(ExifReader.addOrientation(self.path, 6))
+        self.assertEqual(self.readBack(), (6, "2020:01:02 10:00:00", pixels))
+        self.assertEqual(ExifReader.orientation(self.path), 6)
+        # The tag is there now, it is changed in place
+        self.assertFalse(ExifReader.addOrientation(self.path, 3))
+        self.assertTrue(ExifReader.writeOrientation(self.path, 3))
+        self.assertEqual(ExifReader.orientation(self.path), 3)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def testAddOrientationWithoutExif(self):
+        """
+        testAddOrientationWithoutExif : a file without exif gets an exif segment after its JFIF segment
+        """
+        pixels = self.makeImage({})
+        self.assertIsNone(ExifReader.parse(self.path))
+        self.assertTrue(ExifReader.addOrientation(self.path, 8))
+        with open(self.path, 'rb') as readfile:
+            self.assertEqual(readfile.read(4), b'\xff\xd8\xff\xe0')
+        self.assertEqual(self.readBack(), (8, None, pixels))
+
+    def testNotJpeg(self):
+        """
+        testNotJpeg : files that are not JPEG images are left as they are
+        """
+        with open(self.path, 'wb') as writefile:
+            writefile.write(b'not an image')
+        self.assertEqual(ExifReader.orientation(self.path), 1)
+        self.assertFalse(ExifReader.writeOrientation(self.path, 6))
+        self.assertFalse(ExifReader.addOrientation(self.path, 6))
+        with open(self.path, 'rb') as readfile:
+            self.assertEqual(readfile.read(), b'not an image')
+
+if __name__ == '__main__':
+    unittest.main()
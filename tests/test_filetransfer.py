@@ -0,0 +1,124 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_filetransfer : an imported file never replaces a file of the collection's folder
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from appmodule import AppModule
+from filetransfer import FileTransfer
+
+class FileTransferTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : runs each test in its own temporary folder (PicLib keeps its collection in ./PicLib/)
+        """
+        self.cwd = os.getcwd()
+        self.folder = tempfile.TemporaryDirectory()
+        os.chdir(self.folder.name)
+
+    def tearDown(self):
+        """
+        tearDown : goes back to the previous folder and removes the temporary one
+        """
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    @staticmethod
+    def makeImage(path, color):
+        """
+        makeImage : writes a small JPEG image with an exif date
+
+        Args:
+            path (String): path to the image
+            color (tuple): color of the image, so each image has its own content
+        """
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        exif = Image.Exif()
+        exif[306] = "2020:01:02 10:00:00"
+        Image.new('RGB', (32, 24), color).save(path, exif = exif)
+
+    def testSameNameIsNotReplaced(self):
+        """
+        testSameNameIsNotReplaced : in every import mode, a file with the name of a file of the folder gets another name
+        """
+        for mode in FileTransfer.MODES:
+            os.makedirs(mode)
+            with open(os.path.join(mode, "a.jpg"), 'w') as writefile:
+                writefile.write("collection")
+            with open("a.jpg", 'w') as writefile:
+                writefile.write(mode)
+            path, used = FileTransfer.transfer("a.jpg", mode, mode, (".json",))
+            self.assertEqual(os.path.basename(path), "a (2).jpg")
+            with open(os.path.join(mode, "a.jpg")) as readfile:
+                self.assertEqual(readfile.read(), "collection")
+            with open(path) as readfile:
+                self.assertEqual(readfile.read(), mode)
+
+    def testSameContentIsNotCopied(self):
+        """
+        testSameContentIsNotCopied : a file already in the folder (under its name or "name (2).ext") is not copied again,
+        and the source is left where it is, even in the "move" mode
+        """
+        os.makedirs("folder")
+        for name, content in (("a.jpg", "other"), ("a (2).jpg", "same")):
+            with open(os.path.join("folder", name), 'w') as writefile:
+                writefile.write(content)
+        with open("a.jpg", 'w') as writefile:
+            writefile.write("same")
+        for mode in FileTransfer.MODES:
+            path, used = FileTransfer.transfer("a.jpg", "folder", mode, (".json",))
+            self.assertEqual((os.path.basename(path), used), ("a (2).jpg", FileTransfer.EXISTING))
+            self.assertTrue(os.path.exists("a.jpg"))
+        self.assertEqual(sorted(os.listdir("folder")), ["a (2).jpg", "a.jpg"])
+
+    def testImportFilesAlreadyInFolder(self):
+        """
+        testImportFilesAlreadyInFolder : images in the date folders but unknown to the collection and the ledger
+        are skipped instead of being copied again as "name (2).ext"
+        """
+        self.makeImage("src/IMG_0001.JPG", (255, 0, 0))
+        AppModule().getImgCollection().scanFolder("src")
+        for name in os.listdir("PicLib"):
+            if name.startswith("mainImgCollection") or name == "importLedger.json":
+                os.remove(os.path.join("PicLib", name))
+        summary = AppModule().getImgCollection().scanFolder("src", importMode = "move")
+        self.assertEqual((len(summary.added), len(summary.skipped)), (0, 1))
+        self.assertEqual(sorted(os.listdir("PicLib/2020/01/02")), ["IMG_0001.JPG", "IMG_0001.json"])
+        self.assertTrue(os.path.exists("src/IMG_0001.JPG"))
+
+    def testMoveSameNamedSources(self):
+        """
+        testMoveSameNamedSources : two different photos with the same name and date, moved into the collection,
+        are both kept (they used to be moved to the same path, losing one of them)
+        """
+        self.makeImage("src/a/IMG_0001.JPG", (255, 0, 0))
+        self.makeImage("src/b/IMG_0001.JPG", (0, 0, 255))
+        module = AppModule()
+        summary = module.getImgCollection().scanFolder("src", importMode = "move")
+
+        self.assertEqual(len(summary.added), 2)
+        self.assertEqual(summary.errors, [])
+        imageFiles = sorted(img.getImageFile() for img in module.getImgCollection().getItems())
+        self.assertEqual(module.getImgCollection().size(), 2)
+        self.assertEqual(len(set(imageFiles)), 2)
+        # Both photos are in the collection, with their own content and Json file
+        colors = set()
+        for imageFile in imageFiles:
+            self.assertTrue(os.path.exists(os.path.splitext(imageFile)[0] + ".json"))
+            with Image.open(imageFile) as im:
+                colors.add(im.convert('RGB').getpixel((0, 0)))
+        self.assertEqual(len(colors), 2)
+        self.assertEqual(sorted(os.listdir("src/a") + os.listdir("src/b")), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_imagecollection : images saved without a content hash are loaded right away and hashed in the background
+    python -m pytest tests
+"""
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from appmodule import AppModule
+
+class ImageCollectionTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : runs each test in its own temporary folder (PicLib keeps its collection in ./PicLib/)
+        """
+        self.cwd = os.getcwd()
+        self.folder = tempfile.TemporaryDirectory()
+        os.chdir(self.folder.name)
+
+    def tearDown(self):
+        """
+        tearDown : goes back to the previous folder and removes the temporary one
+        """
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    @staticmethod
+    def makeImages(n):
+        """
+        makeImages : writes n different JPEG images with an exif date in ./src/
+        """
+        os.makedirs("src", exist_ok = True)
+        exif = Image.Exif()
+        exif[306] = "2020:01:02 10:00:00"
+        for i in range(n):
+            Image.new('RGB', (32, 24), (i * 20, 0, 0)).save("src/IMG_{:04d}.JPG".format(i), exif = exif)
+
+    @staticmethod
+    def jsonFiles():
+        """
+        jsonFiles : Json files of the images of the collection
+
+        Returns:
+            list: paths to the Json files
+        """
+        return sorted(glob.glob("PicLib/2020/01/02/*.json"))
+
+    def testHashBackfill(self):
+        """
+        testHashBackfill : images without a hash (and a copy of one of them) are all shown when the collection
+        is loaded, then they are hashed, their hash is saved and the copy is left out
+        """
+        self.makeImages(3)
+        module = AppModule()
+        module.getImgCollection().scanFolder("src")
+        module.getImgCollection().saveCollection()
+        module.getMetadataStore().flush()
+        for path in self.jsonFiles():
+            with open(path, 'r') as readfile:
+                metadata = json.load(readfile)
+            del metadata["hash"], metadata["hashMode"]
+            with open(path, 'w') as writefile:
+                json.dump(metadata, writefile)
+        # A copy of an image, added to the collection by an older version
+        source = self.jsonFiles()[0]
+        shutil.copy(glob.glob(source[:-len(".json")] + ".*[gG]")[0], "PicLib/2020/01/02/copy.jpg")
+        shutil.copy(source, "PicLib/2020/01/02/copy.json")
+        with open("PicLib/mainImgCollection.log", 'a') as log:
+            log.write(json.dumps({"op": "add", "item": {"imageFile": "./PicLib/2020/01/02/copy.jpg"}}) + "\n")
+
+        module = AppModule(loadImages = False)
+        collection = module.getImgCollection()
+        # The background thread can't hash the images until the collection is checked
+        with collection.backfillLock:
+            module.loadImgCollection()
+            self.assertEqual(collection.size(), 4)
+            self.assertTrue(all(not img.hasHash() for img in collection.getItems()))
+        collection.backfillHashes()
+        self.assertEqual(collection.size(), 3)
+        self.assertEqual(len(collection.getItems()), 3)
+        self.assertEqual(len(collection.items), 3)
+        self.assertEqual(len(collection.unhashed), 0)
+        module.getMetadataStore().flush()
+        for path in self.jsonFiles():
+            with open(path, 'r') as readfile:
+                self.assertIn("hash", json.load(readfile))
+
+if __name__ == '__main__':
+    unittest.main()
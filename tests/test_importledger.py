@@ -0,0 +1,152 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_importledger : scanning a folder again only imports the files that are new or changed
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from appmodule import AppModule
+from importledger import ImportLedger
+
+class ImportLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : runs each test in its own temporary folder (PicLib keeps its collection in ./PicLib/)
+        """
+        self.cwd = os.getcwd()
+        self.folder = tempfile.TemporaryDirectory()
+        os.chdir(self.folder.name)
+
+    def tearDown(self):
+        """
+        tearDown : goes back to the previous folder and removes the temporary one
+        """
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    @staticmethod
+    def makeImage(path, color):
+        """
+        makeImage : writes a small JPEG image with an exif date
+
+        Args:
+            path (String): path to the image
+            color (tuple): color of the image, so each image has its own content
+        """
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        exif = Image.Exif()
+        exif[306] = "2020:01:02 10:00:00"
+        Image.new('RGB', (32, 24), color).save(path, exif = exif)
+
+    def makeImages(self, n):
+        """
+        makeImages : writes n different images in ./src/ and its sub-folders
+        """
+        for i in range(n):
+            self.makeImage("src/{}/IMG_{:04d}.JPG".format(i % 2, i), (i * 20, 0, 0))
+
+    @staticmethod
+    def libraryFiles():
+        """
+        libraryFiles : names of the images in the date folders of the collection
+
+        Returns:
+            list: names of the images
+        """
+        return sorted(name for root, folders, names in os.walk("PicLib") if ".thumbs" not in root
+                      for name in names if name.lower().endswith(".jpg"))
+
+    def testRecordAndStatus(self):
+        """
+        testRecordAndStatus : a recorded file is unchanged until its size or modification time changes,
+        and it is found by its hash after the ledger is saved and loaded again
+        """
+        ledger = ImportLedger("ledger.json")
+        self.assertEqual(ledger.status("a.jpg", 10, 1), ImportLedger.NEW)
+        ledger.record("a.jpg", 10, 1, "ab", "PicLib/a.jpg")
+        ledger.save()
+        ledger = ImportLedger("ledger.json")
+        self.assertEqual(ledger.status("a.jpg", 10, 1), ImportLedger.UNCHANGED)
+        self.assertEqual(ledger.status("a.jpg", 10, 2), ImportLedger.CHANGED)
+        self.assertEqual(ledger.getImageFile("a.jpg"), "PicLib/a.jpg")
+        self.assertEqual(ledger.findHash("ab")["imageFile"], "PicLib/a.jpg")
+        self.assertIsNone(ledger.findHash("cd"))
+
+    def testRescan(self):
+        """
+        testRescan : a second scan of the same folder skips every file
+        """
+        self.makeImages(6)
+        summary = AppModule().getImgCollection().scanFolder("src")
+        self.assertEqual(len(summary.added), 6)
+        module = AppModule()
+        summary = module.getImgCollection().scanFolder("src")
+        self.assertEqual((len(summary.added), len(summary.skipped)), (0, 6))
+        self.assertEqual(module.getImgCollection().size(), 6)
+        self.assertEqual(len(self.libraryFiles()), 6)
+
+    def testRescanWithoutLedger(self):
+        """
+        testRescanWithoutLedger : a scan of a library imported before there was a ledger skips the images
+        already in the collection (they used to be copied again as "name (2).ext") and records them in the ledger
+        """
+        self.makeImages(6)
+        AppModule().getImgCollection().scanFolder("src")
+        os.remove("PicLib/importLedger.json")
+        module = AppModule()
+        summary = module.getImgCollection().scanFolder("src")
+        self.assertEqual((len(summary.added), len(summary.skipped)), (0, 6))
+        self.assertEqual(module.getImgCollection().size(), 6)
+        self.assertEqual(len(self.libraryFiles()), 6)
+        self.assertEqual(len(ImportLedger("PicLib/importLedger.json").entries), 6)
+
+    def testDuplicatesInOneScan(self):
+        """
+        testDuplicatesInOneScan : the same photo in two sub-folders is imported once, the other copy is skipped
+        """
+        self.makeImage("src/a/IMG_0001.JPG", (255, 0, 0))
+        self.makeImage("src/b/copy.JPG", (255, 0, 0))
+        with open("src/a/IMG_0001.JPG", 'rb') as readfile, open("src/b/copy.JPG", 'wb') as writefile:
+            writefile.write(readfile.read())
+        module = AppModule()
+        summary = module.getImgCollection().scanFolder("src")
+        self.assertEqual((len(summary.added), len(summary.skipped)), (1, 1))
+        self.assertEqual(module.getImgCollection().size(), 1)
+        summary = AppModule().getImgCollection().scanFolder("src")
+        self.assertEqual((len(summary.added), len(summary.skipped)), (0, 2))
+
+    def testChangedFile(self):
+        """
+        testChangedFile : a file changed since it was imported replaces its previous copy, which keeps its tags
+        """
+        self.makeImage("src/IMG_0001.JPG", (255, 0, 0))
+        module = AppModule()
+        module.getImgCollection().scanFolder("src")
+        module.getTagCollection().addTag("red")
+        module.getImgCollection().getItems()[0].addTag("red")
+        module.getMetadataStore().flush()
+        self.makeImage("src/IMG_0001.JPG", (0, 255, 0))
+        # The modification time must change even on filesystems with a coarse resolution
+        os.utime("src/IMG_0001.JPG", ns = (time.time_ns() + 10**9, time.time_ns() + 10**9))
+        module = AppModule()
+        summary = module.getImgCollection().scanFolder("src")
+        self.assertEqual(len(summary.changed), 1)
+        imgs = module.getImgCollection().getItems()
+        self.assertEqual(len(imgs), 1)
+        self.assertEqual(imgs[0].getTags(), ["red"])
+        self.assertEqual(len(self.libraryFiles()), 1)
+        # The tags given to the new copy are written before the temporary folder is removed
+        module.getMetadataStore().flush()
+
+if __name__ == '__main__':
+    unittest.main()
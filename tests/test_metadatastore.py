@@ -0,0 +1,161 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_metadatastore : changes of metadata written later by the MetadataStore, and replayed from its journal after a crash
+    python -m pytest tests
+"""
+import atexit
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadatastore import MetadataStore
+
+class Module:
+    """
+    Module : stands for the AppModule, without the catalog
+    """
+    def getCatalog(self):
+        return None
+
+class Image:
+    """
+    Image : stands for a CPImage, with the attributes the MetadataStore reads
+    """
+    def __init__(self, folder, name):
+        self.imageFile = os.path.join(folder, name + ".jpg")
+        self.jsonfile = os.path.join(folder, name + ".json")
+        self.metadata = {"tags": []}
+        self.exif = {}
+        open(self.imageFile, 'w').close()
+
+    def getImageFile(self):
+        return self.imageFile
+
+class MetadataStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : a temporary folder with two images
+        """
+        self.folder = tempfile.TemporaryDirectory()
+        self.journalPath = os.path.join(self.folder.name, "journal.jsonl")
+        self.imgs = [Image(self.folder.name, name) for name in ("a", "b")]
+        self.stores = []
+
+    def tearDown(self):
+        """
+        tearDown : the stores are not flushed when the tests exit, their folder is removed
+        """
+        for store in self.stores:
+            atexit.unregister(store.close)
+        self.folder.cleanup()
+
+    def makeStore(self, delay):
+        """
+        makeStore : store writing the metadata after the given delay
+
+        Returns:
+            MetadataStore: the store
+        """
+        store = MetadataStore(self.journalPath, Module(), delay)
+        self.stores.append(store)
+        return store
+
+    @staticmethod
+    def tags(img):
+        """
+        tags : tags written to the Json file of an image
+
+        Returns:
+            list: tags, None if the file was not written
+        """
+        if not os.path.exists(img.jsonfile):
+            return None
+        with open(img.jsonfile, 'r') as readfile:
+            return json.load(readfile)["tags"]
+
+    def testReplay(self):
+        """
+        testReplay : changes in the journal that were not written (the application crashed) are written by replay,
+        the last change of each image wins, and a line cut by the crash is ignored
+        """
+        store = self.makeStore(60)
+        a, b = self.imgs
+        a.metadata["tags"] = ["x"]
+        store.markDirty(a)
+        a.metadata["tags"] = ["x", "y"]
+        store.markDirty(a)
+        b.metadata["tags"] = ["z"]
+        store.markDirty(b)
+        self.assertEqual(store.pending(), 2)
+        self.assertIsNone(self.tags(a))
+        with open(self.journalPath, 'a') as journal:
+            journal.write('{"imageFile": "cut')
+        self.makeStore(60).replay()
+        self.assertEqual(self.tags(a), ["x", "y"])
+        self.assertEqual(self.tags(b), ["z"])
+        self.assertFalse(os.path.exists(self.journalPath))
+
+    def testReplayIgnoresRemovedImages(self):
+        """
+        testReplayIgnoresRemovedImages : records of images removed since are not written
+        """
+        store = self.makeStore(60)
+        a, b = self.imgs
+        store.markDirty(a)
+        store.markDirty(b)
+        os.remove(b.imageFile)
+        self.makeStore(60).replay()
+        self.assertEqual(self.tags(a), [])
+        self.assertIsNone(self.tags(b))
+
+    def testDebounce(self):
+        """
+        testDebounce : many changes are written once, after the delay, by a single flusher thread,
+        and the journal is removed once they are written
+        """
+        store = self.makeStore(0.2)
+        a = self.imgs[0]
+        for i in range(50):
+            a.metadata["tags"] = [str(i)]
+            store.markDirty(a)
+        flusher = store.flusher
+        self.assertIsNone(self.tags(a))
+        deadline = time.time() + 5
+        while store.pending() > 0 and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.tags(a), ["49"])
+        self.assertFalse(os.path.exists(self.journalPath))
+        a.metadata["tags"] = ["again"]
+        store.markDirty(a)
+        store.flush()
+        self.assertEqual(self.tags(a), ["again"])
+        self.assertIs(store.flusher, flusher)
+
+    def testBatch(self):
+        """
+        testBatch : changes made during a batch are written to the journal when the batch ends
+        """
+        store = self.makeStore(60)
+        # The flusher, which starts writing when the batch ends, waits until the journal is read
+        with store.flushLock:
+            with store.batch():
+                with store.batch():
+                    for img in self.imgs:
+                        store.markDirty(img)
+                self.assertFalse(os.path.exists(self.journalPath))
+            with open(self.journalPath, 'r') as readfile:
+                self.assertEqual(len(readfile.readlines()), 2)
+        store.flush()
+        self.assertEqual([self.tags(img) for img in self.imgs], [[], []])
+
+if __name__ == '__main__':
+    unittest.main()
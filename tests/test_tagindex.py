@@ -0,0 +1,116 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_tagindex : searches by tags answered from the bitmaps of the TagIndex
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tagindex import TagIndex
+
+class Image:
+    """
+    Image : stands for a CPImage, equal to the images with the same content (as CPImage.__eq__)
+    """
+    def __init__(self, content, tags = ()):
+        self.content = content
+        self.tags = list(tags)
+
+    def getTags(self):
+        return list(self.tags)
+
+    def __eq__(self, other):
+        return isinstance(other, Image) and self.content == other.content
+
+    def __hash__(self):
+        return hash(self.content)
+
+class TagIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : an index of four images, a and b with the same content
+        """
+        self.a = Image("same", ["sea", "sun"])
+        self.b = Image("same", ["sea"])
+        self.c = Image("c", ["sun"])
+        self.d = Image("d")
+        self.index = TagIndex()
+        self.index.build([self.a, self.b, self.c, self.d])
+
+    def found(self, *args):
+        """
+        found : ids (as python id) of the images found by a query
+
+        Returns:
+            set: id of each image found
+        """
+        return {id(img) for img in self.index.query(*args).getItems()}
+
+    def testQueries(self):
+        """
+        testQueries : any of the tags, all of the tags and none of the tags
+        """
+        self.assertEqual(self.found(["sea"]), {id(self.a), id(self.b)})
+        self.assertEqual(self.found(["sea", "sun"]), {id(self.a), id(self.b), id(self.c)})
+        self.assertEqual(self.found((), ["sea", "sun"]), {id(self.a)})
+        self.assertEqual(self.found((), (), ["sun"]), {id(self.b), id(self.d)})
+        self.assertEqual(self.found(["sun"], (), ["sea"]), {id(self.c)})
+        self.assertEqual(self.found(["unknown"]), set())
+        self.assertEqual(self.index.query().size(), 4)
+
+    def testSameContentImagesAreDistinct(self):
+        """
+        testSameContentImagesAreDistinct : tagging an image doesn't tag the image with the same content
+        (they used to share one bit, as the index was keyed by CPImage.__eq__)
+        """
+        self.b.tags.append("sun")
+        self.index.addTag(self.b, "sun")
+        self.index.removeTag(self.a, "sea")
+        self.assertEqual(self.found(["sea"]), {id(self.b)})
+        self.assertEqual(self.found((), ["sea", "sun"]), {id(self.b)})
+        self.index.remove(self.a)
+        self.assertEqual(self.found(["sun"]), {id(self.b), id(self.c)})
+
+    def testAddAndRemove(self):
+        """
+        testAddAndRemove : added images are found with their tags, removed images are no longer found
+        """
+        e = Image("e", ["sea"])
+        self.index.add(e)
+        self.index.add(e)
+        self.assertEqual(self.found(["sea"]), {id(self.a), id(self.b), id(e)})
+        self.index.remove(self.b)
+        self.index.remove(self.b)
+        self.assertEqual(self.found(["sea"]), {id(self.a), id(e)})
+        self.assertEqual(self.index.query().size(), 4)
+
+    def testResultIsKeptAfterChanges(self):
+        """
+        testResultIsKeptAfterChanges : a result is not changed by later tags, and leaves out the images removed since
+        """
+        view = self.index.query(["sea"])
+        self.index.addTag(self.c, "sea")
+        self.assertEqual(view.size(), 2)
+        self.index.remove(self.a)
+        self.assertEqual([id(img) for img in view.getItems()], [id(self.b)])
+
+    def testManyImages(self):
+        """
+        testManyImages : bitmaps that span many bytes give the same results as a scan of the images
+        """
+        imgs = [Image(i, ["even" if i % 2 == 0 else "odd"] + (["third"] if i % 3 == 0 else [])) for i in range(1000)]
+        index = TagIndex()
+        index.build(imgs[:500])
+        for img in imgs[500:]:
+            index.add(img)
+        found = {id(img) for img in index.query(["third"], ["even"]).getItems()}
+        self.assertEqual(found, {id(img) for i, img in enumerate(imgs) if i % 6 == 0})
+
+if __name__ == '__main__':
+    unittest.main()
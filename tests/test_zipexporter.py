@@ -0,0 +1,117 @@
+"""
+Author: 55881 Eduardo Carvalho
+Author: 55738 Joao Milagaia
+
+test_zipexporter : archives split in volumes, and files that can't be read skipped without stopping the export
+    python -m pytest tests
+"""
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from zipfile import ZipFile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zipexporter import ZipExporter
+
+class FailingFile(io.FileIO):
+    """
+    FailingFile : file whose reads fail after the first one (ex: a disk error in the middle of a file)
+    """
+    def read(self, size = -1):
+        if self.tell() > 0:
+            raise OSError("read error")
+        return super().read(size)
+
+class ZipExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        setUp : a temporary folder with five files of 10KB that can't be compressed
+        """
+        self.folder = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.folder.name, "sub{}".format(i % 2), "img.jpg")
+            path = path if i < 2 else os.path.join(self.folder.name, "img{}.jpg".format(i))
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            with open(path, 'wb') as writefile:
+                writefile.write(os.urandom(10000))
+            self.paths.append(path)
+        self.archive = os.path.join(self.folder.name, "export")
+
+    def tearDown(self):
+        """
+        tearDown : removes the temporary folder
+        """
+        self.folder.cleanup()
+
+    def namesIn(self, volumes):
+        """
+        namesIn : names of the files of the volumes, checking that each volume is a complete archive
+
+        Returns:
+            list: names of the files, sorted
+        """
+        names = []
+        for volume in volumes:
+            with ZipFile(volume) as archive:
+                self.assertIsNone(archive.testzip())
+                names += archive.namelist()
+        return sorted(names)
+
+    def testVolumes(self):
+        """
+        testVolumes : each volume is smaller than the maximum size, and the files have unique names
+        """
+        progress = ZipExporter(self.archive, maxVolumeBytes = 25000).export(self.paths)
+        self.assertTrue(progress.finished)
+        self.assertEqual(len(progress.volumes), 3)
+        self.assertEqual(progress.volumes[1], self.archive + ".002.zip")
+        for volume in progress.volumes:
+            self.assertLessEqual(os.path.getsize(volume), 25000)
+        self.assertEqual(self.namesIn(progress.volumes), ["img (2).jpg", "img.jpg", "img2.jpg", "img3.jpg", "img4.jpg"])
+        self.assertEqual((progress.files, progress.bytesDone), (5, 50000))
+
+    def testMissingFile(self):
+        """
+        testMissingFile : a file that can't be opened is skipped, the others are exported
+        """
+        os.remove(self.paths[3])
+        progress = ZipExporter(self.archive).export(self.paths)
+        self.assertEqual([path for path, e in progress.errors], [self.paths[3]])
+        self.assertEqual(len(self.namesIn(progress.volumes)), 4)
+        self.assertFalse(progress.cancelled)
+
+    def testReadErrorPartway(self):
+        """
+        testReadErrorPartway : a file that can't be read after its first chunk is skipped (it is not listed in the archive),
+        the export goes on and its progress reaches the total size
+        """
+        def openFile(path, mode = 'r'):
+            return FailingFile(path) if path == self.paths[2] else open(path, mode)
+
+        with mock.patch.object(ZipExporter, "CHUNK_SIZE", 4096), mock.patch("zipexporter.open", openFile, create = True):
+            progress = ZipExporter(self.archive).export(self.paths)
+        self.assertFalse(progress.cancelled)
+        self.assertEqual([path for path, e in progress.errors], [self.paths[2]])
+        self.assertEqual(self.namesIn(progress.volumes), ["img (2).jpg", "img.jpg", "img3.jpg", "img4.jpg"])
+        self.assertEqual((progress.files, progress.bytesDone, progress.totalBytes), (5, 50000, 50000))
+
+    def testCancel(self):
+        """
+        testCancel : a cancelled export removes its volumes
+        """
+        exporter = ZipExporter(self.archive, maxVolumeBytes = 25000)
+        exporter.onProgress = lambda progress: exporter.cancel()
+        exporter.progressInterval = 0
+        progress = exporter.export(self.paths)
+        self.assertTrue(progress.cancelled)
+        self.assertEqual(progress.volumes, [])
+        self.assertFalse(os.path.exists(self.archive + ".zip"))
+
+if __name__ == '__main__':
+    unittest.main()
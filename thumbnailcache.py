@@ -0,0 +1,383 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from exifreader import ExifReader
+from metrics import Metrics
+import threading
+import io
+import os
+
+class ThumbnailCache:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ThumbnailCache : disk cache of small versions of the images, so the UI never has to decode a full size image.
+    Thumbnails are named after the content hash of the image (see CPImage.getHash) and the size tier,
+    generated in background threads and evicted, least recently used first, when the cache is over its size limit.
+    The thumbnail embedded by cameras in the exif is also kept, as a preview shown while the thumbnails are generated.
+    Thumbnails and previews are turned according to the exif orientation of the image.
+    The thumbnails already on disk are only listed (in a background thread) when the first thumbnail is added,
+    so creating the cache costs nothing, whatever the size of the library.
+    """
+
+    # Heights, in pixels, of the thumbnails that can be generated
+    TIERS = (140, 280, 560)
+
+    # PIL transpose methods (Image.Transpose values) that undo each exif orientation
+    ORIENTATION_TRANSPOSE = {2: 0, 3: 3, 4: 1, 5: 5, 6: 4, 7: 6, 8: 2}
+
+    def __init__(self, folder, maxBytes = 512 * 2**20, workers = 2):
+        """
+        __init__ : ThumbnailCache class constructor, the thumbnails already in the cache folder are not read yet
+
+        Args:
+            folder (String): folder of the cache
+            maxBytes (int, optional): maximum size of the cache, in bytes. Defaults to 512MB.
+            workers (int, optional): number of threads generating thumbnails. Defaults to 2.
+        """
+        self.folder = folder
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(workers)
+        # self.pending (Dict): path of the thumbnails being generated -> functions to call when they are ready
+        self.pending = {}
+        # self.entries (OrderedDict): path of each thumbnail -> size in bytes, least recently used first,
+        # None until the thumbnails of the cache folder are listed (see _loadIndex)
+        self.entries = None
+        self.totalBytes = 0
+        # self.added (OrderedDict): path -> size in bytes of the thumbnails added while the cache folder is listed
+        self.added = OrderedDict()
+        self.indexing = False
+
+        os.makedirs(folder, exist_ok = True)
+
+    @staticmethod
+    def tierFor(height):
+        """
+        tierFor : returns the smallest tier with at least the given height
+
+        Args:
+            height (int): height in pixels
+
+        Returns:
+            int: height of the tier
+        """
+        for tier in ThumbnailCache.TIERS:
+            if tier >= height:
+                return tier
+        return ThumbnailCache.TIERS[-1]
+
+    def thumbnailPath(self, cpimage, tier):
+        """
+        thumbnailPath : path of the thumbnail of an image
+
+        Args:
+            cpimage (CPImage): image
+            tier (int/String): height of the tier, or "preview"
+
+        Returns:
+            String: path of the thumbnail (the file may not exist)
+        """
+        hash = cpimage.getHash()
+        return os.path.join(self.folder, hash[:2], "{}_{}.jpg".format(hash, tier))
+
+    def get(self, cpimage, height):
+        """
+        get : returns the thumbnail of an image if it is in the cache
+
+        Args:
+            cpimage (CPImage): image
+            height (int): height the image will be shown with
+
+        Returns:
+            String: path of the thumbnail, or None if it was not generated yet
+        """
+        path = self._touch(self.thumbnailPath(cpimage, ThumbnailCache.tierFor(height)))
+        Metrics.count("thumbnail cache hits" if path is not None else "thumbnail cache misses")
+        return path
+
+    def getPreview(self, cpimage):
+        """
+        getPreview : returns the preview of an image, taken from the thumbnail embedded in its exif.
+        Only the exif segment of the file is read and the preview is only a few KB, so it can be called from the UI thread
+
+        Args:
+            cpimage (CPImage): image
+
+        Returns:
+            String: path of the preview, or None if the image has no embedded thumbnail
+        """
+        path = self.thumbnailPath(cpimage, "preview")
+        if self._touch(path) is not None:
+            return path
+        try:
+            data = ExifReader.embeddedThumbnail(cpimage.getImageFile())
+            if data is None:
+                return None
+            ThumbnailCache.makePreview(data, path, cpimage.getDimensions(), cpimage.getOrientation())
+        except Exception:
+            return None
+        self.add(path)
+        return path
+
+    def _touch(self, path):
+        """
+        _touch : marks a thumbnail as the most recently used one
+
+        Args:
+            path (String): path of the thumbnail
+
+        Returns:
+            String: the path, or None if the thumbnail is not in the cache
+        """
+        with self.lock:
+            # Until the index is loaded, the file itself says if the thumbnail is in the cache
+            if self.entries is not None:
+                if path not in self.entries:
+                    return None
+                self.entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def ensure(self, cpimage, height):
+        """
+        ensure : returns the thumbnail of an image, generating it in the calling thread if it is not in the cache
+
+        Args:
+            cpimage (CPImage): image
+            height (int): height the image will be shown with
+
+        Returns:
+            String: path of the thumbnail, or None if it couldn't be generated
+        """
+        path = self.get(cpimage, height)
+        if path is not None:
+            return path
+        tier = ThumbnailCache.tierFor(height)
+        path = self.thumbnailPath(cpimage, tier)
+        try:
+            ThumbnailCache.makeThumbnail(cpimage.getImageFile(), path, tier)
+        except Exception:
+            return None
+        self.add(path)
+        return path
+
+    def request(self, cpimage, height, callback):
+        """
+        request : generates the thumbnail of an image in a background thread, if it is not in the cache.
+        The callback is called from the background thread
+
+        Args:
+            cpimage (CPImage): image
+            height (int): height the image will be shown with
+            callback (function): called with the path of the thumbnail when it is ready (None if it failed)
+        """
+        path = self.get(cpimage, height)
+        if path is not None:
+            callback(path)
+            return
+        tier = ThumbnailCache.tierFor(height)
+        path = self.thumbnailPath(cpimage, tier)
+        with self.lock:
+            if path in self.pending:
+                self.pending[path].append(callback)
+                return
+            self.pending[path] = [callback]
+        self.executor.submit(self._generate, cpimage.getImageFile(), path, tier)
+
+    def _generate(self, imageFile, path, tier):
+        """
+        _generate : generates a thumbnail and calls the functions waiting for it
+
+        Args:
+            imageFile (String): path to the image
+            path (String): path of the thumbnail
+            tier (int): height of the thumbnail
+        """
+        result = None
+        try:
+            ThumbnailCache.makeThumbnail(imageFile, path, tier)
+            self.add(path)
+            result = path
+        finally:
+            with self.lock:
+                callbacks = self.pending.pop(path, [])
+            for callback in callbacks:
+                callback(result)
+
+    @staticmethod
+    def makeThumbnail(imageFile, path, height):
+        """
+        makeThumbnail : writes a thumbnail of an image.
+        JPEG draft mode makes PIL decode the image already scaled down (1/2, 1/4 or 1/8), so only a few KB are decoded
+
+        Args:
+            imageFile (String): path to the image
+            path (String): path of the thumbnail
+            height (int): height of the thumbnail
+        """
+        from PIL import Image
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with Metrics.span("decode thumbnail"), Image.open(imageFile) as im:
+            orientation = im.getexif().get(ExifReader.ORIENTATION, 1)
+            im.draft('RGB', (height, height))
+            im = ThumbnailCache.applyOrientation(im.convert('RGB'), orientation)
+            im.thumbnail((height * 4, height))
+            # Written to another file first, so a half written thumbnail is never used
+            # (the name is unique to the thread, the same thumbnail may be generated by two threads)
+            tmp = "{}.{}.tmp".format(path, threading.get_ident())
+            im.save(tmp, 'JPEG', quality = 85)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def makePreview(data, path, dimensions, orientation):
+        """
+        makePreview : writes the preview of an image from its embedded thumbnail.
+        Embedded thumbnails often have another ratio than the image (ex: 160x120 with black bars for a 3:2 photo),
+        so they are cropped to the ratio of the image
+
+        Args:
+            data (bytes): embedded thumbnail JPEG file
+            path (String): path of the preview
+            dimensions (tuple): width and height of the image
+            orientation (int): exif orientation of the image
+        """
+        from PIL import Image
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with Image.open(io.BytesIO(data)) as im:
+            im = im.convert('RGB')
+            ratio = dimensions[0] / dimensions[1]
+            width, height = im.size
+            if width / height > ratio * 1.01:
+                cropWidth = round(height * ratio)
+                im = im.crop(((width - cropWidth) // 2, 0, (width + cropWidth) // 2, height))
+            elif width / height < ratio / 1.01:
+                cropHeight = round(width / ratio)
+                im = im.crop((0, (height - cropHeight) // 2, width, (height + cropHeight) // 2))
+            im = ThumbnailCache.applyOrientation(im, orientation)
+            tmp = "{}.{}.tmp".format(path, threading.get_ident())
+            im.save(tmp, 'JPEG', quality = 90)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def applyOrientation(im, orientation):
+        """
+        applyOrientation : turns and/or flips an image so it is shown as the exif orientation says
+
+        Args:
+            im (PIL.Image.Image): image
+            orientation (int): exif orientation (1 to 8)
+
+        Returns:
+            PIL.Image.Image: the turned image
+        """
+        if orientation in ThumbnailCache.ORIENTATION_TRANSPOSE:
+            return im.transpose(ThumbnailCache.ORIENTATION_TRANSPOSE[orientation])
+        return im
+
+    def add(self, path):
+        """
+        add : adds a generated thumbnail to the cache and evicts the least recently used ones if the cache is too big
+
+        Args:
+            path (String): path of the thumbnail
+        """
+        size = os.path.getsize(path)
+        load = False
+        evicted = []
+        with self.lock:
+            if self.entries is None:
+                # Added to the index once it is loaded, the first thumbnail added starts its loading
+                self.added.pop(path, None)
+                self.added[path] = size
+                load = not self.indexing
+                self.indexing = True
+            else:
+                self.totalBytes += size - self.entries.pop(path, 0)
+                self.entries[path] = size
+                evicted = self._evict()
+        if load:
+            self.executor.submit(self._loadIndex)
+        ThumbnailCache._remove(evicted)
+
+    def _loadIndex(self):
+        """
+        _loadIndex : lists the thumbnails of the cache folder, least recently used first,
+        then evicts the least recently used ones if the cache is too big
+        """
+        found = []
+        try:
+            for sub in os.scandir(self.folder):
+                if sub.is_dir():
+                    for entry in os.scandir(sub.path):
+                        if entry.name.endswith(".jpg"):
+                            stat = entry.stat()
+                            found.append((stat.st_mtime, entry.path, stat.st_size))
+        except OSError:
+            pass
+        entries = OrderedDict()
+        # The modification time of a thumbnail is updated each time it is used
+        for mtime, path, size in sorted(found):
+            entries[path] = size
+        with self.lock:
+            for path, size in self.added.items():
+                entries.pop(path, None)
+                entries[path] = size
+            self.added.clear()
+            self.entries = entries
+            self.totalBytes = sum(entries.values())
+            evicted = self._evict()
+        ThumbnailCache._remove(evicted)
+
+    def _evict(self):
+        """
+        _evict : takes the least recently used thumbnails out of the index until the cache is not too big.
+        Must be called with self.lock held
+
+        Returns:
+            list: paths of the thumbnails to remove
+        """
+        evicted = []
+        while self.totalBytes > self.maxBytes and len(self.entries) > 1:
+            oldPath, oldSize = self.entries.popitem(last = False)
+            self.totalBytes -= oldSize
+            evicted.append(oldPath)
+        return evicted
+
+    @staticmethod
+    def _remove(paths):
+        """
+        _remove : removes thumbnail files, ignoring the ones already gone
+
+        Args:
+            paths (list): paths of the thumbnails
+        """
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def invalidate(self, cpimage):
+        """
+        invalidate : removes every thumbnail of an image, used when the image file changes
+
+        Args:
+            cpimage (CPImage): image
+        """
+        for tier in ThumbnailCache.TIERS + ("preview",):
+            path = self.thumbnailPath(cpimage, tier)
+            with self.lock:
+                if self.entries is None:
+                    self.added.pop(path, None)
+                    # Not listed yet, the file is removed if it exists
+                    size = 0
+                else:
+                    size = self.entries.pop(path, None)
+                    if size is not None:
+                        self.totalBytes -= size
+            if size is not None:
+                ThumbnailCache._remove([path])
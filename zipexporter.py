@@ -0,0 +1,326 @@
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED
+from metrics import Metrics
+import threading
+import time
+import os
+
+class ExportProgress:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ExportProgress : progress event sent by a ZipExporter while it writes the archive
+    """
+    def __init__(self, files, totalFiles, bytesDone, totalBytes, elapsed, volumes, errors, cancelled, finished):
+        """
+        __init__ : ExportProgress class constructor
+
+        Args:
+            files (int): number of files already written (or that could not be read)
+            totalFiles (int): number of files to export
+            bytesDone (int): bytes of the files already read
+            totalBytes (int): size of all the files to export
+            elapsed (float): seconds since the export started
+            volumes (list): paths of the archives written so far
+            errors (list): (path, exception) of the files that could not be exported
+            cancelled (bool): True if the export was cancelled (its archives are removed)
+            finished (bool): True if the export is over (sent once, with the last event)
+        """
+        self.files = files
+        self.totalFiles = totalFiles
+        self.bytesDone = bytesDone
+        self.totalBytes = totalBytes
+        self.elapsed = elapsed
+        self.volumes = volumes
+        self.errors = errors
+        self.cancelled = cancelled
+        self.finished = finished
+
+    def bytesPerSecond(self):
+        """
+        bytesPerSecond : average speed of the export
+
+        Returns:
+            float: bytes read per second
+        """
+        return self.bytesDone / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        """
+        __str__ : toString method
+
+        Returns:
+            str: string representation of the progress, to be shown to the user
+        """
+        text = "{}/{} files, {:.1f}/{:.1f} MB ({:.1f} MB/s)".format(self.files, self.totalFiles, self.bytesDone / 2**20,
+                                                                    self.totalBytes / 2**20, self.bytesPerSecond() / 2**20)
+        if len(self.volumes) > 1:
+            text += ", {} volumes".format(len(self.volumes))
+        if len(self.errors) > 0:
+            text += ", {} errors".format(len(self.errors))
+        if self.cancelled:
+            text += " (cancelled)"
+        return text
+
+class ZipExporter:
+    """
+    Author: 55881 Eduardo Carvalho
+    Author: 55738 Joao Milagaia
+
+    ZipExporter : writes files to a zip archive, in a background thread if started with run.
+        - files already compressed (JPEG, PNG, videos...) are stored as they are, compressing them again
+          costs a lot of time and saves almost no space. Other files are deflated
+        - files are copied in chunks, so a file is never fully loaded in memory whatever its size
+        - two files with the same name get different names in the archive ("img.jpg", "img (2).jpg")
+        - the archive can be split in volumes of a maximum size, each volume is a complete zip archive
+          ("name.zip", "name.002.zip", ...). A file bigger than the maximum size gets a volume of its own
+    """
+
+    # Extensions of the files stored without compression
+    STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.mp4', '.mov', '.avi', '.zip', '.gz', '.7z'}
+
+    # Bytes copied at a time
+    CHUNK_SIZE = 1 << 20
+
+    # Maximum size of a file header in the archive
+    HEADER_BYTES = 350
+
+    def __init__(self, path, maxVolumeBytes = None, onProgress = None, progressInterval = 0.25):
+        """
+        __init__ : ZipExporter class constructor
+
+        Args:
+            path (String): path to the archive, without the ".zip" extension
+            maxVolumeBytes (int, optional): maximum size of each volume, None for a single archive. Defaults to None.
+            onProgress (function, optional): called with an ExportProgress while the files are written. Defaults to None.
+            progressInterval (float, optional): minimum seconds between two progress events. Defaults to 0.25.
+        """
+        self.path = path
+        self.maxVolumeBytes = maxVolumeBytes
+        self.onProgress = onProgress
+        self.progressInterval = progressInterval
+        self.cancelled = threading.Event()
+        self.volumes = []
+        self.errors = []
+        self.files = 0
+        self.totalFiles = 0
+        self.bytesDone = 0
+        self.totalBytes = 0
+        self.start = None
+        self.lastProgress = 0
+
+    @staticmethod
+    def compressionOf(fileName):
+        """
+        compressionOf : compression used for a file in the archive
+
+        Args:
+            fileName (String): name of the file
+
+        Returns:
+            int: ZIP_STORED for files already compressed, ZIP_DEFLATED for the others
+        """
+        if os.path.splitext(fileName)[1].lower() in ZipExporter.STORED_EXTENSIONS:
+            return ZIP_STORED
+        return ZIP_DEFLATED
+
+    @staticmethod
+    def arcnames(paths):
+        """
+        arcnames : names of the files in the archive, their base names made unique
+        (ignoring the case, so the archive can be extracted on any system)
+
+        Args:
+            paths (list): paths to the files
+
+        Returns:
+            list: name of each file in the archive, in the same order
+        """
+        names = []
+        used = set()
+        for path in paths:
+            name = os.path.basename(path)
+            root, extension = os.path.splitext(name)
+            count = 1
+            while name.lower() in used:
+                count += 1
+                name = "{} ({}){}".format(root, count, extension)
+            used.add(name.lower())
+            names.append(name)
+        return names
+
+    def volumePath(self, volume):
+        """
+        volumePath : path to a volume of the archive
+
+        Args:
+            volume (int): number of the volume (the first is 1)
+
+        Returns:
+            String: path to the volume
+        """
+        if volume == 1:
+            return self.path + ".zip"
+        return "{}.{:03d}.zip".format(self.path, volume)
+
+    def run(self, paths):
+        """
+        run : exports the files in a background thread and returns right away.
+        The end of the export is the progress event with finished set
+
+        Args:
+            paths (list): paths to the files
+        """
+        threading.Thread(target = self.export, args = (list(paths),), daemon = True).start()
+
+    def export(self, paths):
+        """
+        export : writes the files to the archive, in the calling thread. Files that can't be read (even partway) are skipped
+        and recorded in self.errors. If the export is cancelled or an archive can't be written, the volumes already written are removed
+
+        Args:
+            paths (list): paths to the files
+
+        Returns:
+            ExportProgress: last progress of the export
+        """
+        self.start = time.time()
+        sizes = []
+        for path in paths:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+        self.totalFiles = len(paths)
+        self.totalBytes = sum(sizes)
+        archive = None
+        with Metrics.span("zip export"):
+            try:
+                for path, size, arcname in zip(paths, sizes, ZipExporter.arcnames(paths)):
+                    if self.cancelled.is_set():
+                        break
+                    if archive is None or self.isFull(archive, size):
+                        if archive is not None:
+                            archive.close()
+                        archive = self.openVolume()
+                    self.writeFile(archive, path, arcname, size)
+                    self.files += 1
+                    self.sendProgress(False)
+            except Exception as e:
+                self.errors.append((self.volumes[-1] if len(self.volumes) > 0 else self.path, e))
+                self.cancelled.set()
+            finally:
+                if archive is not None:
+                    archive.close()
+            if self.cancelled.is_set():
+                self.removeVolumes()
+        Metrics.count("bytes zipped", self.bytesDone)
+        return self.sendProgress(True)
+
+    def openVolume(self):
+        """
+        openVolume : creates the next volume of the archive
+
+        Returns:
+            ZipFile: archive of the volume, opened for writing
+        """
+        self.volumes.append(self.volumePath(len(self.volumes) + 1))
+        return ZipFile(self.volumes[-1], 'w')
+
+    def isFull(self, archive, size):
+        """
+        isFull : used to know if a file must go to the next volume
+
+        Args:
+            archive (ZipFile): archive of the current volume
+            size (int): size of the file
+
+        Returns:
+            bool: True if the volume has files and the file (and its headers) would make it bigger than the maximum size
+        """
+        if self.maxVolumeBytes is None or len(archive.infolist()) == 0:
+            return False
+        # Headers not written yet: local header of the file, central header of every file and end of the archive
+        # (at most ZipExporter.HEADER_BYTES each, with a name of up to 255 bytes and zip64 fields)
+        headers = (2 * len(archive.infolist()) + 2) * ZipExporter.HEADER_BYTES
+        return archive.fp.tell() + size + headers > self.maxVolumeBytes
+
+    def writeFile(self, archive, path, arcname, size):
+        """
+        writeFile : copies a file to the archive in chunks. If it can't be read, even partway, it is skipped
+        and recorded in self.errors. The bytes of a skipped file are counted as done, so the progress still reaches totalBytes
+
+        Args:
+            archive (ZipFile): archive of the current volume
+            path (String): path to the file
+            arcname (String): name of the file in the archive
+            size (int): size of the file when the export started (counted in totalBytes)
+        """
+        try:
+            source = open(path, 'rb')
+            # Dates before 1980 can't be written in a zip archive, they are replaced by 1980/01/01
+            info = ZipInfo.from_file(path, arcname, strict_timestamps = False)
+        except OSError as e:
+            self.errors.append((path, e))
+            self.bytesDone += size
+            return
+        info.compress_type = ZipExporter.compressionOf(arcname)
+        read = 0
+        failed = False
+        with source, archive.open(info, 'w') as target:
+            while not self.cancelled.is_set():
+                try:
+                    chunk = source.read(ZipExporter.CHUNK_SIZE)
+                except OSError as e:
+                    self.errors.append((path, e))
+                    failed = True
+                    break
+                if not chunk:
+                    break
+                # Errors writing the archive are not caught, they stop the export
+                target.write(chunk)
+                read += len(chunk)
+                self.bytesDone += len(chunk)
+                self.sendProgress(False)
+        if failed:
+            # The part already written is left out of the central directory, so the archive doesn't list a truncated file
+            archive.filelist.remove(info)
+            archive.NameToInfo.pop(info.filename, None)
+            self.bytesDone += max(0, size - read)
+
+    def removeVolumes(self):
+        """
+        removeVolumes : removes the volumes written, used when the export doesn't end
+        """
+        for volume in self.volumes:
+            try:
+                os.remove(volume)
+            except OSError:
+                pass
+        self.volumes = []
+
+    def sendProgress(self, finished):
+        """
+        sendProgress : sends the progress to onProgress, if the last event was sent more than progressInterval seconds ago
+
+        Args:
+            finished (bool): True for the last event, which is always sent
+
+        Returns:
+            ExportProgress: progress of the export
+        """
+        now = time.time()
+        if not finished and now - self.lastProgress < self.progressInterval:
+            return None
+        self.lastProgress = now
+        progress = ExportProgress(self.files, self.totalFiles, self.bytesDone, self.totalBytes, now - self.start,
+                                  list(self.volumes), list(self.errors), self.cancelled.is_set(), finished)
+        if self.onProgress is not None:
+            self.onProgress(progress)
+        return progress
+
+    def cancel(self):
+        """
+        cancel : stops the export after the chunk being written, its volumes are removed
+        """
+        self.cancelled.set()